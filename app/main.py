@@ -1,5 +1,19 @@
-from src.ui.cli import main
+import sys
+
+from .src.ui.cli import main
+
+
+def run(argv=None):
+    """Start the CLI, or the Kivy GUI with --gui; Kivy is only imported for the GUI"""
+    argv = sys.argv[1:] if argv is None else argv
+    if '--gui' in argv:
+        from .src.ui.gui import main as gui_main
+        gui_main()
+    else:
+        main()
+
 
 if __name__ == '__main__':
-    print("Starting the application...")
-    main()
+    if len(sys.argv) == 1:  # subcommands print JSON lines, so keep their stdout clean
+        print("Starting the application...")
+    run()
@@ -0,0 +1,317 @@
+'''
+This module provides the binary snapshot that Menu loads instead of parsing
+items.csv.
+
+items.csv stays the file people edit and exchange. Next to it the CSV backend
+keeps items.csv.snap, which holds the same rows as typed columns. Prices and
+calories are stored as 8-byte numbers, and every string is stored once in a
+string table and referred to by its number. The price and calorie indexes are
+stored already sorted. A load still builds every column in memory, but the
+numbers come straight from their bytes and the strings are decoded as one
+block, which is cheaper than parsing the CSV text and sorting the indexes.
+The CSV backend writes the snapshot on every rewrite of items.csv.
+
+The header holds:
+
+    magic, schema version, byte order flag, row count
+    inode, size and mtime of the CSV file the snapshot was built from
+    CRC-32 of everything after the header
+
+A snapshot that fails any of these checks is ignored. The backend then
+rebuilds it from the CSV file. After the header come the sections. Each one
+is a uint64 byte length followed by the data, padded to 8 bytes, in the
+order of SECTIONS.
+'''
+
+import json
+import struct
+import sys
+import zlib
+from array import array
+from bisect import insort
+from operator import itemgetter
+
+from .durability import atomic_write
+from .table import NO_SIZE, MenuTable, to_columns
+
+MAGIC = b'MNUS'
+SCHEMA_VERSION = 1
+HEADER = struct.Struct('<4sHHIQQQI')  # magic, version, flags, rows, CSV inode, size, mtime_ns, CRC-32
+LENGTH = struct.Struct('<Q')
+BIG_ENDIAN = 1  # flags bit set when the columns were written in big-endian byte order
+EMPTY_SIZE = -2  # size column value for a size stored as '' (as read from CSV) rather than None
+SIZE_CODES = {None: NO_SIZE, '': EMPTY_SIZE}
+SECTIONS = ['prices', 'calories', 'sizes', 'types', 'names', 'descriptions', 'image_paths',
+            'string_offsets', 'strings', 'price_order', 'calorie_order', 'overflow']
+FIELDNAMES = ['type', 'name', 'price', 'description', 'calories', 'image_path', 'size']
+FIELD_COUNT = len(FIELDNAMES)
+
+
+def snapshot_path(csv_path):
+    """Where the snapshot of a CSV menu file is kept"""
+    return f"{csv_path}.snap"
+
+
+class MenuSnapshot:
+    def __init__(self, types, names, prices, descriptions, calories, image_paths, sizes,
+                 price_order, calorie_order, overflow, nbytes=0):
+        self.types = types
+        self.names = names
+        self.prices = prices  # array('d')
+        self.descriptions = descriptions
+        self.calories = calories  # array('q')
+        self.image_paths = image_paths
+        self.sizes = sizes  # array('q'), NO_SIZE or EMPTY_SIZE when there is none
+        self.price_order = price_order  # slots sorted by (price, name), without overflow rows
+        self.calorie_order = calorie_order
+        self.overflow = overflow  # slot -> row dict for rows the typed columns cannot hold exactly
+        self.nbytes = nbytes  # size of the file it was read from
+        self._rows = None
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Encode rows of strings; a later row replaces an earlier one with the same name, as in Menu"""
+        rows = list({row['name']: row for row in rows}.values())
+        try:
+            columns = _typed_columns(rows)
+        except (KeyError, TypeError, ValueError, OverflowError):
+            columns = None
+        overflow = {}
+        if columns is None:
+            columns = _columns_by_row(rows, overflow)
+        snapshot = cls._from_columns(columns, overflow)
+        snapshot._rows = rows  # already the dicts rows() would build
+        return snapshot
+
+    @classmethod
+    def from_saved(cls, rows, fieldnames):
+        """Encode rows with unique names as the CSV file they were just saved to reads them back
+
+        Saving writes None as '' and other values with str(); the rows are only
+        copied when more than a missing drink size needs converting.
+        """
+        columns = None
+        if fieldnames == FIELDNAMES:
+            try:
+                columns = _typed_columns(rows, blank_sizes=True)
+            except (KeyError, TypeError, ValueError, OverflowError):
+                pass
+        if columns is None:
+            return cls.from_rows([{key: '' if value is None else str(value)
+                                   for key, value in zip(fieldnames, map(row.get, fieldnames))} for row in rows])
+        return cls._from_columns(columns, {})
+
+    @classmethod
+    def _from_columns(cls, columns, overflow):
+        types, names, prices, descriptions, calories, image_paths, sizes = columns
+        by_name = sorted((slot for slot in range(len(names)) if slot not in overflow), key=names.__getitem__)
+        # Stable sorts of the name order give the (key, name) order SortedIndex.rebuild would
+        return cls(types, names, prices, descriptions, calories, image_paths, sizes,
+                   array('I', sorted(by_name, key=prices.__getitem__)),
+                   array('I', sorted(by_name, key=calories.__getitem__)), overflow)
+
+    @classmethod
+    def read(cls, path, stamp):
+        """Read a snapshot file and decode it
+
+        Returns None if the file is missing, was built from another version of
+        the CSV file (stamp), has another schema version or byte order, or fails
+        its checksum.
+        """
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except FileNotFoundError:
+            return None
+        if len(data) < HEADER.size:
+            return None
+        return cls._decode(memoryview(data), tuple(stamp), len(data))
+
+    @classmethod
+    def _decode(cls, view, stamp, nbytes):
+        magic, version, flags, count, *source, checksum = HEADER.unpack_from(view)
+        if magic != MAGIC or version != SCHEMA_VERSION or flags != _flags() or tuple(source) != stamp:
+            return None
+        if zlib.crc32(view[HEADER.size:]) != checksum:
+            return None
+
+        spans, position = {}, HEADER.size
+        for name in SECTIONS:
+            (length,) = LENGTH.unpack_from(view, position)
+            position += LENGTH.size
+            spans[name] = (position, position + length)
+            position += length + (-length % 8)
+
+        def section(name):
+            start, stop = spans[name]
+            return view[start:stop]
+
+        def numbers(name, typecode):
+            values = array(typecode)
+            values.frombytes(section(name))
+            return values
+
+        offsets = section('string_offsets').cast('Q').tolist()
+        text = str(section('strings'), 'utf-8')
+        strings = [text[start:stop] for start, stop in zip(offsets, offsets[1:])]
+
+        def column(name):
+            return list(map(strings.__getitem__, section(name).cast('I').tolist()))
+
+        overflow = {slot: row for slot, row in json.loads(str(section('overflow'), 'utf-8'))}
+        return cls(column('types'), column('names'), numbers('prices', 'd'), column('descriptions'),
+                   numbers('calories', 'q'), column('image_paths'), numbers('sizes', 'q'),
+                   numbers('price_order', 'I'), numbers('calorie_order', 'I'), overflow, nbytes)
+
+    def write(self, path, stamp, sync=False):
+        """Atomically write the snapshot for the CSV file identified by stamp
+
+        It is not fsynced by default: after a crash the checksum catches a torn
+        file and it is rebuilt from the CSV file.
+        """
+        strings = {'': 0}  # string -> number, in order of first use
+
+        def numbered(values):
+            return array('I', [strings.setdefault(value, len(strings)) for value in values])
+
+        string_columns = [numbered(self.types), numbered(self.names),
+                          numbered(self.descriptions), numbered(self.image_paths)]
+        offsets = array('Q', [0])
+        for string in strings:
+            offsets.append(offsets[-1] + len(string))
+        sections = [self.prices, self.calories, self.sizes, *string_columns, offsets,
+                    ''.join(strings).encode(), self.price_order, self.calorie_order,
+                    json.dumps(sorted(self.overflow.items())).encode()]
+
+        body = bytearray()
+        for section in sections:
+            data = section.tobytes() if isinstance(section, array) else section
+            body += LENGTH.pack(len(data))
+            body += data
+            body += bytes(-len(data) % 8)
+        header = HEADER.pack(MAGIC, SCHEMA_VERSION, _flags(), len(self), *stamp, zlib.crc32(body))
+
+        def write(file):
+            file.write(header)
+            file.write(body)
+        atomic_write(path, write, sync=sync, binary=True)
+        self.nbytes = len(header) + len(body)
+
+    def rows(self):
+        """The rows as dicts of strings, like the CSV file reads"""
+        if self._rows is not None:
+            return self._rows
+        rows = [
+            {'type': item_type, 'name': name, 'price': price, 'description': description,
+             'calories': calorie_count, 'image_path': image_path, 'size': size}
+            for item_type, name, price, description, calorie_count, image_path, size in zip(
+                self.types, self.names, _as_text(self.prices), self.descriptions,
+                _as_text(self.calories), self.image_paths, _size_text(self.sizes))
+        ]
+        for slot, row in self.overflow.items():
+            rows[slot] = dict(row)
+        return rows
+
+    def table(self):
+        """The rows as a columnar MenuTable"""
+        sizes = array('l', [NO_SIZE if size == EMPTY_SIZE else size for size in self.sizes])
+        return MenuTable.from_columns(self.types, self.names, array('d', self.prices), self.descriptions,
+                                      array('q', self.calories), self.image_paths, sizes, self.overflow)
+
+    def type_buckets(self):
+        """item type -> {name: None} in row order, like Menu's type index"""
+        types = self.types
+        if self.overflow:
+            types = list(types)
+            for slot, row in self.overflow.items():
+                types[slot] = row.get('type')
+        buckets = {item_type: {} for item_type in dict.fromkeys(types)}
+        for item_type, name in zip(types, self.names):
+            buckets[item_type][name] = None
+        return buckets
+
+    def price_pairs(self):
+        """(price, name) pairs sorted like SortedIndex keeps them"""
+        return self._pairs(self.price_order, self.prices, 'price')
+
+    def calorie_pairs(self):
+        """(calories, name) pairs sorted like SortedIndex keeps them"""
+        return self._pairs(self.calorie_order, self.calories, 'calories')
+
+    def _pairs(self, order, keys, field):
+        pairs = list(zip(map(keys.__getitem__, order), map(self.names.__getitem__, order)))
+        for row in self.overflow.values():
+            key = _to_number(row.get(field))
+            if key is not None:
+                insort(pairs, (key, row['name']))
+        return pairs
+
+
+def _typed_columns(rows, blank_sizes=False):
+    """Encode the rows column by column, or return None unless every row converts exactly
+
+    With blank_sizes a size of None is encoded as '', the way the CSV file stores it.
+    """
+    if not rows:
+        return [], [], array('d'), [], array('q'), [], array('q')
+    if any(len(row) != FIELD_COUNT for row in rows):
+        return None
+    types, names, price_texts, descriptions, calorie_texts, image_paths, size_texts = (
+        list(map(itemgetter(field), rows)) for field in FIELDNAMES)
+    if blank_sizes:
+        size_texts = ['' if text is None else text for text in size_texts]
+    if not all(set(map(type, column)) == {str} for column in (types, names, descriptions, image_paths)):
+        return None
+    prices = array('d', map(float, price_texts))
+    calories = array('q', map(int, calorie_texts))
+    sizes = array('q', [SIZE_CODES[text] if text in SIZE_CODES else int(text) for text in size_texts])
+    # Keep the exact stored text, e.g. a hand-edited price of '3' is not turned into '3.0'
+    if _as_text(prices) != price_texts or _as_text(calories) != calorie_texts or _size_text(sizes) != size_texts:
+        return None
+    return types, names, prices, descriptions, calories, image_paths, sizes
+
+
+def _columns_by_row(rows, overflow):
+    """Encode the rows one at a time, adding those that do not convert exactly to overflow"""
+    types, names, descriptions, image_paths = [], [], [], []
+    prices, calories, sizes = array('d'), array('q'), array('q')
+    for slot, row in enumerate(rows):
+        columns = to_columns(row) if len(row) == FIELD_COUNT else None
+        if columns is None:
+            overflow[slot] = dict(row)
+            columns = ('', row['name'], 0.0, '', 0, '', NO_SIZE)
+        item_type, name, price, description, calorie_count, image_path, size = columns
+        types.append(item_type)
+        names.append(name)
+        prices.append(price)
+        descriptions.append(description)
+        calories.append(calorie_count)
+        image_paths.append(image_path)
+        sizes.append(EMPTY_SIZE if row.get('size') == '' else size)
+    return types, names, prices, descriptions, calories, image_paths, sizes
+
+
+def _flags():
+    return BIG_ENDIAN if sys.byteorder == 'big' else 0
+
+
+def _as_text(values):
+    """str() of every value, converting each distinct value once"""
+    texts = {}
+    return [texts[value] if value in texts else texts.setdefault(value, str(value)) for value in values]
+
+
+def _size_text(sizes):
+    """The stored text of every size"""
+    texts = {code: text for text, code in SIZE_CODES.items()}
+    return [texts[size] if size in texts else texts.setdefault(size, str(size)) for size in sizes]
+
+
+def _to_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
@@ -3,183 +3,833 @@ This module provides CRUD operations for the menu items.
 
 The module defines a MenuCRUD class that provides methods for creating, reading, updating, and deleting menu items.
 
-The class uses a CSV file to store the menu items.
+The class uses a CSV file to store the menu items by default, or any backend from the
+storage module such as SQLite. Items are indexed by name, type,
+price and calories so lookups and queries do not scan the whole menu. In journaled mode mutations are
+appended to a write-ahead journal and compacted into the CSV file on a size threshold.
+In lazy mode only a name -> byte offset index is built on open and rows are parsed on demand.
+CSV menus otherwise load from a binary snapshot kept next to the file, with the price and
+calorie indexes already sorted; see the binary_snapshot module.
+In columnar mode rows are held in a MenuTable instead of a list of dicts to save memory.
+In concurrent mode every method runs under a re-entrant lock and writes also hold a
+cross-process file lock, reloading the menu first if another process changed it.
+With instrument=True calls are counted and timed; see the metrics module.
+Inside deferred() writes only change memory and are persisted together by flush().
+search() ranks items by keyword, prefix and fuzzy matches; see the search module.
+Every change is numbered and sent as a ChangeEvent to subscribe()d callbacks once it is
+persisted; changes_since(seq) replays recent ones from a bounded log.
+Items are validated by the per-type rules of the schema module; create_items()
+and get_menu_models() validate a column at a time and collect every error.
 
 Nathan Jordan and Brandon Whitesides
 '''
 
 
 
+import contextlib
 import csv
-from pathlib import Path
-from . import models
+import functools
+import json
+import threading
+import traceback
+from collections import deque
+from collections.abc import Mapping
+from itertools import islice
+from . import models, schema
+from .indexes import SortedIndex
+from .search import SearchIndex
+from .locking import FileLock
+from .metrics import MenuMetrics
+from .durability import FSYNC_INTERVAL
+from .storage import COMPACT_THRESHOLD, FIELDNAMES, open_backend
+from .table import MenuTable
+
+
+def _to_number(value):
+    """Parse a stored numeric field, returning None when it is not a number"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def creation_fields(fields):
+    """Map a row from a file or batch onto the keyword arguments of create_item"""
+    fields = dict(fields)
+    if 'type' in fields:
+        fields['item_type'] = fields.pop('type')
+    if fields.get('size') in ('', None):
+        fields['size'] = None
+    return fields
+
+
+def load_item_file(path):
+    """Read item rows from a .csv or .jsonl file for create_items"""
+    with open(path, 'r', newline='') as file:
+        if str(path).endswith('.jsonl'):
+            return [json.loads(line) for line in file if line.strip()]
+        return list(csv.DictReader(file))
+
+
+class ChangeEvent:
+    """One change to a menu: created, updated or deleted, with the rows before and after
+
+    A reloaded event (no name or rows) means every row was replaced, e.g. after
+    another process wrote the file, and consumers should read the menu again.
+    """
+    __slots__ = ('seq', 'kind', 'name', 'before', 'after')
+    KINDS = ['created', 'updated', 'deleted', 'reloaded']
+
+    def __init__(self, seq, kind, name=None, before=None, after=None):
+        self.seq = seq
+        self.kind = kind
+        self.name = name
+        self.before = before
+        self.after = after
+
+    def as_dict(self):
+        return {'seq': self.seq, 'kind': self.kind, 'name': self.name, 'before': self.before, 'after': self.after}
+
+    def __repr__(self):
+        return f"ChangeEvent(seq={self.seq}, kind={self.kind!r}, name={self.name!r})"
+
+
+class ItemNotFound(ValueError):
+    """Raised when no menu item has the given name"""
+
+
+class BatchError(ValueError):
+    """Raised when rows of a batch operation fail validation"""
+
+    def __init__(self, errors):
+        self.errors = errors  # list of (position, message)
+        details = '; '.join(f"row {position}: {message}" for position, message in errors[:5])
+        super().__init__(f"{len(errors)} row(s) failed validation: {details}")
+
+
+def _synchronized(method):
+    """Run a Menu method under the in-process lock of a concurrent menu"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._lock is None:
+            return method(self, *args, **kwargs)
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _exclusive(method):
+    """Run a Menu write under both locks of a concurrent menu, on up-to-date rows"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._lock is None:
+            return method(self, *args, **kwargs)
+        with self._lock, self._file_lock:
+            self._reload_if_changed()
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
 class Menu:
-    VALID_TYPES = ['Entree', 'Drink', 'Dessert', 'Appetizer']
-    MIN_DRINK_SIZE = 8  # minimum size in ounces
-    MAX_DRINK_SIZE = 44  # maximum size in ounces
+    VALID_TYPES = schema.ITEM_TYPES
+    MIN_DRINK_SIZE = schema.MIN_DRINK_SIZE  # minimum size in ounces
+    MAX_DRINK_SIZE = schema.MAX_DRINK_SIZE  # maximum size in ounces
+    FIELDNAMES = FIELDNAMES
+    COMPACT_THRESHOLD = COMPACT_THRESHOLD  # journal entries before compacting into the CSV
+    MIN_RECLAIM = 32  # deleted slots tolerated before the row list is packed
+    SORTABLE_FIELDS = ['name', 'price', 'calories']
+    BULK_REINDEX = 64  # batch size above which indexes are rebuilt rather than patched
+    CHANGE_LOG_SIZE = 1024  # recent change events kept for changes_since()
+    MODEL_TYPES = {'Entree': models.Entree, 'Drink': models.Drink, 'Dessert': models.Dessert,
+                   'Appetizer': models.Appetizer}
+    INSTRUMENTED_METHODS = ['create_item', 'create_items', 'create_validated_items', 'read_items', 'read_item',
+                            'query', 'search', 'update_item', 'update_items', 'delete_item', 'delete_items',
+                            'get_menu_models', 'compact', 'refresh', 'flush', 'close',
+                            '_reload', '_load_items', '_load_snapshot', '_save_items', '_commit']
+
+    def __init__(self, csv_path='app/items.csv', journaled=False, compact_threshold=COMPACT_THRESHOLD,
+                 lazy=False, columnar=False, backend=None, concurrent=False,
+                 fsync='always', fsync_interval=FSYNC_INTERVAL, instrument=False, metrics_path=None,
+                 snapshot=True):
+        if backend is None:
+            backend = open_backend(csv_path, journaled, compact_threshold, fsync, fsync_interval, snapshot)
+        self.backend = backend
+        self.csv_path = backend.path
+        self.metrics = None
+        self.metrics_path = metrics_path
+        if instrument or metrics_path:
+            self.metrics = MenuMetrics()
+            for name in self.INSTRUMENTED_METHODS:
+                setattr(self, name, self.metrics.wrap(name, getattr(self, name), backend))
+        self.columnar = columnar
+        self._rows = self._new_row_store()  # rows in insertion order, None marks a deleted slot
+        self._index = {}  # item name -> slot in self._rows
+        self._deleted = 0
+        self.revision = 0  # bumped by every change to the rows, so callers can cache derived data
+        self._by_type = {}  # item type -> {name: None} in insertion order
+        self._price_index = SortedIndex()
+        self._calorie_index = SortedIndex()
+        self._lazy_index = None  # offset index until the rows are loaded in lazy mode
+        self._models = None  # cached get_menu_models() result, built on first use
+        self._search = None  # full-text SearchIndex, built on the first search()
+        self._pending = None  # changes held back inside deferred(), persisted by flush()
+        self.seq = 0  # sequence number of the latest ChangeEvent
+        self._change_log = deque(maxlen=self.CHANGE_LOG_SIZE)
+        self._unpublished = []  # events recorded since subscribers were last called
+        self._subscribers = ()
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # keeps flushes from several threads in order
+        self._lock = None
+        if concurrent:
+            self._lock = threading.RLock()
+            self._file_lock = FileLock(f"{self.csv_path}.lock")
+            self._file_lock.acquire()
+        try:
+            if lazy:
+                self._lazy_index = self.backend.lookup()
+            if self._lazy_index is None:
+                self._reload()
+            self._version = self.backend.version()
+            if self.backend.recovered:
+                # Fold changes replayed from a previous run's journal into the snapshot
+                self.compact()
+        finally:
+            if concurrent:
+                self._file_lock.release()
 
-    def __init__(self, csv_path='app/items.csv'):
-        self.csv_path = csv_path
-        self.items = self._load_items()
+    @property
+    def journal(self):
+        """The backend's append-only journal, or None when it rewrites on every change"""
+        return self.backend.journal
 
     def _load_items(self):
-        """Load items from CSV file"""
-        items = []
-        if Path(self.csv_path).exists():
-            with open(self.csv_path, 'r', newline='') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    items.append(row)
-        return items
+        """Load items from the storage backend"""
+        return list(self.backend.load())
+
+    def _reload(self):
+        """Replace every row with the stored ones, from the backend's snapshot when it has one"""
+        snapshot = self.backend.snapshot()
+        if snapshot is None:
+            self._load_rows(self._load_items())
+        else:
+            self._load_snapshot(snapshot)
+        self._record('reloaded')
+        self._publish()
+
+    def _ensure_loaded(self):
+        """Load every row of a lazily opened menu before a full read or a write"""
+        if self._lazy_index is not None:
+            self._lazy_index = None
+            self._reload()
+
+    def _reload_if_changed(self):
+        """Reload every row if another process wrote since this menu last did"""
+        if self.backend.version() != self._version:
+            self._lazy_index = None
+            self._reload()
+            self._version = self.backend.version()
+
+    @_exclusive
+    def refresh(self):
+        """Pick up changes other processes made to the menu"""
+        self._reload_if_changed()
 
     def _save_items(self):
-        """Save items to CSV file"""
-        if not self.items:
+        """Save all items to the storage backend"""
+        self.backend.save(self.items)
+
+    @property
+    def items(self):
+        """Live rows in insertion order"""
+        return [row for row in self._rows if row is not None]
+
+    def _new_row_store(self, rows=()):
+        """Return an empty (or pre-filled) list of rows or columnar MenuTable"""
+        return MenuTable(rows) if self.columnar else list(rows)
+
+    def _load_rows(self, rows):
+        """Replace all rows and build the secondary indexes with one sort each"""
+        self._rows = self._new_row_store()
+        self._index = {}
+        self._deleted = 0
+        self._models = None
+        self._search = None
+        self.revision += 1
+        for row in rows:
+            slot = self._index.get(row['name'])
+            if slot is None:
+                self._index[row['name']] = len(self._rows)
+                self._rows.append(row)
+            else:
+                self._rows[slot] = row
+        self._rebuild_indexes()
+
+    def _load_snapshot(self, snapshot):
+        """Replace all rows with a binary snapshot's, taking its indexes as they are"""
+        self._rows = snapshot.table() if self.columnar else snapshot.rows()
+        self._index = dict(zip(snapshot.names, range(len(snapshot))))
+        self._deleted = 0
+        self._models = None
+        self._search = None
+        self.revision += 1
+        self._by_type = snapshot.type_buckets()
+        self._price_index.rebuild(snapshot.price_pairs(), presorted=True)
+        self._calorie_index.rebuild(snapshot.calorie_pairs(), presorted=True)
+
+    def _rebuild_indexes(self):
+        """Build the type, price and calorie indexes from scratch"""
+        self._by_type = {}
+        prices, calories = [], []
+        for row in self.items:
+            name = row['name']
+            self._by_type.setdefault(row['type'], {})[name] = None
+            price = _to_number(row['price'])
+            if price is not None:
+                prices.append((price, name))
+            calorie_count = _to_number(row['calories'])
+            if calorie_count is not None:
+                calories.append((calorie_count, name))
+        self._price_index.rebuild(prices)
+        self._calorie_index.rebuild(calories)
+
+    def _put_row(self, row):
+        """Insert a row, or replace the row that already has its name"""
+        slot = self._index.get(row['name'])
+        if slot is None:
+            self._index[row['name']] = len(self._rows)
+            self._rows.append(row)
+            self._record('created', row['name'], None, row)
+        else:
+            before = self._rows[slot]
+            moved = before['type'] != row['type']
+            self._unindex_row(before, keep_type=not moved)
+            self._rows[slot] = row
+            self._record('updated', row['name'], before, row)
+        self._index_row(row)
+        if slot is not None and moved:
+            # The bucket lists names in insertion order, like read_items()
+            bucket = self._by_type[row['type']]
+            self._by_type[row['type']] = dict.fromkeys(sorted(bucket, key=self._index.__getitem__))
+        self._patch_model(row['name'], row)
+        self.revision += 1
+
+    def _put_rows(self, rows):
+        """Insert new rows, re-sorting the indexes once for large batches"""
+        if len(rows) < self.BULK_REINDEX:
+            for row in rows:
+                self._put_row(row)
             return
-        
-        fieldnames = self.items[0].keys()
-        with open(self.csv_path, 'w', newline='') as file:
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(self.items)
+        for row in rows:
+            self._index[row['name']] = len(self._rows)
+            self._rows.append(row)
+            self._patch_model(row['name'], row)
+            if self._search is not None:
+                self._search.add(row)
+            self._record('created', row['name'], None, row)
+        self._rebuild_indexes()
+        self.revision += 1
 
-    def create_item(self, item_type, name, price, description, calories, image_path, size=None):
-        """Create a new menu item"""
-        # Validate item type
-        if item_type not in self.VALID_TYPES:
-            raise ValueError(f"Invalid item type. Must be one of: {', '.join(self.VALID_TYPES)}")
-        
-        # Validate size for drinks
-        if item_type == 'Drink':
-            try:
-                size = int(size)
-                if not (self.MIN_DRINK_SIZE <= size <= self.MAX_DRINK_SIZE):
-                    raise ValueError(f"Drink size must be between {self.MIN_DRINK_SIZE} and {self.MAX_DRINK_SIZE} ounces")
-            except (ValueError, TypeError):
-                raise ValueError(f"Drink size must be a number between {self.MIN_DRINK_SIZE} and {self.MAX_DRINK_SIZE} ounces")
-        elif size is not None:
-            raise ValueError("Size can only be specified for drinks")
-        
-        # Validate price
+    def _remove_row(self, name):
+        """Tombstone a row's slot so deletes never shift the row list"""
+        slot = self._index.pop(name)
+        before = self._rows[slot]
+        self._unindex_row(before)
+        self._rows[slot] = None
+        self._record('deleted', name, before, None)
+        self._patch_model(name)
+        self._deleted += 1
+        self.revision += 1
+        if self._deleted > self.MIN_RECLAIM and self._deleted * 2 > len(self._rows):
+            self._reclaim_slots()
+
+    def _index_row(self, row):
+        """Add a row to the type, price and calorie indexes"""
+        name = row['name']
+        self._by_type.setdefault(row['type'], {})[name] = None
+        price = _to_number(row['price'])
+        if price is not None:
+            self._price_index.add(price, name)
+        calories = _to_number(row['calories'])
+        if calories is not None:
+            self._calorie_index.add(calories, name)
+        if self._search is not None:
+            self._search.add(row)
+
+    def _unindex_row(self, row, keep_type=False):
+        """Remove a row from the type, price and calorie indexes
+
+        With keep_type the row keeps its place in its type bucket, for an
+        update that does not change the type.
+        """
+        name = row['name']
+        bucket = self._by_type.get(row['type'])
+        if bucket is not None and not keep_type:
+            bucket.pop(name, None)
+        price = _to_number(row['price'])
+        if price is not None:
+            self._price_index.remove(price, name)
+        calories = _to_number(row['calories'])
+        if calories is not None:
+            self._calorie_index.remove(calories, name)
+        if self._search is not None:
+            self._search.remove(row)
+
+    def _reclaim_slots(self):
+        """Pack the row list once more than half of it is deleted slots"""
+        self._rows = self._new_row_store(self.items)
+        self._index = {row['name']: slot for slot, row in enumerate(self._rows)}
+        self._deleted = 0
+
+    def _commit(self, changes):
+        """Persist a list of (op, name, row) changes already applied in memory"""
         try:
-            price = float(price)
-            if price <= 0:
-                raise ValueError("Price must be greater than 0")
-        except ValueError:
-            raise ValueError("Price must be a valid number")
-        
-        # Validate calories
+            with self._pending_lock:
+                if self._pending is not None:
+                    self._pending.extend(changes)
+                    return
+            self.backend.write(changes, lambda: self.items)
+            self._version = self.backend.version()
+        finally:
+            # Even a failed write has changed the rows in memory, which is what events describe
+            self._publish()
+
+    def _record(self, kind, name=None, before=None, after=None):
+        """Number a change and add it to the change log; _publish() sends it out"""
+        self.seq += 1
+        event = ChangeEvent(self.seq, kind, name, before, after)
+        self._change_log.append(event)
+        if self._subscribers:
+            self._unpublished.append(event)
+
+    def _publish(self):
+        """Call every subscriber with each event recorded since the last call"""
+        events, self._unpublished = self._unpublished, []
+        for event in events:
+            for callback in self._subscribers:
+                try:
+                    callback(event)
+                except Exception:
+                    # A failing consumer must not undo or block a write that already happened
+                    traceback.print_exc()
+
+    def subscribe(self, callback):
+        """Call callback(event) with a ChangeEvent for every later change, and return it
+
+        Callbacks run on the writing thread once the change is persisted (or, inside
+        deferred(), applied in memory), so they should be quick.
+        """
+        self._subscribers = self._subscribers + (callback,)
+        return callback
+
+    def unsubscribe(self, callback):
+        """Stop calling a subscribed callback"""
+        self._subscribers = tuple(subscriber for subscriber in self._subscribers if subscriber != callback)
+
+    def changes_since(self, seq):
+        """Events numbered after seq, oldest first
+
+        Returns None when some of them have already dropped out of the change log,
+        or when seq is ahead of self.seq, e.g. a cursor kept from before a restart;
+        the consumer should then read the whole menu again and continue from self.seq.
+        """
+        if seq > self.seq:
+            return None
+        if seq == self.seq:
+            return []
+        if not self._change_log or self._change_log[0].seq > seq + 1:
+            return None
+        return list(islice(self._change_log, seq + 1 - self._change_log[0].seq, None))
+
+    @contextlib.contextmanager
+    def deferred(self):
+        """Hold writes in memory and persist them with one flush when the block exits
+
+        flush() may also be called inside the block, e.g. from another thread, to
+        persist what is pending so far. Nested blocks join the outermost one.
+        """
+        if self._lock is not None:
+            raise ValueError("Deferred writes are not supported on concurrent menus")
+        if self._pending is not None:
+            yield self
+            return
+        self._pending = []
         try:
-            calories = int(calories)
-            if calories <= 0:
-                raise ValueError("Calories must be greater than 0")
-        except ValueError:
-            raise ValueError("Calories must be a valid integer")
+            yield self
+        finally:
+            try:
+                self.flush()
+            finally:
+                self._pending = None
+
+    def flush(self):
+        """Persist the writes held back by deferred() and return how many there were"""
+        with self._flush_lock:
+            with self._pending_lock:
+                if not self._pending:
+                    return 0
+                changes, self._pending = self._pending, []
+            try:
+                self.backend.write(changes, lambda: self.items)
+            except BaseException:
+                # Keep the changes pending so a later flush writes them
+                with self._pending_lock:
+                    if self._pending is not None:
+                        self._pending[:0] = changes
+                raise
+            self._version = self.backend.version()
+            return len(changes)
+
+    @_exclusive
+    def compact(self):
+        """Fold the backend's pending log into its snapshot"""
+        self._ensure_loaded()
+        self.backend.compact(self.items)
+        self._version = self.backend.version()
+
+    @_exclusive
+    def close(self):
+        """Compact any pending changes and release the storage backend"""
+        self.flush()
+        if self._lazy_index is None:
+            self.compact()
+        self.backend.close()
+        if self.metrics_path:
+            self.dump_metrics()
+
+    def stats(self):
+        """Snapshot of call counts, latency histograms and bytes read and written
+
+        Returns None unless the menu was created with instrument=True.
+        """
+        if self.metrics is None:
+            return None
+        return self.metrics.snapshot(self.backend)
+
+    def dump_metrics(self, path=None):
+        """Write the metrics in Prometheus text format to path (default: metrics_path)"""
+        if self.metrics is None:
+            raise ValueError("Metrics are only recorded when the menu is created with instrument=True")
+        self.metrics.dump(path or self.metrics_path, self.backend)
+
+    def _validate_item(self, item_type, name, price, description, calories, image_path, size=None):
+        """Validate the fields of a new item and return its row"""
+        return schema.schema_for(item_type).row(name=name, price=price, description=description,
+                                                 calories=calories, image_path=image_path, size=size)
+
+    def _validate_update(self, item, changes):
+        """Validate changes to an existing item and return the updated row
+
+        The item with the changes applied is checked as a whole against the
+        schema of its (possibly new) type; fields that did not change keep
+        their stored text.
+        """
+        changes = dict(changes)
+        item_type = changes.pop('item_type', changes.pop('type', item['type']))
+        item_schema = schema.schema_for(item_type)
+        merged = {key: item.get(key) for key in item_schema.fields}
+        if item_schema.fields['size'] is schema.NO_SIZE:
+            merged['size'] = None  # a stored drink size is dropped; only one passed in changes is checked
+        merged.update((key, value) for key, value in changes.items() if key in merged)
+        stored = item_schema.row(**merged)
+
+        changed = set(changes)
+        if item_type != item['type']:
+            changed.add('size')  # only drinks keep a size
+        updated = dict(item, type=item_type)
+        for key in changed & stored.keys():
+            updated[key] = stored[key]
+        return updated
+
+    @_exclusive
+    def create_item(self, item_type, name, price, description, calories, image_path, size=None):
+        """Create a new menu item"""
+        self._ensure_loaded()
+        new_item = self._validate_item(item_type, name, price, description, calories, image_path, size)
         
         # Check for duplicate names
-        if any(item['name'] == name for item in self.items):
+        if name in self._index:
             raise ValueError(f"Item with name '{name}' already exists")
         
-        new_item = {
-            'type': item_type,
-            'name': name,
-            'price': str(price),
-            'description': description,
-            'calories': str(calories),
-            'image_path': image_path,
-            'size': str(size) if size is not None else None
-        }
-        
-        self.items.append(new_item)
-        self._save_items()
+        self._put_row(new_item)
+        self._commit([('create', name, new_item)])
         return new_item
 
+    @_exclusive
+    def create_items(self, items, skip_invalid=False):
+        """Create many menu items with one validation pass and one write
+
+        items is an iterable of dicts with the keyword arguments of create_item;
+        rows read from a CSV file (with 'type' instead of 'item_type') also work.
+        Returns (created rows, errors) where errors is a list of (position, message).
+        Unless skip_invalid is set, any error raises BatchError and nothing is created.
+        """
+        self._ensure_loaded()
+        # Validated a column at a time; rows come back grouped by type and are put back in order
+        items = list(items)
+        records, kept, errors = [], [], []
+        for position, fields in enumerate(items):
+            if isinstance(fields, Mapping):
+                records.append(creation_fields(fields))
+                kept.append(position)
+            else:  # e.g. a JSON line holding a list
+                errors.append((position, "Item must be a mapping of fields"))
+        batches, failed = schema.validate_rows(records, 'item_type')
+        errors.extend((kept[offset], message) for offset, message in failed)
+        validated = [None] * len(items)
+        for item_schema, offsets, columns in batches:
+            for offset, new_item in zip(offsets, item_schema.rows(columns)):
+                validated[kept[offset]] = new_item
+        return self._create_validated([(position, new_item) for position, new_item in enumerate(validated)
+                                       if new_item is not None], errors, skip_invalid)
+
+    @_exclusive
+    def create_validated_items(self, rows, errors=(), skip_invalid=False):
+        """Create items from rows the item schemas have already checked
+
+        rows is a list of (position, row) in position order, e.g. from
+        parallel_io.import_items(), and errors the (position, message) of rows
+        that failed. Names already on the menu or repeated in rows are still
+        rejected. Returns (created rows, errors) like create_items.
+        """
+        self._ensure_loaded()
+        return self._create_validated(rows, errors, skip_invalid)
+
+    def _create_validated(self, rows, errors, skip_invalid):
+        errors = list(errors)
+        new_items, seen = [], set()
+        for position, new_item in rows:
+            if new_item['name'] in self._index or new_item['name'] in seen:
+                errors.append((position, f"Item with name '{new_item['name']}' already exists"))
+                continue
+            seen.add(new_item['name'])
+            new_items.append(new_item)
+        errors.sort(key=lambda error: error[0])
+
+        if errors and not skip_invalid:
+            raise BatchError(errors)
+        self._put_rows(new_items)
+        if new_items:
+            self._commit([('create', item['name'], item) for item in new_items])
+        return new_items, errors
+
+    @_synchronized
     def read_items(self):
         """Get all menu items"""
+        self._ensure_loaded()
         return self.items
 
+    def iter_items(self):
+        """Yield menu items in order; a lazy menu streams them from the file"""
+        if self._lazy_index is not None:
+            yield from self.backend.load()
+            return
+        for row in self._rows:
+            if row is not None:
+                yield row
+
+    @_synchronized
     def read_item(self, name):
         """Get a specific menu item by name"""
-        for item in self.items:
-            if item['name'] == name:
-                return item
-        return None
+        if self._lazy_index is not None:
+            return self._lazy_index.get(name)
+        slot = self._index.get(name)
+        if slot is None:
+            return None
+        return self._rows[slot]
+
+    @_synchronized
+    def search(self, text, limit=10):
+        """Get up to limit items whose name or description matches text, best match first
+
+        Every word of text must match a word of the item exactly, as a prefix
+        ("choc" finds "chocolate") or, failing both, within a couple of typos.
+        """
+        self._ensure_loaded()
+        if self._search is None:
+            self._search = SearchIndex()
+            for row in self.items:
+                self._search.add(row)
+        return [self._rows[self._index[name]] for _, name in self._search.search(text, limit)]
+
+    @_synchronized
+    def query(self, type=None, price_min=None, price_max=None, calories_min=None, calories_max=None,
+              sort_by=None, descending=False, limit=None):
+        """Get menu items matching all of the given filters
+
+        The smallest matching index (type bucket, price range or calorie range)
+        drives the scan and the other filters are checked per candidate. Results are
+        in insertion order unless sort_by is given; when sorting by an indexed field
+        the scan stops after limit matches.
+        """
+        if sort_by is not None and sort_by not in self.SORTABLE_FIELDS:
+            raise ValueError(f"Invalid sort field. Must be one of: {', '.join(self.SORTABLE_FIELDS)}")
+        self._ensure_loaded()
+
+        ranges = {
+            'price': (self._price_index, price_min, price_max),
+            'calories': (self._calorie_index, calories_min, calories_max),
+        }
+        # Each candidate source is (size, field it is sorted by, names)
+        sources = []
+        if type is not None:
+            bucket = self._by_type.get(type, {})
+            sources.append((len(bucket), None, bucket))
+        for field, (index, low, high) in ranges.items():
+            if low is not None or high is not None or (sort_by == field and not sources):
+                start, stop = index.span(low, high)
+                sources.append((stop - start, field, index.names(start, stop, descending and sort_by == field)))
+        if not sources:
+            sources.append((len(self._index), None, self._index))
+        _, ordered_by, names = min(sources, key=lambda source: source[0])
 
+        def matches(row):
+            if type is not None and row['type'] != type:
+                return False
+            for field, (_, low, high) in ranges.items():
+                if low is None and high is None:
+                    continue
+                value = _to_number(row[field])
+                if value is None or (low is not None and value < low) or (high is not None and value > high):
+                    return False
+            return True
+
+        results = []
+        for name in names:
+            row = self._rows[self._index[name]]
+            if matches(row):
+                results.append(row)
+                if sort_by == ordered_by and limit is not None and len(results) >= limit:
+                    break
+
+        if sort_by != ordered_by:
+            if sort_by is None:
+                results.sort(key=lambda row: self._index[row['name']])
+            elif sort_by == 'name':
+                results.sort(key=lambda row: row['name'], reverse=descending)
+            else:
+                results.sort(key=lambda row: _to_number(row[sort_by]) or 0, reverse=descending)
+        return results if limit is None else results[:limit]
+
+    @_exclusive
     def update_item(self, name, **kwargs):
         """Update a menu item"""
-        for item in self.items:
-            if item['name'] == name:
-                # Validate type if being updated
-                if 'item_type' in kwargs:
-                    if kwargs['item_type'] not in self.VALID_TYPES:
-                        raise ValueError(f"Invalid item type. Must be one of: {', '.join(self.VALID_TYPES)}")
-                
-                # Validate size if being updated
-                if 'size' in kwargs:
-                    if item['type'] == 'Drink':
-                        try:
-                            size = int(kwargs['size'])
-                            if not (self.MIN_DRINK_SIZE <= size <= self.MAX_DRINK_SIZE):
-                                raise ValueError(f"Drink size must be between {self.MIN_DRINK_SIZE} and {self.MAX_DRINK_SIZE} ounces")
-                        except (ValueError, TypeError):
-                            raise ValueError(f"Drink size must be a number between {self.MIN_DRINK_SIZE} and {self.MAX_DRINK_SIZE} ounces")
-                    else:
-                        raise ValueError("Size can only be specified for drinks")
-                
-                # Update fields
-                for key, value in kwargs.items():
-                    if key in item:
-                        item[key] = str(value) if isinstance(value, (int, float)) else value
-                self._save_items()
-                return item
-        raise ValueError(f"Item with name '{name}' not found")
+        self._ensure_loaded()
+        item = self.read_item(name)
+        if item is None:
+            raise ItemNotFound(f"Item with name '{name}' not found")
+        updated = self._validate_update(item, kwargs)
+        
+        # Update fields
+        self._put_row(updated)
+        self._commit([('update', name, dict(updated))])
+        return updated
+
+    @_exclusive
+    def update_items(self, updates, skip_invalid=False):
+        """Update many menu items with one validation pass and one write
+
+        updates is an iterable of dicts holding the item 'name' plus the fields
+        to change. Returns (updated rows, errors) like create_items.
+        """
+        self._ensure_loaded()
+        staged, errors = {}, []
+        for position, fields in enumerate(updates):
+            changes = dict(fields)
+            name = changes.pop('name', None)
+            try:
+                item = staged.get(name) or self.read_item(name)
+                if item is None:
+                    raise ItemNotFound(f"Item with name '{name}' not found")
+                staged[name] = self._validate_update(item, changes)
+            except (TypeError, ValueError) as e:
+                errors.append((position, str(e)))
 
+        if errors and not skip_invalid:
+            raise BatchError(errors)
+        updated = list(staged.values())
+        for row in updated:
+            self._put_row(row)
+        if updated:
+            self._commit([('update', item['name'], dict(item)) for item in updated])
+        return updated, errors
+
+    @_exclusive
     def delete_item(self, name):
         """Delete a menu item"""
-        for i, item in enumerate(self.items):
-            if item['name'] == name:
-                del self.items[i]
-                self._save_items()
-                return True
-        raise ValueError(f"Item with name '{name}' not found")
+        self._ensure_loaded()
+        if name not in self._index:
+            raise ItemNotFound(f"Item with name '{name}' not found")
+        self._remove_row(name)
+        self._commit([('delete', name, None)])
+        return True
 
-    def get_menu_models(self):
-        """Convert CSV items to model objects with O(n) complexity"""
-        menu_items = {}
-        for item in self.items:
-            try:
-                menu_item = None
-                if item['type'] == 'Drink':
-                    menu_item = models.Drink(
-                        name=item['name'],
-                        price=float(item['price']),
-                        description=item['description'],
-                        size=int(item['size']),
-                        calories=int(item['calories']),
-                        image_path=item['image_path']
-                    )
-                elif item['type'] == 'Entree':
-                    menu_item = models.Entree(
-                        name=item['name'],
-                        price=float(item['price']),
-                        description=item['description'],
-                        calories=int(item['calories']),
-                        image_path=item['image_path']
-                    )
-                elif item['type'] == 'Dessert':
-                    menu_item = models.Dessert(
-                        name=item['name'],
-                        price=float(item['price']),
-                        description=item['description'],
-                        calories=int(item['calories']),
-                        image_path=item['image_path']
-                    )
-                
-                if menu_item:
-                    menu_items[menu_item.name] = menu_item
-            except (KeyError, ValueError) as e:
-                print(f"Error processing item {item.get('name', 'unknown')}: {e}")
+    @_exclusive
+    def delete_items(self, names, skip_invalid=False):
+        """Delete many menu items with one write
+
+        Returns (deleted names, errors) like create_items.
+        """
+        self._ensure_loaded()
+        deleted, errors = [], []
+        seen = set()
+        for position, name in enumerate(names):
+            if name not in self._index or name in seen:
+                errors.append((position, f"Item with name '{name}' not found"))
                 continue
-                
-        return menu_items 
\ No newline at end of file
+            seen.add(name)
+            deleted.append(name)
+
+        if errors and not skip_invalid:
+            raise BatchError(errors)
+        for name in deleted:
+            self._remove_row(name)
+        if deleted:
+            self._commit([('delete', name, None) for name in deleted])
+        return deleted, errors
+
+    @_synchronized
+    def get_menu_models(self):
+        """Get model objects for all items, keyed by name
+
+        The dictionary is built once and then patched by every create, update
+        and delete, so calling this after a single edit is O(1). It is shared
+        between calls and should be treated as read-only.
+        """
+        self._ensure_loaded()
+        if self._models is None:
+            # Built aside and published whole, so readers on other threads never see it half full
+            rows = self.items
+            slots = [None] * len(rows)
+            batches, errors = schema.validate_rows(rows)
+            for item_schema, positions, columns in batches:
+                model_class = self.MODEL_TYPES[item_schema.name]
+                for position, menu_item in zip(positions, map(model_class.from_valid, *columns.values())):
+                    slots[position] = menu_item
+            for position, message in errors:
+                self._report_invalid(rows[position], message)
+            self._models = {menu_item.name: menu_item for menu_item in slots if menu_item is not None}
+        return self._models
+
+    def _to_model(self, item):
+        """Convert a CSV item to its model object, or None if it is invalid"""
+        batches, errors = schema.validate_rows([item])
+        for item_schema, _, columns in batches:
+            if columns['name']:
+                return self.MODEL_TYPES[item_schema.name].from_valid(*(values[0] for values in columns.values()))
+        for _, message in errors:
+            self._report_invalid(item, message)
+        return None
+
+    @staticmethod
+    def _report_invalid(item, message):
+        print(f"Error processing item {item.get('name', 'unknown')}: {message}")
+
+    def _patch_model(self, name, item=None):
+        """Keep the cached models in step with a changed (or deleted) item"""
+        if self._models is None:
+            return
+        menu_item = self._to_model(item) if item is not None else None
+        if menu_item:
+            self._models[name] = menu_item
+        else:
+            self._models.pop(name, None)
@@ -0,0 +1,76 @@
+'''
+This module provides atomic file replacement and the fsync policies used by
+the storage backends.
+
+Files are rewritten through a temporary file in the same directory that is
+renamed over the original, so readers and crashes only ever see the old or
+the new contents. How often data is forced to disk is a trade between
+durability and throughput:
+
+    always    fsync on every write (the default)
+    batched   fsync at most once every `interval` seconds
+    never     leave flushing to the operating system
+'''
+
+import os
+import stat
+import time
+
+FSYNC_POLICIES = ['always', 'batched', 'never']
+FSYNC_INTERVAL = 1.0  # seconds between fsyncs under the batched policy
+
+
+class FsyncPolicy:
+    def __init__(self, policy='always', interval=FSYNC_INTERVAL):
+        if policy not in FSYNC_POLICIES:
+            raise ValueError(f"Invalid fsync policy. Must be one of: {', '.join(FSYNC_POLICIES)}")
+        self.policy = policy
+        self.interval = interval
+        self._last_sync = time.monotonic()
+
+    def due(self):
+        """Return True if this write should be fsynced"""
+        if self.policy == 'always':
+            return True
+        if self.policy == 'never':
+            return False
+        now = time.monotonic()
+        if now - self._last_sync >= self.interval:
+            self._last_sync = now
+            return True
+        return False
+
+
+def atomic_write(path, write, sync=True, binary=False):
+    """Replace path with the text (or bytes) write(file) produces, via a temp file and os.replace"""
+    import tempfile  # deferred: it pulls in shutil and random, which most imports never need
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with (os.fdopen(fd, 'wb') if binary else os.fdopen(fd, 'w', newline='')) as file:
+            write(file)
+            file.flush()
+            if sync:
+                os.fsync(file.fileno())
+        try:
+            os.chmod(temp_path, stat.S_IMODE(os.stat(path).st_mode))
+        except FileNotFoundError:
+            os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    if sync:
+        sync_directory(directory)
+
+
+def sync_directory(directory):
+    """Make a rename in directory durable, where the platform supports it"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,57 @@
+'''
+This module provides the secondary indexes used by the Menu class.
+
+A SortedIndex keeps (key, name) pairs ordered with bisect so range
+queries such as "price between 2 and 5" only touch matching items.
+'''
+
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+
+
+class SortedIndex:
+    def __init__(self):
+        self._pairs = []  # (key, name) sorted, keeps equal keys in a stable order
+        self._keys = []  # keys parallel to self._pairs for range lookups
+
+    def add(self, key, name):
+        """Index a name under a numeric key"""
+        i = bisect_left(self._pairs, (key, name))
+        self._pairs.insert(i, (key, name))
+        self._keys.insert(i, key)
+
+    def rebuild(self, pairs, presorted=False):
+        """Replace the contents with (key, name) pairs in a single sort
+
+        With presorted=True the pairs are taken as already in (key, name) order.
+        """
+        if presorted:
+            self._pairs = list(pairs)
+        else:
+            # Two stable single-field sorts order the pairs like sorted(pairs) but
+            # avoid comparing whole tuples, which is several times slower
+            self._pairs = sorted(pairs, key=itemgetter(1))
+            self._pairs.sort(key=itemgetter(0))
+        self._keys = [key for key, _ in self._pairs]
+
+    def remove(self, key, name):
+        """Remove a name previously added under key"""
+        i = bisect_left(self._pairs, (key, name))
+        if i < len(self._pairs) and self._pairs[i] == (key, name):
+            del self._pairs[i]
+            del self._keys[i]
+
+    def span(self, low=None, high=None):
+        """Return the (start, stop) positions of keys within [low, high]"""
+        start = 0 if low is None else bisect_left(self._keys, low)
+        stop = len(self._keys) if high is None else bisect_right(self._keys, high)
+        return start, max(start, stop)
+
+    def names(self, start, stop, descending=False):
+        """Yield names between two positions returned by span()"""
+        positions = range(stop - 1, start - 1, -1) if descending else range(start, stop)
+        for i in positions:
+            yield self._pairs[i][1]
+
+    def __len__(self):
+        return len(self._pairs)
@@ -0,0 +1,68 @@
+'''
+This module provides an append-only journal for menu mutations.
+
+Each create, update and delete is written as one JSON line instead of
+rewriting the whole CSV file. The Menu class replays the journal on
+startup and compacts it back into the CSV snapshot once it grows.
+'''
+
+import json
+import os
+
+
+class Journal:
+    def __init__(self, path, fsync_policy=None):
+        self.path = path
+        self.fsync_policy = fsync_policy  # a durability.FsyncPolicy, or None to only flush
+        self._file = None
+        self.entries = 0
+        self.refresh()
+
+    def refresh(self):
+        """Re-read the entry count, e.g. after another process compacted the journal"""
+        self.close()
+        self.entries = sum(1 for _ in self.replay())
+
+    def append(self, op, name, row=None):
+        """Append a single mutation to the journal"""
+        self.append_many([(op, name, row)])
+
+    def append_many(self, changes):
+        """Append several mutations with a single flush, returning the characters written"""
+        if self._file is None:
+            self._file = open(self.path, 'a', newline='')
+        lines = ''.join(json.dumps({'op': op, 'name': name, 'row': row}) + '\n' for op, name, row in changes)
+        self._file.write(lines)
+        self.entries += len(changes)
+        self._file.flush()
+        if self.fsync_policy is not None and self.fsync_policy.due():
+            os.fsync(self._file.fileno())
+        return len(lines)
+
+    def replay(self):
+        """Yield journal entries in the order they were written"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', newline='') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-append is ignored
+                    break
+                yield entry
+
+    def truncate(self):
+        """Discard all entries once they have been compacted"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.entries = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __len__(self):
+        return self.entries
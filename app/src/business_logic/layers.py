@@ -0,0 +1,320 @@
+'''
+This module provides layered menus for chains with many locations.
+
+Every location shares one base Menu. A location keeps only what it changes
+in an OverrideLayer: a small CSV file with a row per overridden item holding
+a price, a drink size and whether the item is available. LayeredMenu
+resolves the base rows through the overrides when they are read, so a
+chain-wide price change is a single base.update_item() and a location costs
+memory and disk in proportion to its overrides, not to the catalog.
+
+LayeredMenu reads like a Menu (read_item, read_items, query, search,
+get_menu_models) and changes overrides with Menu's update semantics: the
+item schemas validate them, errors raise ValueError and batches raise
+BatchError. Items, types, names and descriptions are only changed on the
+base menu.
+
+MenuRegistry hands out one LayeredMenu per location, loading its override
+file on first use and keeping the most recently used ones in an LRU cache:
+
+    registry = MenuRegistry(Menu('app/items.csv'), 'app/locations')
+    registry.get('downtown').update_item('Burger', price=10.49)
+'''
+
+import copy
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from .crud import BatchError, ItemNotFound, Menu, _to_number
+from .schema import ITEM, SCHEMAS
+from .storage import CsvBackend
+
+OVERRIDE_FIELDS = ['price', 'size', 'available']
+DEFAULT_CAPACITY = 64  # locations kept resolved in a MenuRegistry
+LOCATION_PATTERN = re.compile(r'[A-Za-z0-9_-]+')
+
+
+class OverrideLayer:
+    FIELDNAMES = ['name'] + OVERRIDE_FIELDS  # '' leaves the base value; available is '0' or ''
+
+    def __init__(self, path, journaled=False, fsync='always'):
+        self.path = path
+        self.backend = CsvBackend(path, journaled, fsync=fsync, snapshot=False, fieldnames=self.FIELDNAMES)
+        self._overrides = {}  # item name -> override row
+        for row in self.backend.load():
+            self._overrides[row['name']] = {field: row.get(field) or '' for field in self.FIELDNAMES}
+        if self.backend.recovered:
+            self.backend.compact(list(self._overrides.values()))
+        self.revision = 0
+
+    def get(self, name):
+        """The override row for an item, or None"""
+        return self._overrides.get(name)
+
+    def __len__(self):
+        return len(self._overrides)
+
+    def hidden(self):
+        """Number of items made unavailable"""
+        return sum(1 for row in self._overrides.values() if row['available'] == '0')
+
+    def overrides_prices(self):
+        """True if any item has a price override"""
+        return any(row['price'] for row in self._overrides.values())
+
+    def put(self, rows):
+        """Store override rows with one write; rows that override nothing are dropped"""
+        changes = []
+        for row in rows:
+            name = row['name']
+            if not any(row[field] for field in OVERRIDE_FIELDS):
+                if self._overrides.pop(name, None) is not None:
+                    changes.append(('delete', name, None))
+                continue
+            changes.append(('update' if name in self._overrides else 'create', name, dict(row)))
+            self._overrides[name] = row
+        if changes:
+            self.revision += 1
+            self.backend.write(changes, lambda: list(self._overrides.values()))
+
+    def close(self):
+        self.backend.compact(list(self._overrides.values()))
+        self.backend.close()
+
+
+class LayeredMenu:
+    def __init__(self, base, layer, location=None):
+        self.base = base
+        self.layer = layer
+        self.location = location
+        self._resolved = None  # (revision, resolved rows) of the last read_items()
+        self._models = None  # (revision, models) of the last get_menu_models()
+
+    @property
+    def revision(self):
+        """Changes when the base menu or the overrides do, like Menu.revision"""
+        return self.base.revision, self.layer.revision
+
+    def _resolve(self, row):
+        """The row as this location sees it, or None if it is unavailable here"""
+        override = self.layer.get(row['name'])
+        if override is None:
+            return row
+        if override['available'] == '0':
+            return None
+        resolved = dict(row)
+        if override['price']:
+            resolved['price'] = override['price']
+        if override['size'] and row['type'] == 'Drink':
+            resolved['size'] = override['size']
+        return resolved
+
+    def read_item(self, name):
+        """Get a specific menu item by name, with this location's overrides"""
+        row = self.base.read_item(name)
+        return None if row is None else self._resolve(row)
+
+    def read_items(self):
+        """Get every menu item available at this location"""
+        revision = self.revision
+        if self._resolved is None or self._resolved[0] != revision:
+            resolved = [self._resolve(row) for row in self.base.read_items()]
+            self._resolved = (revision, [row for row in resolved if row is not None])
+        return list(self._resolved[1])
+
+    def query(self, type=None, price_min=None, price_max=None, calories_min=None, calories_max=None,
+              sort_by=None, descending=False, limit=None):
+        """Get items matching all of the given filters, like Menu.query
+
+        The base menu's indexes answer the query unless it filters or sorts by
+        price and this location overrides a price; then the resolved items are
+        scanned.
+        """
+        if sort_by is not None and sort_by not in Menu.SORTABLE_FIELDS:
+            raise ValueError(f"Invalid sort field. Must be one of: {', '.join(Menu.SORTABLE_FIELDS)}")
+        by_price = price_min is not None or price_max is not None or sort_by == 'price'
+        if not (by_price and self.layer.overrides_prices()):
+            hidden = self.layer.hidden()
+            rows = self.base.query(type, price_min, price_max, calories_min, calories_max, sort_by,
+                                   descending, None if limit is None else limit + hidden)
+            rows = [row for row in map(self._resolve, rows) if row is not None]
+            return rows if limit is None else rows[:limit]
+
+        ranges = {'price': (price_min, price_max), 'calories': (calories_min, calories_max)}
+
+        def matches(row):
+            if type is not None and row['type'] != type:
+                return False
+            for field, (low, high) in ranges.items():
+                if low is None and high is None:
+                    continue
+                value = _to_number(row[field])
+                if value is None or (low is not None and value < low) or (high is not None and value > high):
+                    return False
+            return True
+
+        rows = [row for row in self.read_items() if matches(row)]
+        if sort_by == 'name':
+            rows.sort(key=lambda row: row['name'], reverse=descending)
+        elif sort_by is not None:
+            # Ties ordered by name, as Menu's sorted indexes order them
+            rows.sort(key=lambda row: (_to_number(row[sort_by]) or 0, row['name']), reverse=descending)
+        return rows if limit is None else rows[:limit]
+
+    def search(self, text, limit=10):
+        """Get up to limit items available here that match text, like Menu.search"""
+        rows = self.base.search(text, limit + self.layer.hidden())
+        return [row for row in map(self._resolve, rows) if row is not None][:limit]
+
+    def get_menu_models(self):
+        """Get model objects for the items available here, keyed by name
+
+        Items without overrides share the base menu's model objects. Treat the
+        dictionary as read-only.
+        """
+        revision = self.revision
+        if self._models is None or self._models[0] != revision:
+            built = dict(self.base.get_menu_models())
+            for name in list(built):
+                override = self.layer.get(name)
+                if override is None:
+                    continue
+                if override['available'] == '0':
+                    del built[name]
+                    continue
+                menu_item = copy.copy(built[name])
+                if override['price']:
+                    menu_item.price = float(override['price'])
+                if override['size'] and hasattr(menu_item, 'size'):
+                    menu_item.size = int(override['size'])
+                built[name] = menu_item
+            self._models = (revision, built)
+        return self._models[1]
+
+    def _validate_override(self, name, changes):
+        """Validate price, size and availability changes and return the new override row"""
+        unknown = set(changes) - set(OVERRIDE_FIELDS)
+        if unknown:
+            raise ValueError(f"Only {', '.join(OVERRIDE_FIELDS)} can be set per location, "
+                             f"not: {', '.join(sorted(unknown))}")
+        item = self.base.read_item(name)
+        if item is None:
+            raise ItemNotFound(f"Item with name '{name}' not found")
+        override = dict(self.layer.get(name) or dict.fromkeys(OverrideLayer.FIELDNAMES, ''), name=name)
+
+        # None in changes drops that override and restores the base value
+        validators = SCHEMAS.get(item['type'], ITEM).validators
+        for field in ('price', 'size'):
+            if field in changes:
+                value = changes[field]
+                if value is not None:
+                    value = validators[field](value) if field in validators else value
+                override[field] = '' if value in (None, '') else str(value)
+
+        if 'available' in changes:
+            available = changes['available']
+            if available is not None and available is not True and available is not False:
+                raise ValueError("Available must be True, False or None")
+            override['available'] = '0' if available is False else ''
+        return override
+
+    def update_item(self, name, **changes):
+        """Override price, size or available (True/False) for this location
+
+        Returns the item as this location now sees it, or None if it was made
+        unavailable. Passing None for a field goes back to the base value.
+        """
+        self.layer.put([self._validate_override(name, changes)])
+        return self.read_item(name)
+
+    def update_items(self, updates, skip_invalid=False):
+        """Override many items with one write
+
+        updates is an iterable of dicts holding the item 'name' plus the fields
+        to change. Returns (override rows, errors) like Menu.update_items.
+        """
+        staged, errors = {}, []
+        for position, fields in enumerate(updates):
+            changes = dict(fields)
+            name = changes.pop('name', None)
+            try:
+                override = self._validate_override(name, changes)
+            except (TypeError, ValueError) as e:
+                errors.append((position, str(e)))
+                continue
+            if name in staged:
+                override = dict(staged[name], **{field: override[field] for field in changes})
+            staged[name] = override
+
+        if errors and not skip_invalid:
+            raise BatchError(errors)
+        self.layer.put(staged.values())
+        return list(staged.values()), errors
+
+    def reset_item(self, name):
+        """Drop every override of an item at this location"""
+        self.layer.put([dict.fromkeys(OverrideLayer.FIELDNAMES, '') | {'name': name}])
+
+    def close(self):
+        self.layer.close()
+
+
+class MenuRegistry:
+    def __init__(self, base, directory, capacity=DEFAULT_CAPACITY, journaled=False, fsync='always'):
+        if capacity < 1:
+            raise ValueError("Capacity must be at least 1")
+        self.base = base
+        self.directory = directory
+        self.capacity = capacity
+        self.journaled = journaled
+        self.fsync = fsync
+        self._views = OrderedDict()  # location -> LayeredMenu, least recently used first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, location):
+        """The LayeredMenu of a location, loading its overrides on first use
+
+        Loading one more location than the capacity evicts the least recently
+        used one, so hold on to a view only while handling one request.
+        """
+        if not LOCATION_PATTERN.fullmatch(location):
+            raise ValueError("Location names may only contain letters, digits, '-' and '_'")
+        with self._lock:
+            view = self._views.get(location)
+            if view is not None:
+                self._views.move_to_end(location)
+                self.hits += 1
+                return view
+            self.misses += 1
+            os.makedirs(self.directory, exist_ok=True)
+            layer = OverrideLayer(self.path(location), self.journaled, self.fsync)
+            view = self._views[location] = LayeredMenu(self.base, layer, location)
+            while len(self._views) > self.capacity:
+                _, evicted = self._views.popitem(last=False)
+                evicted.close()
+            return view
+
+    def path(self, location):
+        """The override file of a location"""
+        return os.path.join(self.directory, f"{location}.csv")
+
+    def locations(self):
+        """Every location that has an override file"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(entry[:-len('.csv')] for entry in os.listdir(self.directory)
+                      if entry.endswith('.csv') and LOCATION_PATTERN.fullmatch(entry[:-len('.csv')]))
+
+    def __len__(self):
+        return len(self._views)
+
+    def close(self):
+        """Write out and release every loaded location"""
+        with self._lock:
+            while self._views:
+                _, view = self._views.popitem(last=False)
+                view.close()
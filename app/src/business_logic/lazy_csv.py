@@ -0,0 +1,71 @@
+'''
+This module provides the offset index behind the lazy Menu loader.
+
+Opening a Menu with lazy=True records only the byte offset of each row
+keyed by item name. Rows are parsed from the file when they are looked up,
+so read-only tools can open very large menu files quickly.
+'''
+
+import csv
+import io
+
+
+class CsvOffsetIndex:
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+        self.fieldnames = []
+        self._offsets = {}  # item name -> (byte offset, byte length) of its row
+        self._scan()
+
+    def _scan(self):
+        """Record where every row starts without building row dicts"""
+        try:
+            file = open(self.csv_path, 'rb')
+        except FileNotFoundError:
+            return
+        with file:
+            header = file.readline()
+            if not header:
+                return
+            self.fieldnames = next(csv.reader([header.decode()]))
+            name_column = self.fieldnames.index('name')
+            offset = len(header)
+            for record in _records(file):
+                if record.strip():
+                    if b'"' in record:
+                        name = next(csv.reader(io.StringIO(record.decode())))[name_column]
+                    else:
+                        name = record.rstrip(b'\r\n').split(b',')[name_column].decode()
+                    self._offsets[name] = (offset, len(record))
+                offset += len(record)
+
+    def get(self, name):
+        """Parse and return the row for name, or None if it is not in the file"""
+        location = self._offsets.get(name)
+        if location is None:
+            return None
+        offset, length = location
+        with open(self.csv_path, 'rb') as file:
+            file.seek(offset)
+            record = file.read(length).decode()
+        row = dict.fromkeys(self.fieldnames)
+        row.update(zip(self.fieldnames, next(csv.reader(io.StringIO(record)))))
+        return row
+
+    def __contains__(self, name):
+        return name in self._offsets
+
+    def __len__(self):
+        return len(self._offsets)
+
+
+def _records(file):
+    """Yield raw CSV records, joining lines that end inside a quoted field"""
+    record = b''
+    for line in file:
+        record += line
+        if record.count(b'"') % 2 == 0:
+            yield record
+            record = b''
+    if record:
+        yield record
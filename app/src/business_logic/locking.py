@@ -0,0 +1,42 @@
+'''
+This module provides the cross-process lock used by a concurrent Menu.
+
+FileLock takes an advisory fcntl lock on a side file next to the menu data,
+so several CLI and kiosk processes writing the same menu take turns. The
+lock is re-entrant within one process. On platforms without fcntl it only
+counts acquisitions and the in-process lock in Menu is all that applies.
+'''
+
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class FileLock:
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._depth = 0
+
+    def acquire(self):
+        if self._depth == 0 and fcntl is not None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
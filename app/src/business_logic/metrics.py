@@ -0,0 +1,124 @@
+'''
+This module provides the opt-in instrumentation for the Menu class.
+
+Menu(instrument=True) wraps its public methods, _reload, _load_items,
+_load_snapshot, _save_items and _commit on the instance so every call is
+counted and timed into a latency histogram. The storage backend's byte
+counters are read before and after each call, so bytes read and written are
+kept per operation as well as in total; a call counts the bytes of the calls
+it makes, e.g. create_item includes its _commit. A menu created without
+instrument=True is not wrapped at all and pays nothing.
+
+Menu.stats() returns a snapshot as a dict and Menu.dump_metrics() writes the
+same data in the Prometheus text exposition format, e.g. for the node
+exporter's textfile collector.
+'''
+
+import functools
+import threading
+import time
+from bisect import bisect_left
+
+from .durability import atomic_write
+
+LATENCY_BUCKETS = [0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0]  # seconds
+
+
+class MenuMetrics:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = list(buckets)
+        self._operations = {}  # name -> [calls, errors, total seconds, bucket counts, bytes read, bytes written]
+        self._lock = threading.Lock()
+
+    def wrap(self, name, method, backend):
+        """Return method wrapped to record its calls, errors, latency and backend bytes under name"""
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            read, written = backend.bytes_read, backend.bytes_written
+            start = time.perf_counter()
+            failed = True
+            try:
+                result = method(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                self.record(name, time.perf_counter() - start, failed,
+                            backend.bytes_read - read, backend.bytes_written - written)
+        return wrapper
+
+    def record(self, name, seconds, failed=False, bytes_read=0, bytes_written=0):
+        with self._lock:
+            operation = self._operations.get(name)
+            if operation is None:
+                operation = self._operations[name] = [0, 0, 0.0, [0] * (len(self.buckets) + 1), 0, 0]
+            operation[0] += 1
+            operation[1] += failed
+            operation[2] += seconds
+            operation[3][bisect_left(self.buckets, seconds)] += 1
+            operation[4] += bytes_read
+            operation[5] += bytes_written
+
+    def snapshot(self, backend):
+        """Return the metrics as plain data"""
+        with self._lock:
+            operations = {}
+            for name, (calls, errors, total, counts, read, written) in sorted(self._operations.items()):
+                cumulative, histogram = 0, {}
+                for bound, count in zip(self.buckets + [float('inf')], counts):
+                    cumulative += count
+                    histogram[bound] = cumulative
+                operations[name] = {
+                    'calls': calls,
+                    'errors': errors,
+                    'total_seconds': total,
+                    'mean_seconds': total / calls,
+                    'buckets': histogram,
+                    'bytes_read': read,
+                    'bytes_written': written,
+                }
+        return {
+            'operations': operations,
+            'bytes_read': backend.bytes_read,
+            'bytes_written': backend.bytes_written,
+        }
+
+    def prometheus(self, backend):
+        """Return the metrics in the Prometheus text exposition format"""
+        stats = self.snapshot(backend)
+        lines = [
+            '# HELP menu_operation_seconds Latency of Menu operations.',
+            '# TYPE menu_operation_seconds histogram',
+        ]
+        for name, operation in stats['operations'].items():
+            for bound, count in operation['buckets'].items():
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'menu_operation_seconds_bucket{{operation="{name}",le="{le}"}} {count}')
+            lines.append(f'menu_operation_seconds_sum{{operation="{name}"}} {operation["total_seconds"]!r}')
+            lines.append(f'menu_operation_seconds_count{{operation="{name}"}} {operation["calls"]}')
+        lines += [
+            '# HELP menu_operation_errors_total Menu operations that raised.',
+            '# TYPE menu_operation_errors_total counter',
+        ]
+        for name, operation in stats['operations'].items():
+            lines.append(f'menu_operation_errors_total{{operation="{name}"}} {operation["errors"]}')
+        for counter, text in (('bytes_read', 'read from'), ('bytes_written', 'written to')):
+            lines += [
+                f'# HELP menu_operation_{counter}_total Bytes {text} menu storage by Menu operations.',
+                f'# TYPE menu_operation_{counter}_total counter',
+            ]
+            for name, operation in stats['operations'].items():
+                lines.append(f'menu_operation_{counter}_total{{operation="{name}"}} {operation[counter]}')
+        lines += [
+            '# HELP menu_bytes_read_total Bytes read from menu storage.',
+            '# TYPE menu_bytes_read_total counter',
+            f"menu_bytes_read_total {stats['bytes_read']}",
+            '# HELP menu_bytes_written_total Bytes written to menu storage.',
+            '# TYPE menu_bytes_written_total counter',
+            f"menu_bytes_written_total {stats['bytes_written']}",
+        ]
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path, backend):
+        """Atomically write the Prometheus text to path"""
+        text = self.prometheus(backend)
+        atomic_write(path, lambda file: file.write(text), sync=False)
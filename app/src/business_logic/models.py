@@ -1,12 +1,28 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from . import schema
+
 class MenuItem:
+    __slots__ = ('name', 'price', 'description', 'image_path', 'calories')
+    SCHEMA = schema.ITEM
+
     def __init__(self, name:str, price:float, description:str, image_path:str, calories:int):
-        if not name:
-            raise ValueError("Name cannot be empty")
-        if price < 0:
-            raise ValueError("Price cannot be negative")
-        if calories < 0:
-            raise ValueError("Calories cannot be negative")
-            
+        values = self.SCHEMA.validate(name=name, price=price, description=description,
+                                      calories=calories, image_path=image_path)
+        self._assign(**values)
+
+    @classmethod
+    def from_valid(cls, name, price, description, calories, image_path, size=None):
+        """Build an item from values its schema has already parsed and checked"""
+        menu_item = object.__new__(cls)
+        menu_item.name = name
+        menu_item.price = price
+        menu_item.description = description
+        menu_item.image_path = image_path
+        menu_item.calories = calories
+        return menu_item
+
+    def _assign(self, name, price, description, calories, image_path, size=None):
         self.name = name
         self.price = price
         self.description = description
@@ -17,25 +33,33 @@ class MenuItem:
         return f"name: {self.name} - price: {self.price:.2f} - description: {self.description} - calories: {self.calories}"
 
 class Drink(MenuItem):
-    MIN_SIZE = 8  # minimum size in ounces
-    MAX_SIZE = 44  # maximum size in ounces
+    __slots__ = ('size',)
+    SCHEMA = schema.SCHEMAS['Drink']
+    MIN_SIZE = schema.MIN_DRINK_SIZE  # minimum size in ounces
+    MAX_SIZE = schema.MAX_DRINK_SIZE  # maximum size in ounces
     
     def __init__(self, name:str, price:float, description:str, size:int, calories:int, image_path:str):
-        try:
-            size = int(size)
-        except (ValueError, TypeError):
-            raise ValueError("Size must be an integer")
-            
-        if not (self.MIN_SIZE <= size <= self.MAX_SIZE):
-            raise ValueError(f"Size must be between {self.MIN_SIZE} and {self.MAX_SIZE} ounces")
-            
-        super().__init__(name, price, description, image_path, calories)
+        values = self.SCHEMA.validate(name=name, price=price, description=description,
+                                      calories=calories, image_path=image_path, size=size)
+        self._assign(**values)
+
+    @classmethod
+    def from_valid(cls, name, price, description, calories, image_path, size=None):
+        menu_item = super().from_valid(name, price, description, calories, image_path)
+        menu_item.size = size
+        return menu_item
+
+    def _assign(self, name, price, description, calories, image_path, size=None):
+        super()._assign(name, price, description, calories, image_path)
         self.size = size
 
     def __str__(self):
         return f"name: {self.name} - size: {self.size}oz - price: {self.price:.2f} - description: {self.description} - calories: {self.calories}"
 
 class Dessert(MenuItem):
+    __slots__ = ()
+    SCHEMA = schema.SCHEMAS['Dessert']
+
     def __init__(self, name:str, price:float, description:str, calories:int, image_path:str):
         super().__init__(name, price, description, image_path, calories)
 
@@ -43,6 +67,9 @@ class Dessert(MenuItem):
         return f"name: {self.name} - price: {self.price} - description: {self.description} - calories: {self.calories}"
 
 class Entree(MenuItem):
+    __slots__ = ()
+    SCHEMA = schema.SCHEMAS['Entree']
+
     def __init__(self, name:str, price:float, description:str, calories:int, image_path:str):
         super().__init__(name, price, description, image_path, calories)
 
@@ -50,38 +77,103 @@ class Entree(MenuItem):
         return f"name: {self.name} - price: {self.price} - description: {self.description} - calories: {self.calories}"
 
 class Appetizer(MenuItem):
+    __slots__ = ()
+    SCHEMA = schema.SCHEMAS['Appetizer']
+
     def __init__(self, name:str, price:float, description:str, calories:int, image_path:str):
         super().__init__(name, price, description, image_path, calories)
 
     def __str__(self):
         return f"name: {self.name} - price: {self.price} - description: {self.description} - calories: {self.calories}"
 
+def to_cents(price):
+    """Convert a price in dollars to integer cents, rounding half up"""
+    return int((Decimal(str(price)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+class OrderLine:
+    __slots__ = ('item', 'quantity', 'unit_cents')
+
+    def __init__(self, item, quantity, unit_cents):
+        self.item = item
+        self.quantity = quantity
+        self.unit_cents = unit_cents
+
+    @property
+    def total_cents(self):
+        return self.quantity * self.unit_cents
+
 class Order:
+    """Line items keyed by item name with quantities and an exact total in cents"""
+
     def __init__(self):
-        self.items = []
+        self.lines = {}  # item name -> OrderLine
         self.drink = None
         self.dessert = None 
         self.entree = None
-        self.total = 0
+        self.total_cents = 0
+        self._book = None  # the pricing.OrderBook tracking this order, if any
+
+    @property
+    def items(self):
+        """Every item in the order, repeated by quantity"""
+        return [line.item for line in self.lines.values() for _ in range(line.quantity)]
+
+    @property
+    def total(self):
+        return self.total_cents / 100
 
-    def add_item(self, item):
+    @property
+    def total_decimal(self):
+        return Decimal(self.total_cents) / 100
+
+    def add_item(self, item, quantity=1):
         if item is None:
             raise ValueError("Cannot add None as an item")
         if not isinstance(item, MenuItem):
             raise ValueError("Can only add MenuItem objects to order")
+        if quantity < 1:
+            raise ValueError("Quantity must be at least 1")
             
-        self.items.append(item)
-        self.total += item.price
+        line = self.lines.get(item.name)
+        if line is None:
+            line = self.lines[item.name] = OrderLine(item, 0, to_cents(item.price))
+            if self._book is not None:
+                self._book._track(self, item.name)
+        line.quantity += quantity
+        self.total_cents += quantity * line.unit_cents
 
-    def remove_item(self, item):
-        if not self.items:
+    def remove_item(self, item, quantity=1):
+        if not self.lines:
             raise ValueError("Cannot remove item from empty order")
-        if item not in self.items:
+        line = self.lines.get(item.name) if isinstance(item, MenuItem) else None
+        if line is None:
             raise ValueError("Item not found in order")
+        if not 1 <= quantity <= line.quantity:
+            raise ValueError(f"Quantity must be between 1 and {line.quantity}")
             
-        self.items.remove(item)
-        self.total -= item.price
+        self.set_quantity(item.name, line.quantity - quantity)
+
+    def set_quantity(self, name, quantity):
+        """Change the quantity of an item already in the order; 0 removes it"""
+        line = self.lines.get(name)
+        if line is None:
+            raise ValueError("Item not found in order")
+        if quantity < 0:
+            raise ValueError("Quantity cannot be negative")
+
+        self.total_cents += (quantity - line.quantity) * line.unit_cents
+        line.quantity = quantity
+        if quantity == 0:
+            del self.lines[name]
+            if self._book is not None:
+                self._book._untrack(self, name)
+
+    def reprice(self, name, price):
+        """Charge a new unit price for an item already in the order"""
+        line = self.lines[name]
+        unit_cents = to_cents(price)
+        self.total_cents += line.quantity * (unit_cents - line.unit_cents)
+        line.unit_cents = unit_cents
 
     def __str__(self):
         return f"items: {self.items} - drink: {self.drink} - dessert: {self.dessert} - entree: {self.entree} - total: {self.total:.2f}"
-
@@ -0,0 +1,309 @@
+'''
+This module provides the order ingestion pipeline.
+
+Orders arrive as plain dicts such as
+
+    {'order_id': 'A17', 'items': [{'name': 'Coke', 'quantity': 2}, {'name': 'Burger'}]}
+
+and flow through three stages:
+
+    1. a bounded request queue; submit() blocks or raises queue.Full when it is
+       full, which pushes back on callers during a rush
+    2. pricing workers that resolve item names against the Menu's model index
+       and price the order with models.Order
+    3. a batcher that groups priced orders and hands each batch to a thread or
+       process pool running the sink's write_batch (JSONL, CSV or SQLite append)
+
+submit() returns a concurrent.futures.Future that resolves to the persisted
+order record, or fails with ValueError when the order is invalid.
+'''
+
+import csv
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from .models import Order
+
+_STOP = object()
+EXECUTORS = {'thread': ThreadPoolExecutor, 'process': ProcessPoolExecutor}
+
+
+class JsonlOrderSink:
+    """Append one JSON object per order"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def write_batch(self, records):
+        text = ''.join(json.dumps(record) + '\n' for record in records)
+        with open(self.path, 'a') as file:
+            file.write(text)
+
+
+class CsvOrderSink:
+    """Append one CSV row per order line"""
+    FIELDNAMES = ['order_id', 'received_at', 'name', 'quantity', 'unit_cents', 'order_total_cents']
+
+    def __init__(self, path):
+        self.path = path
+
+    def write_batch(self, records):
+        write_header = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, 'a', newline='') as file:
+            writer = csv.writer(file)
+            if write_header:
+                writer.writerow(self.FIELDNAMES)
+            writer.writerows(
+                (record['order_id'], record['received_at'], line['name'], line['quantity'],
+                 line['unit_cents'], record['total_cents'])
+                for record in records for line in record['lines']
+            )
+
+
+class SqliteOrderSink:
+    """Insert orders and their lines into an SQLite database, one transaction per batch"""
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS orders (
+            order_id TEXT PRIMARY KEY,
+            received_at REAL,
+            total_cents INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS order_lines (
+            order_id TEXT REFERENCES orders (order_id),
+            name TEXT,
+            quantity INTEGER,
+            unit_cents INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS order_lines_order ON order_lines (order_id);
+    '''
+
+    def __init__(self, path):
+        self.path = path
+
+    def write_batch(self, records):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(self.SCHEMA)
+            with conn:
+                conn.executemany('INSERT INTO orders VALUES (?, ?, ?)',
+                                 ((r['order_id'], r['received_at'], r['total_cents']) for r in records))
+                conn.executemany('INSERT INTO order_lines VALUES (?, ?, ?, ?)',
+                                 ((r['order_id'], line['name'], line['quantity'], line['unit_cents'])
+                                  for r in records for line in r['lines']))
+        finally:
+            conn.close()
+
+
+def open_order_sink(path):
+    """Pick a sink for a file path by its extension"""
+    if str(path).endswith(('.db', '.sqlite', '.sqlite3')):
+        return SqliteOrderSink(path)
+    if str(path).endswith('.csv'):
+        return CsvOrderSink(path)
+    return JsonlOrderSink(path)
+
+
+class PipelineMetrics:
+    def __init__(self, samples=10000):
+        self.accepted = 0
+        self.rejected = 0
+        self.persisted = 0
+        self.failed = 0
+        self.batches = 0
+        self.started = time.monotonic()
+        self._latencies = deque(maxlen=samples)  # submit -> persisted, in seconds
+        self._lock = threading.Lock()
+
+    def record_accepted(self):
+        with self._lock:
+            self.accepted += 1
+
+    def record_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    def record_failed(self, count):
+        with self._lock:
+            self.failed += count
+
+    def record_persisted(self, latencies):
+        with self._lock:
+            self.persisted += len(latencies)
+            self.batches += 1
+            self._latencies.extend(latencies)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            elapsed = time.monotonic() - self.started
+            return {
+                'accepted': self.accepted,
+                'rejected': self.rejected,
+                'persisted': self.persisted,
+                'failed': self.failed,
+                'batches': self.batches,
+                'throughput_per_s': self.persisted / elapsed if elapsed else 0.0,
+                'latency_p50_s': _percentile(latencies, 0.50),
+                'latency_p99_s': _percentile(latencies, 0.99),
+            }
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class OrderPipeline:
+    def __init__(self, menu, sink, workers=4, queue_size=1000, batch_size=100, flush_interval=0.05,
+                 executor='thread', persist_workers=1):
+        if executor not in EXECUTORS:
+            raise ValueError(f"Invalid executor. Must be one of: {', '.join(EXECUTORS)}")
+        self.menu = menu
+        menu.get_menu_models()  # build the model cache once, before the workers share it
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.metrics = PipelineMetrics()
+        self._requests = queue.Queue(maxsize=queue_size)
+        self._priced = queue.Queue(maxsize=queue_size)
+        self._pool = EXECUTORS[executor](max_workers=persist_workers)
+        self._in_flight = threading.BoundedSemaphore(persist_workers * 2)  # batches handed to the pool
+        self._workers = [threading.Thread(target=self._price_loop, daemon=True) for _ in range(workers)]
+        self._batcher = threading.Thread(target=self._batch_loop, daemon=True)
+        self._closed = False
+        for thread in self._workers + [self._batcher]:
+            thread.start()
+
+    def submit(self, request, block=True, timeout=None):
+        """Queue an order request and return a Future for its persisted record
+
+        Raises queue.Full when the pipeline is saturated and block is False
+        or timeout expires.
+        """
+        if self._closed:
+            raise RuntimeError("Pipeline is closed")
+        future = Future()
+        self._requests.put((request, future, time.monotonic()), block, timeout)
+        return future
+
+    def _price_loop(self):
+        while True:
+            entry = self._requests.get()
+            if entry is _STOP:
+                return
+            request, future, submitted = entry
+            try:
+                record = self.price(request)
+            except (KeyError, TypeError, ValueError) as e:
+                self.metrics.record_rejected()
+                future.set_exception(ValueError(str(e)))
+                continue
+            except Exception as e:  # keep the worker alive and the caller's future resolved
+                self.metrics.record_failed(1)
+                future.set_exception(e)
+                continue
+            self.metrics.record_accepted()
+            self._priced.put((record, future, submitted))
+
+    def price(self, request):
+        """Validate an order request against the menu and return its priced record"""
+        if not isinstance(request, Mapping):
+            raise ValueError("Order request must be a mapping")
+        lines = request.get('items') or []
+        if not lines:
+            raise ValueError("Order has no items")
+        menu_items = self.menu.get_menu_models()
+        order = Order()
+        for line in lines:
+            name = line['name']
+            item = menu_items.get(name)
+            if item is None:
+                raise ValueError(f"Item with name '{name}' not found")
+            quantity = line.get('quantity', 1)
+            if not isinstance(quantity, int) or quantity < 1:
+                raise ValueError(f"Quantity for '{name}' must be a positive integer")
+            order.add_item(item, quantity)
+        return {
+            'order_id': str(request.get('order_id') or uuid.uuid4().hex),
+            'received_at': time.time(),
+            'lines': [{'name': name, 'quantity': line.quantity, 'unit_cents': line.unit_cents}
+                      for name, line in order.lines.items()],
+            'total_cents': order.total_cents,
+            'total': f"{order.total_decimal:.2f}",
+        }
+
+    def _batch_loop(self):
+        batch, deadline = [], None
+        while True:
+            timeout = None if not batch else max(0.0, deadline - time.monotonic())
+            try:
+                entry = self._priced.get(timeout=timeout)
+            except queue.Empty:
+                entry = None
+            if entry is _STOP:
+                if batch:
+                    self._flush(batch)
+                return
+            if entry is not None:
+                batch.append(entry)
+                if len(batch) == 1:
+                    deadline = time.monotonic() + self.flush_interval
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+
+    def _flush(self, batch):
+        """Hand a batch to the persistence pool, waiting while too many are in flight"""
+        self._in_flight.acquire()
+        records = [record for record, _, _ in batch]
+        done = self._pool.submit(self.sink.write_batch, records)
+        done.add_done_callback(lambda done: self._persisted(batch, done))
+
+    def _persisted(self, batch, done):
+        self._in_flight.release()
+        error = done.exception()
+        if error is not None:
+            self.metrics.record_failed(len(batch))
+            for _, future, _ in batch:
+                future.set_exception(error)
+            return
+        now = time.monotonic()
+        self.metrics.record_persisted([now - submitted for _, _, submitted in batch])
+        for record, future, _ in batch:
+            future.set_result(record)
+
+    def stats(self):
+        """Counters, throughput and latency percentiles, plus current queue depths"""
+        stats = self.metrics.snapshot()
+        stats['queued'] = self._requests.qsize()
+        stats['priced_queued'] = self._priced.qsize()
+        return stats
+
+    def close(self):
+        """Finish every queued order, then stop the workers and the pool"""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._workers:
+            self._requests.put(_STOP)
+        for thread in self._workers:
+            thread.join()
+        self._priced.put(_STOP)
+        self._batcher.join()
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
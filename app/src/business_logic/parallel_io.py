@@ -0,0 +1,216 @@
+'''
+This module provides parallel CSV import and export for large catalogs.
+
+A CSV file is split into byte ranges that each end on a record boundary: the
+first newline past the split point that is outside quotes. A newline is
+outside quotes when the number of '"' characters before it is even, because
+quotes inside a quoted field are written doubled. The parent finds the
+boundaries by seeking and scanning forward SCAN_BYTES at a time, counting
+quotes, so it never holds more than one block of the file. Worker processes
+of a ProcessPoolExecutor read and parse their own ranges, so only the parsed
+rows travel back to the parent, which merges them in file order:
+
+    read_rows(path)             the rows of a CSV file, like Menu._load_items()
+    import_items(menu, path)    create the items of a CSV file, like create_items;
+                                the workers also validate their rows with the
+                                item schemas, and names repeated across ranges
+                                or already on the menu are rejected on merge
+    write_rows(rows, path)      write rows as CSV, formatting ranges of rows in
+                                the workers and writing them out in order
+
+Files smaller than MIN_PARALLEL_BYTES, and workers=1, run in this process.
+Workers are forked only while the calling process has a single thread;
+forking a multi-threaded process, such as the HTTP API or a process running
+an OrderPipeline, can leave a lock held forever in the child, so the pool
+then starts its workers with forkserver (or spawn where that is missing).
+Forked export workers inherit the rows instead of having them pickled.
+'''
+
+import csv
+import io
+import os
+import threading
+from itertools import accumulate
+from operator import itemgetter
+
+from . import schema
+from .durability import atomic_write
+from .storage import FIELDNAMES
+
+ENCODING = 'utf-8'
+MIN_PARALLEL_BYTES = 4 * 2**20  # smaller files are parsed in this process
+CHUNKS_PER_WORKER = 4  # ranges per worker, so a slow range does not hold up the rest
+EXPORT_CHUNK_ROWS = 50000
+SCAN_BYTES = 1 << 20  # block size while looking for record boundaries
+
+_export_rows = None  # rows being exported, inherited by forked workers
+
+
+def _record_end(file, start, target):
+    """Offset just past the first record-ending newline at or after target, or the file size
+
+    start must be a record boundary; quotes are counted from there, a block at
+    a time.
+    """
+    quotes = 0
+    file.seek(start)
+    for _ in range(start, target, SCAN_BYTES):
+        quotes += file.read(min(SCAN_BYTES, target - file.tell())).count(b'"')
+    position = target
+    while True:
+        block = file.read(SCAN_BYTES)
+        if not block:
+            return position
+        offset = 0
+        while True:
+            newline = block.find(b'\n', offset)
+            if newline < 0:
+                quotes += block.count(b'"', offset)
+                break
+            quotes += block.count(b'"', offset, newline)
+            if quotes % 2 == 0:
+                return position + newline + 1
+            offset = newline + 1
+        position += len(block)
+
+
+def split_records(path, parts):
+    """Split a CSV file into at most parts byte ranges of whole records
+
+    Returns (header fieldnames, [(start, stop), ...]) with the ranges covering
+    everything after the header line.
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as file:
+        body = _record_end(file, 0, 0)
+        file.seek(0)
+        header = next(csv.reader(io.StringIO(file.read(body).decode(ENCODING), newline='')), [])
+        bounds = [body]
+        step = max(1, (size - body) // max(1, parts))
+        while bounds[-1] < size and len(bounds) < parts:
+            bounds.append(_record_end(file, bounds[-1], min(size, bounds[-1] + step)))
+    if bounds[-1] < size:
+        bounds.append(size)
+    return header, list(zip(bounds, bounds[1:]))
+
+
+def _parse_range(path, start, stop, fieldnames, validate):
+    """Parse one byte range into row dicts, validated into stored rows if asked
+
+    Returns (record count, rows, errors) where with validate the rows are
+    (offset, row) pairs and errors are (offset, message), offsets counting
+    records within the range.
+    """
+    with open(path, 'rb') as file:
+        file.seek(start)
+        text = file.read(stop - start).decode(ENCODING)
+    rows = list(csv.DictReader(io.StringIO(text, newline=''), fieldnames=fieldnames))
+    if not validate:
+        return len(rows), rows, []
+    batches, errors = schema.validate_rows(rows)
+    validated = [None] * len(rows)
+    for item_schema, positions, columns in batches:
+        for offset, row in zip(positions, item_schema.rows(columns)):
+            validated[offset] = row
+    return len(rows), [(offset, row) for offset, row in enumerate(validated) if row is not None], errors
+
+
+def _default_workers(workers):
+    return workers if workers is not None else (os.cpu_count() or 1)
+
+
+def _pool(workers):
+    """Return (ProcessPoolExecutor, start method), forking only while this process has a single thread"""
+    import multiprocessing  # deferred: multiprocessing is slow to import
+    from concurrent.futures import ProcessPoolExecutor
+    methods = multiprocessing.get_all_start_methods()
+    if 'fork' in methods and threading.active_count() == 1:
+        method = 'fork'
+    else:
+        method = 'forkserver' if 'forkserver' in methods else 'spawn'
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method)), method
+
+
+def _map_ranges(path, workers, validate):
+    """Parse every range of a CSV file, in parallel when worthwhile, in file order"""
+    workers = _default_workers(workers)
+    if not os.path.exists(path):
+        return []
+    parallel = workers > 1 and os.path.getsize(path) >= MIN_PARALLEL_BYTES
+    header, ranges = split_records(path, workers * CHUNKS_PER_WORKER if parallel else 1)
+    arguments = [(path, start, stop, header, validate) for start, stop in ranges]
+    if not parallel:
+        return [_parse_range(*each) for each in arguments]
+    pool, _ = _pool(workers)
+    with pool:
+        return list(pool.map(_parse_range, *zip(*arguments)))
+
+
+def read_rows(path, workers=None):
+    """Read every row of a CSV file as dicts, parsing ranges in worker processes"""
+    rows = []
+    for _, chunk, _ in _map_ranges(path, workers, validate=False):
+        rows += chunk
+    return rows
+
+
+def import_items(menu, path, workers=None, skip_invalid=False):
+    """Create the items of a CSV file in menu, parsing and validating in worker processes
+
+    Returns (created rows, errors) like Menu.create_items, with positions
+    counting data rows from 0. Unless skip_invalid is set, any error raises
+    BatchError and nothing is created.
+    """
+    results = _map_ranges(path, workers, validate=True)
+    firsts = accumulate([count for count, _, _ in results], initial=0)
+    rows, errors = [], []
+    for first, (_, chunk, chunk_errors) in zip(firsts, results):
+        rows += [(first + offset, row) for offset, row in chunk]
+        errors += [(first + offset, message) for offset, message in chunk_errors]
+    return menu.create_validated_items(rows, errors, skip_invalid)
+
+
+def _format_rows(start, stop, rows=None):
+    """CSV bytes of rows[start:stop], from the inherited export rows unless rows are given"""
+    rows = _export_rows[start:stop] if rows is None else rows
+    buffer = io.StringIO(newline='')
+    try:
+        csv.writer(buffer).writerows(map(itemgetter(*FIELDNAMES), rows))
+    except KeyError:
+        buffer = io.StringIO(newline='')
+        csv.DictWriter(buffer, fieldnames=FIELDNAMES).writerows(rows)
+    return buffer.getvalue().encode(ENCODING)
+
+
+def write_rows(rows, path, workers=None, sync=True):
+    """Atomically write rows to a CSV file in the items.csv format, formatted in worker processes
+
+    Returns the number of rows written.
+    """
+    global _export_rows
+    rows = rows if isinstance(rows, list) else list(rows)
+    workers = _default_workers(workers)
+    step = max(1, min(EXPORT_CHUNK_ROWS, -(-len(rows) // (workers * CHUNKS_PER_WORKER))))
+    ranges = [(start, min(start + step, len(rows))) for start in range(0, len(rows), step)]
+    if workers > 1 and len(ranges) > 1:
+        pool, method = _pool(workers)
+        forking = method == 'fork'
+        _export_rows = rows if forking else None
+        try:
+            with pool:
+                if forking:
+                    chunks = list(pool.map(_format_rows, *zip(*ranges)))
+                else:
+                    chunks = list(pool.map(_format_rows, *zip(*ranges),
+                                           [rows[start:stop] for start, stop in ranges]))
+        finally:
+            _export_rows = None
+    else:
+        chunks = [_format_rows(start, stop, rows[start:stop]) for start, stop in ranges]
+
+    def write(file):
+        file.write(','.join(FIELDNAMES).encode(ENCODING) + b'\r\n')
+        for chunk in chunks:
+            file.write(chunk)
+    atomic_write(path, write, sync=sync, binary=True)
+    return len(rows)
@@ -0,0 +1,85 @@
+'''
+This module provides the OrderBook, which keeps track of open orders so
+price changes can be applied to all of them in one pass.
+
+The book keeps a reverse index from item name to the open orders holding
+that item, so repricing touches only the affected order lines. Each line
+costs O(1), because an order total is kept in integer cents and adjusted
+by quantity * price difference. follow(menu) reprices the book from the
+menu's change events as prices are updated.
+'''
+
+from .models import Order, to_cents
+
+
+class OrderBook:
+    def __init__(self):
+        self.orders = {}  # order id -> Order
+        self._next_id = 1
+        self._holding = {}  # item name -> {Order: None} of open orders holding it
+
+    def open(self, order=None):
+        """Start tracking an order (a new empty one by default) and return its id"""
+        order = order if order is not None else Order()
+        if order._book is not None:
+            raise ValueError("Order is already tracked by an order book")
+        order_id = self._next_id
+        self._next_id += 1
+        self.orders[order_id] = order
+        order._book = self
+        for name in order.lines:
+            self._track(order, name)
+        return order_id
+
+    def close(self, order_id):
+        """Stop tracking an order, e.g. once it is paid, and return it"""
+        order = self.orders.pop(order_id)
+        for name in order.lines:
+            self._untrack(order, name)
+        order._book = None
+        return order
+
+    def orders_with(self, name):
+        """Open orders that contain the named item"""
+        return list(self._holding.get(name, ()))
+
+    def reprice(self, prices):
+        """Apply {item name: new price} to every open order, returning the orders changed"""
+        changed = {}
+        for name, price in prices.items():
+            unit_cents = to_cents(price)
+            for order in self._holding.get(name, ()):
+                line = order.lines[name]
+                order.total_cents += line.quantity * (unit_cents - line.unit_cents)
+                line.unit_cents = unit_cents
+                changed[order] = None
+        return list(changed)
+
+    def reprice_from_menu(self, menu, names):
+        """Reprice open orders from the current menu prices of the named items"""
+        prices = {}
+        for name in names:
+            item = menu.read_item(name)
+            if item is not None:
+                prices[name] = item['price']
+        return self.reprice(prices)
+
+    def follow(self, menu):
+        """Reprice open orders whenever menu updates an item's price
+
+        Returns the subscribed callback, for menu.unsubscribe().
+        """
+        def on_change(event):
+            if event.kind == 'updated' and event.before['price'] != event.after['price']:
+                self.reprice({event.name: event.after['price']})
+        return menu.subscribe(on_change)
+
+    def _track(self, order, name):
+        self._holding.setdefault(name, {})[order] = None
+
+    def _untrack(self, order, name):
+        holders = self._holding.get(name)
+        if holders is not None:
+            holders.pop(order, None)
+            if not holders:
+                del self._holding[name]
@@ -0,0 +1,273 @@
+'''
+This module provides the validation rules for menu items, declared once per
+item type and shared by Menu, LayeredMenu and the model classes.
+
+A Schema lists the Fields of an item type in order. A Field declares how a
+value is parsed (float, int, or kept as given), the constraints the parsed
+value must meet (above, minimum, maximum, nonempty, among), the message of
+the ValueError raised when it does not and how it is written into a stored
+row. The rules, the same for every caller, are:
+
+    name         not empty
+    price        a number greater than 0
+    calories     a whole number greater than 0
+    size         for drinks a whole number of ounces from MIN_DRINK_SIZE to
+                 MAX_DRINK_SIZE, for other items None or ''
+
+A Schema checks one item or many:
+
+    validate(**fields)         check one item and return its parsed values,
+                               raising ValueError for the first failing field
+    row(**fields)              the same, returning the item's stored row
+    validate_columns(columns)  check many items a column at a time, returning
+                               the parsed columns and every error by offset
+    rows(columns)              the stored rows of parsed columns
+
+A column is parsed with one map() and passes when checks built on min(),
+max(), all() and set() do, so valid columns are checked in C; only a column
+holding a bad value is checked value by value, and no exception is raised
+per row. validate_rows() checks rows of mixed item types:
+
+    batches, errors = validate_rows(rows)
+'''
+
+from operator import itemgetter, methodcaller
+
+ITEM_TYPES = ['Entree', 'Drink', 'Dessert', 'Appetizer']
+MIN_DRINK_SIZE = 8  # minimum size in ounces
+MAX_DRINK_SIZE = 44  # maximum size in ounces
+TYPE_MESSAGE = f"Invalid item type. Must be one of: {', '.join(ITEM_TYPES)}"
+REQUIRED = object()  # default of a field that has to be given
+
+
+class Field:
+    def __init__(self, message=None, parse=None, above=None, minimum=None, maximum=None,
+                 nonempty=False, among=None, default=REQUIRED, store=None):
+        self.message = message
+        self.parse = parse  # float, int or None to keep the value as given
+        self.above = above  # exclusive lower bound
+        self.minimum = minimum
+        self.maximum = maximum
+        self.nonempty = nonempty
+        self.among = None if among is None else frozenset(among)  # the only values allowed
+        self.default = default
+        self.store = store  # turns the parsed value into its stored row value; None keeps it
+        self.constrained = (nonempty or above is not None or minimum is not None
+                            or maximum is not None or among is not None)
+
+    def check(self, value):
+        """Parse one value and return it, raising ValueError with the field's message"""
+        if self.parse is not None:
+            try:
+                value = self.parse(value)
+            except (TypeError, ValueError):
+                raise ValueError(self.message) from None
+        if self.constrained and not self.accepts(value):
+            raise ValueError(self.message)
+        return value
+
+    def accepts(self, value):
+        """True when a parsed value meets every constraint (NaN fails every bound)"""
+        try:
+            return ((not self.nonempty or bool(value))
+                    and (self.above is None or value > self.above)
+                    and (self.minimum is None or value >= self.minimum)
+                    and (self.maximum is None or value <= self.maximum)
+                    and (self.among is None or value in self.among))
+        except TypeError:  # e.g. a value that cannot be compared or hashed
+            return False
+
+    def column_passes(self, values):
+        """True when every parsed value of a column meets the constraints, checked in C"""
+        try:
+            if self.nonempty and not all(values):
+                return False
+            if self.above is not None and not min(values) > self.above:
+                return False
+            if self.minimum is not None and not min(values) >= self.minimum:
+                return False
+            if self.maximum is not None and not max(values) <= self.maximum:
+                return False
+            if self.among is not None and not set(values) <= self.among:
+                return False
+            # min() and max() skip past NaN, which is the only value not equal to itself
+            return self.parse is not float or sum(values) == sum(values)
+        except (TypeError, ValueError):
+            return False  # check the values one by one
+
+    def check_column(self, values, errors):
+        """Parse a column and return it, adding {offset: message} for each value that fails to errors
+
+        A failing value is left as None in the returned column.
+        """
+        try:
+            parsed = list(map(self.parse, values)) if self.parse is not None else values
+        except (TypeError, ValueError):
+            parsed = None
+        if parsed is not None and (not self.constrained or not parsed or self.column_passes(parsed)):
+            return parsed
+        checked = []
+        for offset, value in enumerate(values):
+            try:
+                checked.append(self.check(value))
+            except ValueError:
+                errors.setdefault(offset, self.message)
+                checked.append(None)
+        return checked
+
+
+class Schema:
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields  # field name -> Field, in the order errors are reported
+        self.required = frozenset(key for key, field in fields.items() if field.default is REQUIRED)
+        self.defaults = {key: field.default for key, field in fields.items() if field.default is not REQUIRED}
+        self.validators = {key: field.check for key, field in fields.items()}  # for single-field updates
+        self._keys = ('type',) + tuple(fields)
+
+    def validate(self, **values):
+        """Check one item and return its parsed values, raising ValueError for the first failing field
+
+        A missing required field or an unknown one raises TypeError, like a
+        call with the wrong keyword arguments.
+        """
+        unknown = values.keys() - self.fields.keys()
+        if unknown:
+            raise TypeError(f"Unknown field(s): {', '.join(sorted(unknown))}")
+        parsed = {}
+        for key, field in self.fields.items():
+            value = values.get(key, field.default)
+            if value is REQUIRED:
+                raise TypeError(f"Missing field: {key}")
+            parsed[key] = field.check(value)
+        return parsed
+
+    def row(self, **values):
+        """Check one item like validate() and return its stored row, type included"""
+        row = {'type': self.name}
+        for key, value in self.validate(**values).items():
+            store = self.fields[key].store
+            row[key] = value if store is None else store(value)
+        return row
+
+    def rows(self, columns):
+        """The stored rows of parsed columns, as validate_columns() returns them"""
+        stored = [columns[key] if field.store is None else map(field.store, columns[key])
+                  for key, field in self.fields.items()]
+        name, keys = (self.name,), self._keys
+        return [dict(zip(keys, name + values)) for values in zip(*stored)]
+
+    def check_keys(self, row, accepted):
+        """The message for a row missing a required field or holding a key not in accepted, or None"""
+        keys = row.keys()
+        if self.required <= keys and keys <= accepted:
+            return None
+        missing = self.required - keys
+        if missing:
+            return f"Missing field(s): {', '.join(sorted(missing))}"
+        return f"Unknown field(s): {', '.join(sorted(map(str, keys - accepted)))}"
+
+    def columns(self, rows):
+        """Split rows into columns keyed by field name
+
+        Returns None unless every row holds exactly the type key and the fields
+        of this schema; validate_rows() then checks the rows one by one.
+        """
+        if set(map(len, rows)) - {len(self.fields) + 1}:
+            return None
+        try:
+            return {key: list(map(itemgetter(key), rows)) for key in self.fields}
+        except KeyError:
+            return None
+
+    def validate_columns(self, columns):
+        """Check equally long columns of values, keyed by field name
+
+        Returns (parsed columns, errors) where errors maps an offset into the
+        columns to the message of its first failing field. Nothing is raised.
+        """
+        errors = {}
+        parsed = {key: field.check_column(columns[key], errors) for key, field in self.fields.items()}
+        return parsed, errors
+
+
+def _nothing(value):
+    return None
+
+
+def _item_fields(size):
+    return {
+        'name': Field("Name cannot be empty", nonempty=True),
+        'price': Field("Price must be a number greater than 0", float, above=0, store=str),
+        'description': Field(),
+        'calories': Field("Calories must be a whole number greater than 0", int, above=0, store=str),
+        'image_path': Field(),
+        'size': size,
+    }
+
+
+DRINK_SIZE = Field(f"Drink size must be a number between {MIN_DRINK_SIZE} and {MAX_DRINK_SIZE} ounces",
+                   int, minimum=MIN_DRINK_SIZE, maximum=MAX_DRINK_SIZE, default=None, store=str)
+NO_SIZE = Field("Size can only be specified for drinks", among=(None, ''), default=None, store=_nothing)
+
+ITEM = Schema('MenuItem', {key: field for key, field in _item_fields(None).items() if field is not None})
+SCHEMAS = {item_type: Schema(item_type, _item_fields(DRINK_SIZE if item_type == 'Drink' else NO_SIZE))
+           for item_type in ITEM_TYPES}
+
+
+def schema_for(item_type):
+    """The schema of an item type, raising ValueError for an unknown type"""
+    schema = SCHEMAS.get(item_type)
+    if schema is None:
+        raise ValueError(TYPE_MESSAGE)
+    return schema
+
+
+def validate_rows(rows, type_key='type'):
+    """Check many rows of any item type, a column at a time per type
+
+    Each row is a dict holding its item type under type_key plus the fields of
+    that type. Returns (batches, errors): batches is a list of (schema,
+    positions, parsed columns) holding only the rows that passed, and errors a
+    list of (position, message) in row order. Nothing is raised.
+    """
+    rows = rows if isinstance(rows, list) else list(rows)
+    groups = {item_type: [] for item_type in SCHEMAS}
+    unknown = []
+    appends = {item_type: positions.append for item_type, positions in groups.items()}
+    for position, item_type in enumerate(map(methodcaller('get', type_key), rows)):
+        try:
+            appends.get(item_type, unknown.append)(position)
+        except TypeError:  # an unhashable type such as a list from JSON
+            unknown.append(position)
+    errors = dict.fromkeys(unknown, TYPE_MESSAGE)
+
+    batches = []
+    for item_type, positions in groups.items():
+        if not positions:
+            continue
+        schema = SCHEMAS[item_type]
+        group = list(map(rows.__getitem__, positions))
+        columns = schema.columns(group)
+        if columns is None:
+            # Some row lacks a field or has an unknown one: check keys row by row
+            accepted = schema.fields.keys() | {type_key}
+            kept, group = [], []
+            for position in positions:
+                problem = schema.check_keys(rows[position], accepted)
+                if problem:
+                    errors[position] = problem
+                else:
+                    kept.append(position)
+                    group.append({**schema.defaults, **rows[position]})
+            positions = kept
+            columns = {key: list(map(itemgetter(key), group)) for key in schema.fields}
+        parsed, failed = schema.validate_columns(columns)
+        if failed:
+            for offset, message in failed.items():
+                errors[positions[offset]] = message
+            keep = [offset for offset in range(len(positions)) if offset not in failed]
+            positions = [positions[offset] for offset in keep]
+            parsed = {key: [values[offset] for offset in keep] for key, values in parsed.items()}
+        batches.append((schema, positions, parsed))
+    return batches, sorted(errors.items())
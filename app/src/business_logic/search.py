@@ -0,0 +1,225 @@
+'''
+This module provides the full-text index behind Menu.search.
+
+Item names and descriptions are split into lowercase word tokens. Each token
+has a posting list of the items holding it, bucketed by a field weight (3 for
+a word in both the name and the description, 2 for the name only and 1 for
+the description only), and every token is stored in a character trie.
+
+A search term matches its own token best, then tokens it is a prefix of
+("choc" -> "chocolate"), found by walking the trie. A term that matches
+nothing falls back to tokens within a small edit distance ("buger" ->
+"burger"), found with a Levenshtein walk over the same trie. Items must match
+every term. Candidates are visited from the best scoring bucket down and the
+walk stops once no remaining bucket can beat the results in hand, so a
+common word does not mean scoring every item that holds it. Terms that rarely
+occur together are answered by intersecting their posting sets instead.
+'''
+
+import heapq
+import re
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+_END = ''  # trie key marking the end of a token; tokens themselves are never empty
+NAME_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+EXACT_BONUS = 2  # score multiplier for a term equal to the token, rather than a prefix of it
+FUZZY_PENALTY = 0.5  # score multiplier for a token reached by the edit distance fallback
+MAX_EXPANSIONS = 256  # tokens a single prefix may expand to, shortest first
+MAX_EDITS = 2
+MAX_MISSES = 256  # candidates missing another term before search switches to set intersections
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens"""
+    return _TOKEN.findall(text.lower()) if text else []
+
+
+class SearchIndex:
+    def __init__(self):
+        self._postings = {}  # token -> [None, {names}, {names}, {names}] indexed by field weight
+        self._tokens = {}  # item name -> {token: weight} for removal
+        self._sequence = {}  # item name -> when it was last added, to break ties
+        self._added = 0
+        self._trie = {}
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def add(self, row):
+        """Index the name and description of a row"""
+        name = row['name']
+        weights = {}
+        for token in tokenize(name):
+            weights[token] = NAME_WEIGHT
+        for token in tokenize(row.get('description')):
+            weights[token] = weights.get(token, 0) | DESCRIPTION_WEIGHT
+        self._tokens[name] = weights
+        self._added += 1
+        self._sequence[name] = self._added
+        for token, weight in weights.items():
+            buckets = self._postings.get(token)
+            if buckets is None:
+                buckets = self._postings[token] = [None, {}, {}, {}]
+                self._trie_add(token)
+            buckets[weight][name] = None
+
+    def remove(self, row):
+        """Drop a row from the index"""
+        weights = self._tokens.pop(row['name'], None)
+        if weights is None:
+            return
+        del self._sequence[row['name']]
+        for token, weight in weights.items():
+            buckets = self._postings[token]
+            buckets[weight].pop(row['name'], None)
+            if not (buckets[1] or buckets[2] or buckets[3]):
+                del self._postings[token]
+                self._trie_remove(token)
+
+    def search(self, text, limit=10):
+        """Return up to limit (score, item name) pairs matching every term, best first
+
+        Equal scores keep the order in which the items were added.
+        """
+        terms = list(dict.fromkeys(tokenize(text)))
+        if not terms or limit <= 0:
+            return []
+        # For each term, the (score, names) levels it can reach, best first
+        term_levels = []
+        for term in terms:
+            levels = self._levels(term)
+            if not levels:
+                return []
+            term_levels.append(levels)
+        # Drive from the term with the fewest candidates; check the others per candidate
+        term_levels.sort(key=lambda levels: sum(len(names) for _, names in levels))
+        driver, others = term_levels[0], term_levels[1:]
+        best_other = sum(levels[0][0] for levels in others)
+
+        top = []  # min-heap of (score, -sequence, name)
+        seen = set()
+        misses = 0
+        for score, names in driver:
+            if len(top) == limit and score + best_other < top[0][0]:
+                break
+            for name in names:
+                sequence = self._sequence[name]
+                if len(top) == limit and (score + best_other, -sequence) < top[0][:2]:
+                    break  # a level lists items in the order added, so the rest lose ties too
+                if name in seen:
+                    continue
+                seen.add(name)
+                total = _total(score, others, name)
+                if total is None:
+                    misses += 1
+                    if misses > MAX_MISSES:
+                        return self._rank_all(term_levels, limit)
+                    continue
+                entry = (total, -sequence, name)
+                if len(top) < limit:
+                    heapq.heappush(top, entry)
+                elif entry > top[0]:
+                    heapq.heapreplace(top, entry)
+        return [(score, name) for score, _, name in sorted(top, reverse=True)]
+
+    def _rank_all(self, term_levels, limit):
+        """Score every item matching all terms, found with set intersections first
+
+        Used when the terms rarely occur together, so walking the driver term
+        would mostly visit items that miss another term.
+        """
+        term_levels = sorted(term_levels, key=lambda levels: sum(len(names) for _, names in levels))
+        matches = set().union(*(names for _, names in term_levels[0]))
+        for levels in term_levels[1:]:
+            # dict views intersect by walking the smaller side
+            matches = set().union(*(names.keys() & matches for _, names in levels))
+        scored = ((_total(0, term_levels, name), -self._sequence[name], name) for name in matches)
+        return [(score, name) for score, _, name in heapq.nlargest(limit, scored)]
+
+    def _levels(self, term):
+        """(score, names) pairs for every token the term reaches, best score first"""
+        tokens = [(token, EXACT_BONUS if token == term else 1) for token in self._expand(term)]
+        if not tokens:
+            tokens = [(token, FUZZY_PENALTY) for token in self._fuzzy(term)]
+        levels = []
+        for token, multiplier in tokens:
+            buckets = self._postings[token]
+            for weight in (3, 2, 1):
+                if buckets[weight]:
+                    levels.append((weight * multiplier, buckets[weight]))
+        levels.sort(key=lambda level: level[0], reverse=True)
+        return levels
+
+    def _trie_add(self, token):
+        node = self._trie
+        for char in token:
+            node = node.setdefault(char, {})
+        node[_END] = token
+
+    def _trie_remove(self, token):
+        path = [self._trie]
+        for char in token:
+            path.append(path[-1][char])
+        del path[-1][_END]
+        for depth in range(len(token), 0, -1):
+            if path[depth]:
+                break
+            del path[depth - 1][token[depth - 1]]
+
+    def _expand(self, prefix):
+        """Tokens starting with prefix, shortest first, at most MAX_EXPANSIONS of them"""
+        node = self._trie
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        tokens, level = [], [node]
+        while level and len(tokens) < MAX_EXPANSIONS:
+            next_level = []
+            for node in level:
+                for char, child in node.items():
+                    if char == _END:
+                        tokens.append(child)
+                    else:
+                        next_level.append(child)
+            level = next_level
+        return tokens[:MAX_EXPANSIONS]
+
+    def _fuzzy(self, term):
+        """Tokens within MAX_EDITS edits of term (1 for short terms), closest first"""
+        max_edits = 1 if len(term) <= 4 else MAX_EDITS
+        skip_digits = not any(char.isdigit() for char in term)  # no point correcting words into numbers
+        found = []
+        first_row = list(range(len(term) + 1))
+        stack = [(self._trie, first_row)]
+        while stack:
+            node, row = stack.pop()
+            for char, child in node.items():
+                if char == _END:
+                    if row[-1] <= max_edits:
+                        found.append((row[-1], child))
+                    continue
+                if skip_digits and char.isdigit():
+                    continue
+                next_row = [row[0] + 1]
+                for column, term_char in enumerate(term, 1):
+                    next_row.append(min(next_row[column - 1] + 1, row[column] + 1,
+                                        row[column - 1] + (term_char != char)))
+                if min(next_row) <= max_edits:
+                    stack.append((child, next_row))
+        found.sort()
+        return [token for _, token in found[:MAX_EXPANSIONS]]
+
+
+def _total(score, term_levels, name):
+    """score plus the name's best score in each term's levels, or None if a term misses it"""
+    for levels in term_levels:
+        for term_score, names in levels:
+            if name in names:
+                score += term_score
+                break
+        else:
+            return None
+    return score
+
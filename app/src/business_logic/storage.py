@@ -0,0 +1,323 @@
+'''
+This module provides the storage backends behind the Menu class.
+
+A backend loads the menu rows and persists the changes Menu makes in memory.
+Every backend has the same methods:
+
+    load()                  yield the stored rows in insertion order
+    write(changes, rows)    persist a list of (op, name, row) changes; rows is a
+                            callable returning every current row, for backends
+                            that rewrite the whole file
+    save(rows)              replace the stored rows
+    compact(rows)           fold any pending log into the main store
+    lookup()                an object with get(name) for lazy menus, or None
+    snapshot()              a MenuSnapshot to load from instead of load(), or None
+    version()               a value that changes when another process writes
+    close()
+
+and bytes_read / bytes_written counters for the metrics module.
+
+CsvBackend keeps today's items.csv format, optionally with the append-only
+journal, and replaces the file atomically on every rewrite. A full load reads
+a binary snapshot of the file (see binary_snapshot) that every rewrite keeps
+current, and that is rebuilt if the CSV file was changed behind its back;
+load() always streams the CSV file. SqliteBackend
+stores rows in an SQLite database in WAL mode. Both take an fsync policy
+from the durability module.
+
+Migrate an existing CSV file with:
+
+    python -m app.src.business_logic.storage migrate app/items.csv app/items.db
+'''
+
+import csv
+import os
+from itertools import groupby
+from operator import itemgetter
+
+from .binary_snapshot import MenuSnapshot, snapshot_path
+from .durability import FSYNC_INTERVAL, FsyncPolicy, atomic_write
+from .journal import Journal
+from .lazy_csv import CsvOffsetIndex
+
+FIELDNAMES = ['type', 'name', 'price', 'description', 'calories', 'image_path', 'size']
+COMPACT_THRESHOLD = 1000  # journal entries before compacting into the CSV
+SQLITE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+
+
+class CsvBackend:
+    def __init__(self, csv_path, journaled=False, compact_threshold=COMPACT_THRESHOLD,
+                 fsync='always', fsync_interval=FSYNC_INTERVAL, snapshot=True, fieldnames=FIELDNAMES):
+        self.path = csv_path
+        self.fieldnames = fieldnames  # header written when there are no rows to take it from
+        self.snapshot_path = snapshot_path(csv_path) if snapshot else None
+        self.compact_threshold = compact_threshold
+        self.fsync_policy = FsyncPolicy(fsync, fsync_interval)
+        self.journal = Journal(f"{csv_path}.journal", self.fsync_policy) if journaled else None
+        self.recovered = False  # set when load() replayed a journal from a previous run
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def load(self):
+        """Yield rows streamed from the CSV file, with any journaled changes replayed on top"""
+        if self.journal is not None:
+            self.journal.refresh()
+        if self.journal is None or not len(self.journal):
+            yield from self._read_csv()
+            return
+        rows = {row['name']: row for row in self._read_csv()}
+        self.bytes_read += os.path.getsize(self.journal.path)
+        for entry in self.journal.replay():
+            # Replaying the same entry twice is harmless
+            if entry['op'] == 'delete':
+                rows.pop(entry['name'], None)
+            else:
+                rows[entry['row']['name']] = entry['row']
+        self.recovered = True
+        yield from rows.values()
+
+    def snapshot(self):
+        """Return the snapshot of the CSV file, or None while the journal has entries"""
+        if self.journal is not None:
+            self.journal.refresh()
+            if len(self.journal):
+                return None
+        return self._read_snapshot()
+
+    def _read_snapshot(self):
+        """Map the binary snapshot, first rebuilding it from the CSV file if it is stale"""
+        stamp = _file_stamp(self.path)
+        if self.snapshot_path is None or stamp is None:
+            return None
+        snapshot = MenuSnapshot.read(self.snapshot_path, stamp)
+        if snapshot is not None:
+            self.bytes_read += snapshot.nbytes
+            return snapshot
+        snapshot = MenuSnapshot.from_rows(self._read_csv())
+        try:
+            snapshot.write(self.snapshot_path, stamp)
+        except (OSError, ValueError):
+            pass  # e.g. a read-only directory; the snapshot only saves time
+        return snapshot
+
+    def _read_csv(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'r', newline='') as file:
+                self.bytes_read += os.fstat(file.fileno()).st_size
+                yield from csv.DictReader(file)
+
+    def write(self, changes, rows):
+        """Append changes to the journal, or rewrite the CSV file without one"""
+        if self.journal is None:
+            self.save(rows())
+            return
+        self.bytes_written += self.journal.append_many(changes)
+        if len(self.journal) >= self.compact_threshold:
+            self.compact(rows())
+
+    def save(self, rows):
+        """Atomically replace the CSV file"""
+        fieldnames = list(rows[0].keys()) if rows else self.fieldnames
+        if not rows and not os.path.exists(self.path):
+            return
+
+        def write(file):
+            writer = csv.writer(file)
+            writer.writerow(fieldnames)
+            try:
+                # Much faster than DictWriter, which checks every row for unknown keys
+                writer.writerows(map(itemgetter(*fieldnames), rows))
+            except KeyError:
+                file.seek(0)
+                file.truncate()
+                dict_writer = csv.DictWriter(file, fieldnames=fieldnames)
+                dict_writer.writeheader()
+                dict_writer.writerows(rows)
+        atomic_write(self.path, write, sync=self.fsync_policy.due())
+        self.bytes_written += os.path.getsize(self.path)
+        self._write_snapshot(rows, fieldnames)
+
+    def _write_snapshot(self, rows, fieldnames):
+        """Write the snapshot of rows just saved, so the next load does not rebuild it"""
+        stamp = _file_stamp(self.path)
+        if self.snapshot_path is None or stamp is None:
+            return
+        try:
+            snapshot = MenuSnapshot.from_saved(rows, fieldnames)
+            snapshot.write(self.snapshot_path, stamp)
+        except (OSError, ValueError):
+            return  # e.g. a read-only directory; the next load rebuilds it
+        self.bytes_written += snapshot.nbytes
+
+    def compact(self, rows):
+        """Rewrite the CSV snapshot and clear the journal"""
+        if self.journal is None:
+            return
+        self.save(rows)
+        self.journal.truncate()
+
+    def lookup(self):
+        """Return an offset index for lazy reads, or None while the journal has entries"""
+        if self.journal is not None and len(self.journal):
+            return None
+        return CsvOffsetIndex(self.path)
+
+    def version(self):
+        """Identify the current CSV and journal files by inode, size and mtime"""
+        paths = [self.path] if self.journal is None else [self.path, self.journal.path]
+        return tuple(_file_stamp(path) for path in paths)
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+
+
+class SqliteBackend:
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS items (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT NOT NULL,
+            name TEXT NOT NULL,
+            price REAL,
+            description TEXT,
+            calories INTEGER,
+            image_path TEXT,
+            size INTEGER
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS items_name ON items (name);
+        CREATE INDEX IF NOT EXISTS items_type ON items (type);
+    '''
+    # Fixed statements, so sqlite3 compiles each once and reuses it from its statement cache
+    SELECT_ALL = 'SELECT type, name, price, description, calories, image_path, size FROM items ORDER BY seq'
+    SELECT_ONE = 'SELECT type, name, price, description, calories, image_path, size FROM items WHERE name = ?'
+    INSERT = ('INSERT INTO items (type, name, price, description, calories, image_path, size) '
+              'VALUES (:type, :name, :price, :description, :calories, :image_path, :size)')
+    UPDATE = ('UPDATE items SET type = :type, name = :name, price = :price, description = :description, '
+              'calories = :calories, image_path = :image_path, size = :size WHERE name = :old_name')
+    DELETE = 'DELETE FROM items WHERE name = ?'
+    DELETE_ALL = 'DELETE FROM items'
+
+    SYNCHRONOUS = {'always': 'FULL', 'batched': 'NORMAL', 'never': 'OFF'}
+
+    def __init__(self, db_path, fsync='always'):
+        FsyncPolicy(fsync)  # validates the policy name
+        self.path = db_path
+        self.journal = None
+        self.recovered = False
+        self.bytes_read = 0  # SQLite does its own I/O, so these stay at zero
+        self.bytes_written = 0
+        import sqlite3  # only SQLite menus pay for loading it
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(f'PRAGMA synchronous={self.SYNCHRONOUS[fsync]}')
+        self.conn.executescript(self.SCHEMA)
+
+    def load(self):
+        """Yield rows in insertion order"""
+        for record in self.conn.execute(self.SELECT_ALL):
+            yield _row_from_record(record)
+
+    def get(self, name):
+        """Return the row for name, or None"""
+        record = self.conn.execute(self.SELECT_ONE, (name,)).fetchone()
+        return _row_from_record(record) if record else None
+
+    def write(self, changes, rows):
+        """Apply changes in one transaction, batching runs of the same operation"""
+        with self.conn:
+            for op, run in groupby(changes, key=lambda change: change[0]):
+                if op == 'create':
+                    self.conn.executemany(self.INSERT, (_params(row) for _, _, row in run))
+                elif op == 'update':
+                    self.conn.executemany(self.UPDATE, (dict(_params(row), old_name=name) for _, name, row in run))
+                elif op == 'delete':
+                    self.conn.executemany(self.DELETE, ((name,) for _, name, _ in run))
+
+    def save(self, rows):
+        """Replace every stored row"""
+        with self.conn:
+            self.conn.execute(self.DELETE_ALL)
+            self.conn.executemany(self.INSERT, (_params(row) for row in rows))
+
+    def compact(self, rows):
+        """Checkpoint the write-ahead log into the database file"""
+        self.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def lookup(self):
+        return self
+
+    def snapshot(self):
+        return None
+
+    def version(self):
+        """SQLite's counter of commits made by other connections"""
+        return self.conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def _params(row):
+    """Convert a CSV-style row of strings to typed SQLite parameters"""
+    params = {field: row.get(field) for field in FIELDNAMES}
+    for field, cast in (('price', float), ('calories', int), ('size', int)):
+        try:
+            params[field] = cast(params[field]) if params[field] not in (None, '') else None
+        except (TypeError, ValueError):
+            pass  # kept as text, as the CSV file would
+    return params
+
+
+def _row_from_record(record):
+    """Convert an SQLite record back to a row of strings like the CSV backend returns"""
+    row = dict(zip(FIELDNAMES, record))
+    for field in ('price', 'calories', 'size'):
+        if row[field] is not None:
+            row[field] = str(row[field])
+    return row
+
+
+def open_backend(path, journaled=False, compact_threshold=COMPACT_THRESHOLD,
+                 fsync='always', fsync_interval=FSYNC_INTERVAL, snapshot=True):
+    """Pick the backend for a file path by its extension"""
+    if str(path).endswith(SQLITE_SUFFIXES):
+        return SqliteBackend(path, fsync)
+    return CsvBackend(path, journaled, compact_threshold, fsync, fsync_interval, snapshot)
+
+
+def migrate_csv_to_sqlite(csv_path, db_path):
+    """Copy every row of a CSV menu file into an SQLite database, returning the row count"""
+    # Later rows win over earlier rows with the same name, as they do in Menu
+    rows = list({row['name']: row for row in CsvBackend(csv_path, snapshot=False).load()}.values())
+    backend = SqliteBackend(db_path)
+    try:
+        backend.save(rows)
+    finally:
+        backend.close()
+    return len(rows)
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Menu storage tools')
+    commands = parser.add_subparsers(dest='command', required=True)
+    migrate = commands.add_parser('migrate', help='import an items.csv file into an SQLite database')
+    migrate.add_argument('csv_path')
+    migrate.add_argument('db_path')
+    args = parser.parse_args(argv)
+
+    if args.command == 'migrate':
+        count = migrate_csv_to_sqlite(args.csv_path, args.db_path)
+        print(f"Migrated {count} item(s) from {args.csv_path} to {args.db_path}")
+
+
+if __name__ == '__main__':
+    main()
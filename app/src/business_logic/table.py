@@ -0,0 +1,123 @@
+'''
+This module provides MenuTable, a columnar row store for the Menu class.
+
+Instead of one dict of strings per item, prices, calories and sizes are kept
+in typed arrays and the repeated type and image_path strings are interned.
+MenuTable behaves like the list of row dicts it replaces: rows are appended,
+read and replaced by slot, None marks a deleted slot, and reading a slot
+builds the row dict on demand.
+'''
+
+import sys
+from array import array
+
+NO_SIZE = -1  # size column value for items without a size
+
+
+class MenuTable:
+    def __init__(self, rows=()):
+        self._types = []
+        self._names = []  # None marks a deleted slot
+        self._prices = array('d')
+        self._descriptions = []
+        self._calories = array('q')
+        self._image_paths = []
+        self._sizes = array('l')
+        self._overflow = {}  # slot -> row dict for rows the typed columns cannot hold exactly
+        for row in rows:
+            self.append(row)
+
+    @classmethod
+    def from_columns(cls, types, names, prices, descriptions, calories, image_paths, sizes, overflow=None):
+        """Build a table from ready-made columns, e.g. those of a binary snapshot
+
+        prices, calories and sizes are arrays of the column types; overflow maps
+        slot -> row dict for rows stored whole.
+        """
+        table = cls()
+        table._types = [sys.intern(item_type) for item_type in types]
+        table._names = list(names)
+        table._prices = prices
+        table._descriptions = list(descriptions)
+        table._calories = calories
+        table._image_paths = [sys.intern(image_path) for image_path in image_paths]
+        table._sizes = sizes
+        for slot, row in (overflow or {}).items():
+            table._overflow[slot] = dict(row)
+            table._types[slot] = table._descriptions[slot] = table._image_paths[slot] = None
+        return table
+
+    def append(self, row):
+        """Add a row (or a deleted slot when row is None) at the end"""
+        self._types.append(None)
+        self._names.append(None)
+        self._prices.append(0.0)
+        self._descriptions.append(None)
+        self._calories.append(0)
+        self._image_paths.append(None)
+        self._sizes.append(NO_SIZE)
+        self[len(self._names) - 1] = row
+
+    def __setitem__(self, slot, row):
+        self._overflow.pop(slot, None)
+        if row is None:
+            self._names[slot] = None
+            self._descriptions[slot] = self._types[slot] = self._image_paths[slot] = None
+            return
+        columns = to_columns(row)
+        if columns is None:
+            self._overflow[slot] = dict(row)
+            self._names[slot] = row['name']
+            return
+        item_type, name, price, description, calories, image_path, size = columns
+        self._types[slot] = sys.intern(item_type)
+        self._names[slot] = name
+        self._prices[slot] = price
+        self._descriptions[slot] = description
+        self._calories[slot] = calories
+        self._image_paths[slot] = sys.intern(image_path)
+        self._sizes[slot] = size
+
+    def __getitem__(self, slot):
+        name = self._names[slot]
+        if name is None:
+            return None
+        if slot in self._overflow:
+            return dict(self._overflow[slot])
+        size = self._sizes[slot]
+        return {
+            'type': self._types[slot],
+            'name': name,
+            'price': str(self._prices[slot]),
+            'description': self._descriptions[slot],
+            'calories': str(self._calories[slot]),
+            'image_path': self._image_paths[slot],
+            'size': None if size == NO_SIZE else str(size)
+        }
+
+    def __iter__(self):
+        for slot in range(len(self._names)):
+            yield self[slot]
+
+    def __len__(self):
+        return len(self._names)
+
+
+def to_columns(row):
+    """Split a row into typed column values, or None if that would lose data"""
+    if set(row) - {'type', 'name', 'price', 'description', 'calories', 'image_path', 'size'}:
+        return None
+    try:
+        price = float(row['price'])
+        calories = int(row['calories'])
+        size = NO_SIZE if row.get('size') in (None, '') else int(row['size'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    # Keep the exact stored text, e.g. a hand-edited price of '3' is not turned into '3.0'
+    if str(price) != str(row['price']) or str(calories) != str(row['calories']):
+        return None
+    if size != NO_SIZE and (size < 0 or str(size) != str(row['size'])):
+        return None
+    if not all(isinstance(row.get(key), str) for key in ('type', 'name', 'description', 'image_path')):
+        return None
+    return row['type'], row['name'], price, row['description'], calories, row['image_path'], size
@@ -1,5 +1,27 @@
+'''
+Command-line interface for the menu.
+
+Without arguments it runs the interactive prompt. With arguments it runs one
+or more subcommands against a single loaded Menu and prints one JSON line per
+result, e.g.
+
+    python -m app.main --csv app/items.csv get Burger + delete Fries + list --type Drink
+    python -m app.main --script nightly.txt
+
+Operations are separated by a lone '+', or listed one per line in a script
+file ('-' reads stdin). All of them are parsed before any runs, and every
+change is written with one flush at the end.
+'''
+
+import csv
+import json
+import shlex
 import sys
-from src.business_logic.crud import Menu
+from ..business_logic.crud import Menu, load_item_file
+
+OPERATION_SEPARATOR = '+'
+
+
 def print_menu():
     print("\n" + "="*50)
     print("MENU MANAGEMENT SYSTEM")
@@ -7,11 +29,12 @@ def print_menu():
     print("\nAvailable Operations:")
     print("1. Create new item")
     print("2. Read all items")
-    print("3. Read specific item")
+    print("3. Search items")
     print("4. Delete item")
-    print("5. Exit")
+    print("5. Import items from CSV/JSONL file")
+    print("6. Exit")
     print("\n" + "-"*50)
-    print("Enter your choice (1-5): ", end="")
+    print("Enter your choice (1-6): ", end="")
 
 def get_item_details():
     print("\n" + "-"*50)
@@ -38,7 +61,7 @@ def get_item_details():
         'size': size
     }
 
-def main():
+def interactive():
     my_menu = Menu()
     
     while True:
@@ -69,7 +92,7 @@ def main():
             print("="*50)
                     
         elif choice == "3":
-            name = input("\nEnter item name to search: ").strip()
+            name = input("\nEnter item name or keywords to search: ").strip()
             item = my_menu.read_item(name)
             print("\n" + "="*50)
             if item:
@@ -77,7 +100,13 @@ def main():
                 for key, value in item.items():
                     print(f"{key}: {value}")
             else:
-                print("Item not found.")
+                matches = my_menu.search(name, limit=10)
+                if matches:
+                    print("Matching items:")
+                    for match in matches:
+                        print(f"- {match['name']} ({match['type']}): ${match['price']}")
+                else:
+                    print("Item not found.")
             print("="*50)
                 
         elif choice == "4":
@@ -93,6 +122,20 @@ def main():
                 print("!"*50)
                 
         elif choice == "5":
+            path = input("\nEnter path of CSV or JSONL file to import: ").strip()
+            try:
+                created, errors = my_menu.create_items(load_item_file(path), skip_invalid=True)
+                print("\n" + "="*50)
+                print(f"Imported {len(created)} item(s).")
+                for position, message in errors:
+                    print(f"Skipped row {position + 1}: {message}")
+                print("="*50)
+            except (OSError, ValueError) as e:
+                print("\n" + "!"*50)
+                print(f"Error: {e}")
+                print("!"*50)
+
+        elif choice == "6":
             print("\n" + "="*50)
             print("Goodbye!")
             print("="*50)
@@ -103,5 +146,180 @@ def main():
             print("Invalid choice. Please try again.")
             print("!"*50)
 
+def _add_item_fields(parser, required):
+    parser.add_argument('--price', required=required)
+    parser.add_argument('--description', required=required)
+    parser.add_argument('--calories', required=required)
+    parser.add_argument('--image-path', required=required)
+    parser.add_argument('--size')
+
+
+def build_parser(with_options=True):
+    """Parser for one operation, plus the global options when with_options is set"""
+    import argparse  # deferred: only batch runs parse arguments
+    parser = argparse.ArgumentParser(prog='menu', description='Scriptable menu operations')
+    if with_options:
+        parser.add_argument('--csv', default='app/items.csv', help='menu file (.csv, .db, .sqlite)')
+        parser.add_argument('--journaled', action='store_true', help='append changes to a journal')
+        parser.add_argument('--script', help="file of operations, one per line ('-' for stdin)")
+        parser.add_argument('--keep-going', action='store_true', help='run the rest after a failed operation')
+    operations = parser.add_subparsers(dest='op', required=not with_options)
+
+    create = operations.add_parser('create', help='create an item')
+    create.add_argument('--type', required=True, choices=Menu.VALID_TYPES)
+    create.add_argument('--name', required=True)
+    _add_item_fields(create, required=True)
+
+    get = operations.add_parser('get', help='print items by name')
+    get.add_argument('names', nargs='+')
+
+    listing = operations.add_parser('list', help='print every item, or those of one type')
+    listing.add_argument('--type', choices=Menu.VALID_TYPES)
+
+    update = operations.add_parser('update', help='change fields of an item')
+    update.add_argument('name')
+    _add_item_fields(update, required=False)
+
+    delete = operations.add_parser('delete', help='delete items by name')
+    delete.add_argument('names', nargs='+')
+
+    import_ = operations.add_parser('import', help='create the items in a CSV or JSONL file')
+    import_.add_argument('path')
+    import_.add_argument('--workers', type=int, help='parse and validate a CSV file in this many processes')
+
+    export = operations.add_parser('export', help='write every item to a CSV or JSONL file')
+    export.add_argument('path')
+    export.add_argument('--workers', type=int, help='format a CSV file in this many processes')
+
+    query = operations.add_parser('query', help='filter and sort items')
+    query.add_argument('--type', choices=Menu.VALID_TYPES)
+    query.add_argument('--price-min', type=float)
+    query.add_argument('--price-max', type=float)
+    query.add_argument('--calories-min', type=float)
+    query.add_argument('--calories-max', type=float)
+    query.add_argument('--sort-by', choices=Menu.SORTABLE_FIELDS)
+    query.add_argument('--descending', action='store_true')
+    query.add_argument('--limit', type=int)
+
+    search = operations.add_parser('search', help='rank items by keywords')
+    search.add_argument('text')
+    search.add_argument('--limit', type=int, default=10)
+    return parser
+
+
+def parse_operations(argv):
+    """Split argv on '+' and return (global options, list of parsed operations)"""
+    chunks = [[]]
+    for arg in argv:
+        if arg == OPERATION_SEPARATOR:
+            chunks.append([])
+        else:
+            chunks[-1].append(arg)
+    options = build_parser().parse_args(chunks[0])
+    operation_parser = build_parser(with_options=False)
+    operations = [options] if options.op else []
+    operations += [operation_parser.parse_args(chunk) for chunk in chunks[1:] if chunk]
+    if options.script:
+        file = sys.stdin if options.script == '-' else open(options.script)
+        with file:
+            for line in file:
+                if line.strip() and not line.lstrip().startswith('#'):
+                    operations.append(operation_parser.parse_args(shlex.split(line)))
+    return options, operations
+
+
+def run_operation(menu, op):
+    """Apply one parsed operation and yield its result records"""
+    if op.op == 'create':
+        yield {'item': menu.create_item(op.type, op.name, op.price, op.description, op.calories,
+                                        op.image_path, op.size)}
+    elif op.op == 'get':
+        for name in op.names:
+            item = menu.read_item(name)
+            if item is None:
+                raise ValueError(f"Item with name '{name}' not found")
+            yield {'item': item}
+    elif op.op == 'list':
+        for item in menu.iter_items():
+            if op.type is None or item['type'] == op.type:
+                yield {'item': item}
+    elif op.op == 'update':
+        fields = {key: getattr(op, key) for key in ('price', 'description', 'calories', 'image_path', 'size')
+                  if getattr(op, key) is not None}
+        yield {'item': menu.update_item(op.name, **fields)}
+    elif op.op == 'delete':
+        deleted, _ = menu.delete_items(op.names)
+        yield {'deleted': deleted}
+    elif op.op == 'import':
+        if op.workers and not op.path.endswith('.jsonl'):
+            from ..business_logic import parallel_io  # deferred: only parallel imports and exports use it
+            created, errors = parallel_io.import_items(menu, op.path, op.workers, skip_invalid=True)
+        else:
+            created, errors = menu.create_items(load_item_file(op.path), skip_invalid=True)
+        yield {'created': len(created), 'skipped': [{'row': position + 1, 'error': message}
+                                                    for position, message in errors]}
+    elif op.op == 'export':
+        if op.workers and not op.path.endswith('.jsonl'):
+            from ..business_logic import parallel_io
+            yield {'path': op.path, 'count': parallel_io.write_rows(menu.iter_items(), op.path, op.workers)}
+        else:
+            yield {'path': op.path, 'count': export_items(menu, op.path)}
+    elif op.op == 'query':
+        for item in menu.query(op.type, op.price_min, op.price_max, op.calories_min, op.calories_max,
+                               op.sort_by, op.descending, op.limit):
+            yield {'item': item}
+    elif op.op == 'search':
+        for item in menu.search(op.text, op.limit):
+            yield {'item': item}
+
+
+def export_items(menu, path):
+    """Write every item to a .jsonl file, or a CSV file in the items.csv format"""
+    count = 0
+    with open(path, 'w', newline='') as file:
+        if path.endswith('.jsonl'):
+            for item in menu.iter_items():
+                file.write(json.dumps(item) + '\n')
+                count += 1
+        else:
+            writer = csv.DictWriter(file, fieldnames=Menu.FIELDNAMES)
+            writer.writeheader()
+            for item in menu.iter_items():
+                writer.writerow(item)
+                count += 1
+    return count
+
+
+def run_batch(argv, out=None):
+    """Run the operations in argv and return the process exit status"""
+    out = out or sys.stdout
+    options, operations = parse_operations(argv)
+    # Lazy: reads by name need no full load, and the first write loads the rest
+    menu = Menu(csv_path=options.csv, journaled=options.journaled, lazy=True)
+    failed = False
+    try:
+        with menu.deferred():
+            for position, op in enumerate(operations, 1):
+                try:
+                    for record in run_operation(menu, op):
+                        out.write(json.dumps({'op': op.op, 'position': position, 'ok': True, **record}) + '\n')
+                except (OSError, ValueError) as e:
+                    failed = True
+                    out.write(json.dumps({'op': op.op, 'position': position, 'ok': False, 'error': str(e)}) + '\n')
+                    if not options.keep_going:
+                        break
+    finally:
+        menu.close()  # also on unexpected errors, so the journal is not left open
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        interactive()
+    else:
+        sys.exit(run_batch(argv))
+
+
 if __name__ == "__main__":
     main() 
\ No newline at end of file
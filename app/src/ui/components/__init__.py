@@ -1,6 +1,31 @@
-from .menu_header import MenuHeader
-from .menu_scroll import MenuScrollView
-from .menu_footer import MenuFooter
-from .item_form import ItemForm
+'''
+Kivy widgets for the GUI.
 
-__all__ = ['MenuHeader', 'MenuScrollView', 'MenuFooter', 'ItemForm']
+The widgets are imported on first attribute access, so importing this package
+(or anything beside it in app.src.ui) does not load Kivy. menu_rows holds the
+Kivy-free data model behind MenuScrollView.
+'''
+
+import importlib
+
+_MODULES = {
+    'MenuHeader': '.menu_header',
+    'MenuScrollView': '.menu_scroll',
+    'MenuFooter': '.menu_footer',
+    'ItemForm': '.item_form',
+}
+
+__all__ = list(_MODULES)
+
+
+def __getattr__(name):
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value  # later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -58,12 +58,12 @@ class ItemForm(BoxLayout):
     def _on_submit(self, instance):
         if self.on_submit:
             data = {
-                'type': self.type_spinner.text,
+                'item_type': self.type_spinner.text,
                 'name': self.name_input.text,
                 'price': float(self.price_input.text),
                 'description': self.desc_input.text,
                 'calories': int(self.calories_input.text),
                 'image_path': self.image_input.text,
-                'size': self.size_input.text if self.type_spinner.text == 'Drink' else None
+                'size': int(self.size_input.text) if self.type_spinner.text == 'Drink' else None
             }
             self.on_submit(data) 
\ No newline at end of file
@@ -0,0 +1,54 @@
+'''
+The data behind the GUI's menu list, kept free of Kivy so it can be tested
+and benchmarked headless.
+
+A RecycleView draws only the rows on screen from a list of dicts, one per
+item. MenuRows owns that list and patches it in place from the same
+(op, name, row) changes Menu persists, so a create appends one entry, an
+update replaces one and a delete removes one, instead of rebuilding the list.
+'''
+
+ROW_HEIGHT = 40
+
+
+def row_view(item):
+    """The RecycleView properties for one menu item"""
+    return {'name': item['name'], 'text': f"{item['name']} - ${item['price']}"}
+
+
+class MenuRows:
+    def __init__(self, data=None):
+        self.data = data if data is not None else []  # e.g. RecycleView.data, an ObservableList
+        self._positions = {}  # item name -> index in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+    def reset(self, items):
+        """Replace every row, with a single change notification"""
+        rows = [row_view(item) for item in items]
+        self._positions = {row['name']: position for position, row in enumerate(rows)}
+        self.data[:] = rows
+
+    def apply(self, changes):
+        """Patch the rows from a list of (op, name, row) changes"""
+        removed = []
+        for op, name, row in changes:
+            if op == 'delete':
+                position = self._positions.pop(name, None)
+                if position is not None:
+                    removed.append(position)
+            elif name in self._positions:
+                self.data[self._positions[name]] = row_view(row)
+            else:
+                self._positions[name] = len(self.data)
+                self.data.append(row_view(row))
+        if removed:
+            self._remove(removed)
+
+    def _remove(self, positions):
+        """Delete rows by position, renumbering the rows after the first one once"""
+        for position in sorted(positions, reverse=True):
+            del self.data[position]
+        for position in range(min(positions), len(self.data)):
+            self._positions[self.data[position]['name']] = position
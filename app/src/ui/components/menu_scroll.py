@@ -1,20 +1,34 @@
-from kivy.uix.scrollview import ScrollView
-from kivy.uix.gridlayout import GridLayout
+from kivy.properties import StringProperty
 from kivy.uix.button import Button
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
 
-class MenuScrollView(ScrollView):
-    def __init__(self, categories=None, **kwargs):
+from .menu_rows import ROW_HEIGHT, MenuRows
+
+
+class MenuRow(RecycleDataViewBehavior, Button):
+    """One visible row; RecycleView rebinds the same few instances as the list scrolls"""
+    name = StringProperty('')
+
+
+class MenuScrollView(RecycleView):
+    def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.size_hint = (1, 0.8)
-        
-        grid = GridLayout(cols=1, spacing=10, size_hint_y=None)
-        grid.bind(minimum_height=grid.setter('height'))
-        
-        if categories is None:
-            categories = ['Entrees', 'Drinks', 'Desserts']
-            
-        for cat in categories:
-            btn = Button(text=cat, size_hint_y=None, height=40)
-            grid.add_widget(btn)
-            
-        self.add_widget(grid) 
\ No newline at end of file
+        self.viewclass = MenuRow
+
+        layout = RecycleBoxLayout(orientation='vertical', spacing=10, size_hint_y=None,
+                                  default_size=(None, ROW_HEIGHT), default_size_hint=(1, None))
+        layout.bind(minimum_height=layout.setter('height'))
+        self.add_widget(layout)
+
+        self.rows = MenuRows(self.data)
+
+    def set_items(self, items):
+        """Show these items, replacing whatever is listed"""
+        self.rows.reset(items)
+
+    def apply(self, changes):
+        """Patch the list from (op, name, row) changes instead of rebuilding it"""
+        self.rows.apply(changes)
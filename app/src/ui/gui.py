@@ -6,18 +6,22 @@ from kivy.uix.button import Button
 from kivy.uix.textinput import TextInput
 from kivy.uix.label import Label
 import traceback
-from src.gui.components import MenuHeader, MenuScrollView, MenuFooter, ItemForm
-from app.src.business_logic.crud import MenuCRUD
+from .components import MenuHeader, MenuScrollView, MenuFooter, ItemForm
+from ..business_logic.crud import Menu
 
 class MenuScreen(BoxLayout):
+    CHANGE_OPS = {'created': 'create', 'updated': 'update', 'deleted': 'delete'}
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.orientation = 'vertical'
-        self.crud = MenuCRUD()
+        self.crud = Menu()
         
         # Add components
         self.add_widget(MenuHeader())
         self.menu_scroll = MenuScrollView()
+        self.menu_scroll.set_items(self.crud.read_items())
+        self.crud.subscribe(self.on_menu_change)
         self.add_widget(self.menu_scroll)
         
         # Add CRUD buttons
@@ -42,36 +46,52 @@ class MenuScreen(BoxLayout):
     def add_item(self, data):
         try:
             self.crud.create_item(**data)
-            self.refresh_menu()
         except Exception as e:
             self.show_error(str(e))
 
     def show_delete_dialog(self, instance):
         content = BoxLayout(orientation='vertical')
-        name_input = TextInput(hint_text='Enter item name to delete')
+        name_input = TextInput(hint_text='Enter item name to delete', multiline=False, size_hint_y=None, height=40)
         content.add_widget(name_input)
-        
-        btn = Button(text='Delete')
+
+        # Ranked matches for what has been typed so far; tapping one fills in its name
+        suggestions = BoxLayout(orientation='vertical')
+        content.add_widget(suggestions)
+        name_input.bind(text=lambda field, text: self.show_suggestions(suggestions, name_input, text))
+
+        btn = Button(text='Delete', size_hint_y=None, height=40)
         btn.bind(on_press=lambda x: self.delete_item(name_input.text))
         content.add_widget(btn)
         
-        popup = Popup(title='Delete Item', content=content, size_hint=(0.8, 0.4))
+        popup = Popup(title='Delete Item', content=content, size_hint=(0.8, 0.6))
         btn.bind(on_press=lambda x: popup.dismiss())
         popup.open()
 
+    def show_suggestions(self, suggestions, name_input, text):
+        suggestions.clear_widgets()
+        for item in self.crud.search(text, limit=5):
+            if item['name'] == text:
+                continue
+            btn = Button(text=f"{item['name']} ({item['type']})", size_hint_y=None, height=32)
+            btn.bind(on_press=lambda x, name=item['name']: setattr(name_input, 'text', name))
+            suggestions.add_widget(btn)
+
     def delete_item(self, name):
         try:
             self.crud.delete_item(name)
-            self.refresh_menu()
         except Exception as e:
             self.show_error(str(e))
 
+    def on_menu_change(self, event):
+        """Patch the list from a Menu change event instead of relisting every item"""
+        if event.kind == 'reloaded':
+            self.menu_scroll.set_items(self.crud.read_items())
+        else:
+            self.menu_scroll.apply([(self.CHANGE_OPS[event.kind], event.name, event.after)])
+
     def refresh_menu(self):
-        items = self.crud.read_items()
-        self.menu_scroll.clear_widgets()
-        for item in items:
-            btn = Button(text=f"{item['name']} - ${item['price']}", size_hint_y=None, height=40)
-            self.menu_scroll.add_widget(btn)
+        """Pick up changes another process made; they arrive through on_menu_change"""
+        self.crud.refresh()
 
     def show_error(self, message):
         popup = Popup(title='Error', content=Label(text=message), size_hint=(0.8, 0.4))
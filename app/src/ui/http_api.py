@@ -0,0 +1,297 @@
+'''
+This module provides an HTTP/JSON API over the Menu, built on asyncio streams
+from the standard library.
+
+    GET    /items                 all items, or the result of Menu.query when any of
+                                  type, price_min, price_max, calories_min, calories_max,
+                                  sort_by, descending or limit is given
+    GET    /items/<name>          one item
+    POST   /items                 create an item from a JSON object
+    PATCH  /items/<name>          update the fields in a JSON object
+    DELETE /items/<name>          delete an item
+    POST   /orders                submit {"items": [{"name": ..., "quantity": ...}]}
+    GET    /changes?since=<seq>   change events after seq, for incremental sync; 410 Gone
+                                  once they have left the change log, or when seq is from
+                                  before a restart (read /items again)
+
+Every connection is served by its own task and kept alive between requests.
+Reads and the in-memory half of each write run on the event loop thread, so
+they never wait on a lock. The menu is held in deferred mode and the file
+write behind each change runs on a single writer thread; a write is answered
+once it is on disk, and writes that arrive while one is being flushed share
+the next flush; a failed flush answers 500 and keeps its changes pending for
+the next one. Orders go through an OrderPipeline and a full pipeline
+answers 503.
+
+GET /items, alone or with only a type, is answered from a pre-serialised
+snapshot (see http_cache) with an ETag; If-None-Match gets 304 Not Modified
+and clients that accept gzip get the compressed copy.
+
+Run from the repository root:
+
+    python -m app.src.ui.http_api --csv app/items.csv --port 8080
+'''
+
+import argparse
+import asyncio
+import json
+import queue
+import signal
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from ..business_logic.crud import ItemNotFound, Menu, creation_fields
+from ..business_logic.orders import OrderPipeline, open_order_sink
+from .http_cache import SnapshotCache
+
+MAX_BODY = 1 << 20  # bytes
+REASONS = {200: 'OK', 201: 'Created', 204: 'No Content', 304: 'Not Modified',
+           400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 410: 'Gone', 413: 'Payload Too Large',
+           500: 'Internal Server Error', 503: 'Service Unavailable'}
+QUERY_PARAMS = {'type': str, 'price_min': float, 'price_max': float, 'calories_min': float,
+                'calories_max': float, 'sort_by': str, 'limit': int,
+                'descending': lambda value: value.lower() in ('1', 'true', 'yes')}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Response:
+    """An already serialised response body with extra headers"""
+
+    def __init__(self, body, headers=()):
+        self.body = body
+        self.headers = list(headers)
+
+
+class MenuHttpApi:
+    def __init__(self, menu, pipeline=None):
+        self.menu = menu
+        self.pipeline = pipeline
+        self.snapshots = SnapshotCache(menu)
+        self._writer = ThreadPoolExecutor(max_workers=1)  # file writes, one at a time and in order
+
+    async def handle_connection(self, reader, writer):
+        """Serve requests on one connection until the client closes it"""
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HttpError as e:
+                    writer.write(_response(e.status, {'error': str(e)}, keep_alive=False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                try:
+                    status, payload = await self.dispatch(method, target, body, headers)
+                except HttpError as e:
+                    status, payload = e.status, {'error': str(e)}
+                except Exception:
+                    # e.g. a failed flush: answer instead of dropping the connection
+                    traceback.print_exc()
+                    status, payload = 500, {'error': "Internal server error"}
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        """Return (method, target, headers, body), or None at the end of the stream"""
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        try:
+            method, target, _ = line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            return None
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            raise HttpError(400, "Invalid Content-Length")
+        if length > MAX_BODY:
+            raise HttpError(413, f"Request body is larger than {MAX_BODY} bytes")
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target, headers, body
+
+    async def dispatch(self, method, target, body, headers=None):
+        """Route one request and return (status, JSON-serialisable payload or Response)"""
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip('/').split('/')]
+        if parts[0] == 'items' and len(parts) == 1:
+            if method == 'GET':
+                params = dict(parse_qsl(url.query))
+                if not params.keys() - {'type'} and params.get('type') in [None] + Menu.VALID_TYPES:
+                    return self.cached_items(params.get('type'), headers or {})
+                return 200, self.list_items(params)
+            if method == 'POST':
+                return 201, await self.write(self.menu.create_item, **creation_fields(_json(body)))
+        elif parts[0] == 'items' and len(parts) == 2:
+            name = parts[1]
+            if method == 'GET':
+                item = self.menu.read_item(name)
+                if item is None:
+                    raise HttpError(404, f"Item with name '{name}' not found")
+                return 200, item
+            if method in ('PATCH', 'PUT'):
+                return 200, await self.write(self.menu.update_item, name, **_json(body))
+            if method == 'DELETE':
+                await self.write(self.menu.delete_item, name)
+                return 204, None
+        elif parts == ['changes']:
+            if method == 'GET':
+                return 200, self.list_changes(dict(parse_qsl(url.query)))
+        elif parts == ['orders'] and self.pipeline is not None:
+            if method == 'POST':
+                return 201, await self.submit_order(_json(body))
+        else:
+            raise HttpError(404, f"No route for {url.path}")
+        raise HttpError(405, f"{method} is not allowed on {url.path}")
+
+    def cached_items(self, item_type, headers):
+        """Answer a full or per-type listing from its snapshot"""
+        snapshot = self.snapshots.get(item_type)
+        use_gzip = 'gzip' in headers.get('accept-encoding', '')
+        etag = snapshot.gzip_etag if use_gzip else snapshot.etag
+        cache_headers = [f"ETag: {etag}", "Vary: Accept-Encoding", "Cache-Control: no-cache"]
+        if snapshot.matches(headers.get('if-none-match')):
+            return 304, Response(b'', cache_headers)
+        if use_gzip:
+            return 200, Response(snapshot.gzip_body, cache_headers + ["Content-Encoding: gzip"])
+        return 200, Response(snapshot.body, cache_headers)
+
+    def list_items(self, params):
+        """All items, or a Menu.query when filters are given"""
+        filters = {}
+        for key, value in params.items():
+            if key not in QUERY_PARAMS:
+                raise HttpError(400, f"Unknown query parameter '{key}'")
+            try:
+                filters[key] = QUERY_PARAMS[key](value)
+            except ValueError:
+                raise HttpError(400, f"Invalid value for '{key}'")
+        if not filters:
+            return self.menu.read_items()
+        try:
+            return self.menu.query(**filters)
+        except ValueError as e:
+            raise HttpError(400, str(e))
+
+    def list_changes(self, params):
+        """Change events after ?since=, with the sequence number to continue from"""
+        try:
+            since = int(params.get('since', 0))
+        except ValueError:
+            raise HttpError(400, "Invalid value for 'since'")
+        events = self.menu.changes_since(since)
+        if events is None:
+            raise HttpError(410, f"Changes after {since} are not available, read the menu again")
+        return {'seq': self.menu.seq, 'changes': [event.as_dict() for event in events]}
+
+    async def write(self, method, *args, **kwargs):
+        """Apply a Menu write in memory, then wait until it is flushed to storage"""
+        try:
+            result = method(*args, **kwargs)
+        except ItemNotFound as e:
+            raise HttpError(404, str(e))
+        except (TypeError, ValueError) as e:
+            raise HttpError(400, str(e))
+        await asyncio.get_running_loop().run_in_executor(self._writer, self.menu.flush)
+        return result
+
+    async def submit_order(self, request):
+        try:
+            future = self.pipeline.submit(request, block=False)
+        except queue.Full:
+            raise HttpError(503, "Order queue is full, retry later")
+        try:
+            return await asyncio.wrap_future(future)
+        except ValueError as e:
+            raise HttpError(400, str(e))
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        """Serve, with the menu in deferred mode, until SIGINT or SIGTERM"""
+        loop = asyncio.get_running_loop()
+        stopped = loop.create_future()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, lambda: stopped.done() or stopped.set_result(None))
+            except (NotImplementedError, RuntimeError):
+                pass  # no signal handlers on this platform or thread
+        with self.menu.deferred():
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            async with server:
+                await stopped
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+        if self.pipeline is not None:
+            self.pipeline.close()
+
+
+def _json(body):
+    try:
+        value = json.loads(body or b'{}')
+    except ValueError:
+        raise HttpError(400, "Request body is not valid JSON")
+    if not isinstance(value, dict):
+        raise HttpError(400, "Request body must be a JSON object")
+    return value
+
+
+def _response(status, payload, keep_alive):
+    extra = []
+    if isinstance(payload, Response):
+        body, extra = payload.body, payload.headers
+    else:
+        body = b'' if payload is None else json.dumps(payload).encode()
+    head = [
+        f"HTTP/1.1 {status} {REASONS[status]}",
+        "Content-Type: application/json",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ] + extra
+    return ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the menu over HTTP")
+    parser.add_argument('--csv', default='app/items.csv', help='menu file (.csv, .db, .sqlite)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--journaled', action='store_true')
+    parser.add_argument('--orders', default='orders.jsonl', help='order log (.jsonl, .csv or .db)')
+    parser.add_argument('--order-workers', type=int, default=4)
+    args = parser.parse_args(argv)
+
+    menu = Menu(csv_path=args.csv, journaled=args.journaled)
+    pipeline = OrderPipeline(menu, open_order_sink(args.orders), workers=args.order_workers)
+    api = MenuHttpApi(menu, pipeline)
+    print(f"Serving {args.csv} on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(api.serve(args.host, args.port))
+    finally:
+        api.close()
+        menu.close()
+
+
+if __name__ == '__main__':
+    main()
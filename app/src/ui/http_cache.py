@@ -0,0 +1,57 @@
+'''
+This module provides the pre-serialised menu snapshots behind GET /items.
+
+Serialising every row on every request is wasted work when the menu changes a
+few times a day. SnapshotCache keeps the JSON bytes of the full menu, and of
+each item type, together with a gzip copy and an ETag derived from the
+content. A snapshot is rebuilt on the next request after Menu.revision moves,
+i.e. after a create, update or delete, and is served as is until then.
+'''
+
+import gzip
+import hashlib
+import json
+
+
+class Snapshot:
+    __slots__ = ('revision', 'body', 'gzip_body', 'etag')
+
+    def __init__(self, revision, body, compresslevel):
+        self.revision = revision
+        self.body = body
+        self.gzip_body = gzip.compress(body, compresslevel, mtime=0)  # mtime=0 keeps it byte-stable
+        self.etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+    def matches(self, if_none_match):
+        """True if an If-None-Match header names this snapshot in either encoding"""
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == '*':
+            return True
+        tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+        return self.etag in tags or self.gzip_etag in tags
+
+    @property
+    def gzip_etag(self):
+        return self.etag[:-1] + '-gzip"'
+
+
+class SnapshotCache:
+    def __init__(self, menu, compresslevel=6):
+        self.menu = menu
+        self.compresslevel = compresslevel
+        self._snapshots = {}  # item type, or None for the whole menu -> Snapshot
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, item_type=None):
+        """Return the current snapshot of the menu, or of one item type"""
+        snapshot = self._snapshots.get(item_type)
+        if snapshot is not None and snapshot.revision == self.menu.revision:
+            self.hits += 1
+            return snapshot
+        self.misses += 1
+        rows = self.menu.read_items() if item_type is None else self.menu.query(type=item_type)
+        snapshot = Snapshot(self.menu.revision, json.dumps(rows).encode(), self.compresslevel)
+        self._snapshots[item_type] = snapshot
+        return snapshot
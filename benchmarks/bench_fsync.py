@@ -0,0 +1,51 @@
+'''
+Write throughput of the CSV backend under each fsync policy.
+
+Each run applies single-item updates to a synthetic catalog, once with full
+atomic rewrites and once journaled. Run from the repository root:
+
+    python -m benchmarks.bench_fsync --items 1000 --writes 200
+'''
+
+import argparse
+import os
+import tempfile
+import time
+
+from app.src.business_logic.crud import Menu
+from app.src.business_logic.durability import FSYNC_POLICIES
+from benchmarks.catalog import write_csv
+
+
+def run(csv_path, policy, journaled, writes):
+    """Return updates per second"""
+    menu = Menu(csv_path=csv_path, journaled=journaled, fsync=policy)
+    names = [item['name'] for item in menu.read_items()[:writes]]
+    start = time.perf_counter()
+    for i, name in enumerate(names):
+        menu.update_item(name, price=round(1 + i % 20 + 0.99, 2))
+    elapsed = time.perf_counter() - start
+    menu.close()
+    return len(names) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=1000)
+    parser.add_argument('--writes', type=int, default=200)
+    parser.add_argument('--dir', default=None, help='directory on the disk to measure (default: system temp)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as temp_dir:
+        print(f"{args.items} items, {args.writes} updates")
+        print(f"{'policy':<10}{'rewrite ops/s':>16}{'journaled ops/s':>18}")
+        for policy in FSYNC_POLICIES:
+            results = []
+            for journaled in (False, True):
+                csv_path = write_csv(os.path.join(temp_dir, f"{policy}-{journaled}.csv"), args.items)
+                results.append(run(csv_path, policy, journaled, args.writes))
+            print(f"{policy:<10}{results[0]:>16,.0f}{results[1]:>18,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+'''
+Refresh time of the GUI menu list against item count, headless.
+
+Always times the MenuRows data model behind the RecycleView: a full reset and
+single-item create, update and delete diffs. When Kivy is installed it also
+times, without opening a window, the old refresh (clear_widgets() and one
+Button per item) against MenuScrollView, which lays out only the visible
+rows. Run from the repository root:
+
+    python -m benchmarks.bench_gui_list --sizes 100 1000 10000 50000
+'''
+
+import argparse
+import importlib.util
+import os
+import time
+
+from app.src.ui.components.menu_rows import MenuRows
+from benchmarks.catalog import generate_rows
+
+DEFAULT_SIZES = [100, 1000, 10000, 50000]
+VIEW_SIZE = (400, 600)
+
+
+def _timed(call):
+    start = time.perf_counter()
+    call()
+    return (time.perf_counter() - start) * 1000
+
+
+def _diffs(rows, items):
+    """Time one create, update and delete, in milliseconds"""
+    middle = items[len(items) // 2]
+    new_item = dict(middle, name='Benchmark Item')
+    return {
+        'create': _timed(lambda: rows.apply([('create', new_item['name'], new_item)])),
+        'update': _timed(lambda: rows.apply([('update', middle['name'], dict(middle, price='1.99'))])),
+        'delete': _timed(lambda: rows.apply([('delete', middle['name'], None)])),
+    }
+
+
+def model_timings(items):
+    rows = MenuRows()
+    return dict(reset=_timed(lambda: rows.reset(items)), **_diffs(rows, items))
+
+
+def widget_timings(items):
+    """Old full rebuild vs the RecycleView, each including the layout pass"""
+    os.environ.setdefault('KIVY_NO_ARGS', '1')
+    os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+    from kivy.clock import Clock
+    from kivy.uix.button import Button
+    from kivy.uix.gridlayout import GridLayout
+    from app.src.ui.components.menu_scroll import MenuScrollView
+
+    def rebuild(grid):
+        grid.clear_widgets()
+        for item in items:
+            grid.add_widget(Button(text=f"{item['name']} - ${item['price']}", size_hint_y=None, height=40))
+        Clock.tick()
+
+    grid = GridLayout(cols=1, spacing=10, size_hint_y=None, width=VIEW_SIZE[0])
+    view = MenuScrollView(size=VIEW_SIZE)
+
+    def settle(call):
+        return lambda: (call(), Clock.tick())
+
+    timings = {
+        'old_rebuild': _timed(lambda: rebuild(grid)),
+        'reset': _timed(settle(lambda: view.set_items(items))),
+    }
+    diffs = _diffs(MenuRows(view.data), items)  # timings of the data change alone
+    timings.update({f"{op}_data": value for op, value in diffs.items()})
+    timings['visible_rows'] = len(view.layout_manager.children) if view.layout_manager else 0
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    args = parser.parse_args()
+    has_kivy = importlib.util.find_spec('kivy') is not None
+
+    print(f"{'items':>8}{'reset ms':>12}{'create ms':>12}{'update ms':>12}{'delete ms':>12}")
+    for size in args.sizes:
+        items = list(generate_rows(size))
+        model = model_timings(items)
+        print(f"{size:>8}{model['reset']:>12.3f}{model['create']:>12.3f}"
+              f"{model['update']:>12.3f}{model['delete']:>12.3f}")
+
+    if not has_kivy:
+        print("\nKivy is not installed: widget timings skipped")
+        return
+    print(f"\n{'items':>8}{'old rebuild ms':>16}{'recycled ms':>14}{'visible rows':>14}")
+    for size in args.sizes:
+        widgets = widget_timings(list(generate_rows(size)))
+        print(f"{size:>8}{widgets['old_rebuild']:>16.1f}{widgets['reset']:>14.1f}{widgets['visible_rows']:>14}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+'''
+Import time of the headless entry points, measured with python -X importtime.
+
+Each target is imported in a fresh interpreter; the best of --runs is
+reported along with the slowest modules it pulled in. The run fails if a
+target loads Kivy, the GUI modules or another dependency that is meant to be
+imported only on first use, or if it is slower than --max-ms (MAX_MS unless
+given; 0 turns the limit off). Run from the repository root:
+
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --max-ms 30 --top 15
+'''
+
+import argparse
+import os
+import subprocess
+import sys
+
+DEFAULT_TARGETS = ['app.src.business_logic.crud', 'app.src.ui.cli', 'app.main']
+# Module name prefixes the targets must not import eagerly
+DEFERRED = ['kivy', 'app.src.ui.gui', 'app.src.ui.components.', 'sqlite3', 'argparse',
+            'app.src.business_logic.parallel_io', 'multiprocessing', 'concurrent.futures']
+MAX_MS = 40  # about 25 ms on a slow single-CPU machine, with room for its noise
+
+
+def measure(target, startup=()):
+    """Return ({module: cumulative microseconds}, total microseconds) for one fresh import
+
+    Modules in startup, those the interpreter loads before running -c, are left out of both.
+    """
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)  # time imports from cached bytecode, as installs do
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {target}"],
+                            capture_output=True, text=True, env=env, check=True)
+    modules, total = {}, 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if name.strip() in startup:
+            continue
+        modules[name.strip()] = int(cumulative)
+        if name[1] != ' ':  # top level, not imported by another module on the list
+            total += int(cumulative)
+    return modules, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('targets', nargs='*', default=DEFAULT_TARGETS)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=8, help='slowest modules to list per target')
+    parser.add_argument('--max-ms', type=float, default=MAX_MS, help='fail if a target takes longer than this')
+    args = parser.parse_args()
+
+    startup = set(measure('sys')[0])
+    failures = []
+    for target in args.targets:
+        measure(target)  # warm the bytecode cache
+        modules, total = min((measure(target, startup) for _ in range(args.runs)), key=lambda run: run[1])
+        print(f"\n{target}: {total / 1000:.1f} ms, {len(modules)} modules")
+        slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)
+        for name, cumulative in slowest[:args.top]:
+            print(f"  {cumulative / 1000:>8.1f} ms  {name}")
+        eager = sorted(name for name in modules if any(name.startswith(prefix) for prefix in DEFERRED))
+        if eager:
+            failures.append(f"{target} imports {', '.join(eager)}")
+        if args.max_ms and total / 1000 > args.max_ms:
+            failures.append(f"{target} took {total / 1000:.1f} ms (limit {args.max_ms} ms)")
+
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
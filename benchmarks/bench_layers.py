@@ -0,0 +1,102 @@
+'''
+Multi-location benchmark: a full menu copy per store versus one base menu
+with per-store override layers.
+
+Measures the memory held, the disk used and the time of a chain-wide price
+change both ways, plus a resolved read at one store. Run from the repository
+root:
+
+    python -m benchmarks.bench_layers --stores 300 --items 10000 --overrides 20
+'''
+
+import argparse
+import gc
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from app.src.business_logic.crud import Menu
+from app.src.business_logic.layers import MenuRegistry
+from benchmarks.catalog import write_csv
+
+
+def measure(build):
+    """Return (object, bytes retained) for the object build() returns"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, retained
+
+
+def directory_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--stores', type=int, default=50)
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--overrides', type=int, default=20, help='price overrides per store')
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        base_path = write_csv(os.path.join(temp_dir, 'items.csv'), args.items)
+        names = [row['name'] for row in Menu(csv_path=base_path, snapshot=False).read_items()]
+        stores = [f"store-{number}" for number in range(args.stores)]
+        changed = names[len(names) // 2]
+
+        # One full copy per store
+        copies_dir = os.path.join(temp_dir, 'copies')
+        os.makedirs(copies_dir)
+        for store in stores:
+            shutil.copy(base_path, os.path.join(copies_dir, f"{store}.csv"))
+        copies, copies_bytes = measure(lambda: [Menu(csv_path=os.path.join(copies_dir, f"{store}.csv"),
+                                                     snapshot=False, fsync='never') for store in stores])
+        start = time.perf_counter()
+        for menu in copies:
+            menu.update_item(changed, price=1.25)
+        copies_update = time.perf_counter() - start
+        copies_disk = directory_size(copies_dir)
+        del copies
+
+        # One base menu plus an override layer per store
+        layers_dir = os.path.join(temp_dir, 'locations')
+
+        def build_layers():
+            base = Menu(csv_path=base_path, snapshot=False, fsync='never')
+            registry = MenuRegistry(base, layers_dir, capacity=args.stores, fsync='never')
+            for store in stores:
+                registry.get(store).update_items([{'name': name, 'price': round(rng.uniform(1, 30), 2)}
+                                                  for name in rng.sample(names, args.overrides)])
+            return base, registry
+        (base, registry), layers_bytes = measure(build_layers)
+        start = time.perf_counter()
+        base.update_item(changed, price=1.25)
+        layers_update = time.perf_counter() - start
+        layers_disk = os.path.getsize(base_path) + directory_size(layers_dir)
+        store = registry.get(stores[-1])
+        start = time.perf_counter()
+        store.read_items()
+        first_read = time.perf_counter() - start
+        start = time.perf_counter()
+        store.read_items()
+        cached_read = time.perf_counter() - start
+        registry.close()
+
+    print(f"{args.stores} stores, {args.items} items, {args.overrides} overrides per store")
+    print(f"{'':24}{'copies':>12}{'layered':>12}")
+    print(f"{'memory MiB':24}{copies_bytes / 2**20:>12.1f}{layers_bytes / 2**20:>12.1f}")
+    print(f"{'disk MiB':24}{copies_disk / 2**20:>12.1f}{layers_disk / 2**20:>12.1f}")
+    print(f"{'chain price change ms':24}{copies_update * 1000:>12.1f}{layers_update * 1000:>12.1f}")
+    print(f"Resolved read_items() at one store: {first_read * 1000:.1f} ms, then {cached_read * 1000:.2f} ms cached")
+
+
+if __name__ == '__main__':
+    main()
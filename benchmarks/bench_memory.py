@@ -0,0 +1,66 @@
+'''
+Memory benchmark: list-of-dicts rows versus the columnar MenuTable store.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_memory --items 100000
+'''
+
+import argparse
+import gc
+import os
+import tempfile
+import tracemalloc
+
+from app.src.business_logic import models
+from app.src.business_logic.crud import Menu
+from benchmarks.catalog import write_csv
+
+
+def measure(build):
+    """Return (object, bytes retained) for the object build() returns"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, retained
+
+
+class _DictEntree:
+    """Entree without __slots__, to show what the model slots save"""
+
+    def __init__(self, name, price, description, calories, image_path):
+        self.name = name
+        self.price = price
+        self.description = description
+        self.calories = calories
+        self.image_path = image_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        csv_path = write_csv(os.path.join(temp_dir, 'items.csv'), args.items)
+        _, dict_bytes = measure(lambda: Menu(csv_path=csv_path))
+        _, table_bytes = measure(lambda: Menu(csv_path=csv_path, columnar=True))
+        rows = Menu(csv_path=csv_path).read_items()
+
+    make = lambda cls: [cls(row['name'], float(row['price']), row['description'],
+                            int(row['calories']), row['image_path']) for row in rows]
+    _, plain_bytes = measure(lambda: make(_DictEntree))
+    _, slotted_bytes = measure(lambda: make(models.Entree))
+
+    print(f"{args.items} items")
+    print(f"Menu rows, list of dicts:   {dict_bytes / 2**20:8.1f} MiB")
+    print(f"Menu rows, MenuTable:       {table_bytes / 2**20:8.1f} MiB ({table_bytes / dict_bytes:.0%})")
+    print(f"Models, per-instance dict:  {plain_bytes / 2**20:8.1f} MiB")
+    print(f"Models, __slots__:          {slotted_bytes / 2**20:8.1f} MiB ({slotted_bytes / plain_bytes:.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+'''
+Benchmarks for the Menu CRUD hot paths on synthetic catalogs.
+
+Times Menu.__init__ (which runs _load_items), create_item, read_item,
+update_item, delete_item, get_menu_models and _save_items, and records the
+peak traced memory of each with tracemalloc. Results are written as a JSON
+report that can be compared against a report from another version.
+
+Standalone, from the repository root:
+
+    python -m benchmarks.bench_menu --sizes 1000 100000 --output report.json
+    python -m benchmarks.bench_menu --sizes 1000000 --ops 3
+    python -m benchmarks.bench_menu --compare old.json --output new.json
+
+With pytest-benchmark installed:
+
+    python -m pytest benchmarks/bench_menu.py
+'''
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pytest
+
+from app.src.business_logic.crud import Menu
+from benchmarks.catalog import write_csv
+
+DEFAULT_SIZES = [1000, 100000]
+REGRESSION_THRESHOLD = 1.25  # a new median this many times the old one is reported
+
+
+def _new_item(i):
+    return dict(item_type='Entree', name=f"Benchmark Item {i}", price=9.99,
+                description='Benchmark item', calories=500, image_path='bench.jpg')
+
+
+def _operations(menu, csv_path, ops):
+    """Return {operation name: list of zero-argument calls} for one catalog
+
+    The last call of each list runs under tracemalloc for the peak memory figure,
+    the others are timed without tracing.
+    """
+    slow_ops = max(1, min(ops, 3)) + 1
+    names = [item['name'] for item in menu.read_items()[:ops + 1]]
+    return {
+        'load': [lambda: Menu(csv_path=csv_path)] * slow_ops,
+        'create_item': [lambda i=i: menu.create_item(**_new_item(i)) for i in range(ops + 1)],
+        'read_item': [lambda name=name: menu.read_item(name) for name in names],
+        'update_item': [lambda name=name: menu.update_item(name, price=4.99) for name in names],
+        'get_menu_models_cold': [lambda: Menu.get_menu_models(_without_model_cache(menu))] * slow_ops,
+        'get_menu_models_warm': [menu.get_menu_models] * (ops + 1),
+        'delete_item': [lambda i=i: menu.delete_item(f"Benchmark Item {i}") for i in range(ops + 1)],
+        '_save_items': [menu._save_items] * slow_ops,
+    }
+
+
+def _without_model_cache(menu):
+    menu._models = None
+    return menu
+
+
+def run_size(size, ops, temp_dir):
+    """Benchmark every operation on a catalog of size items"""
+    csv_path = write_csv(os.path.join(temp_dir, f"items-{size}.csv"), size)
+    menu = Menu(csv_path=csv_path)
+    results = {}
+    for operation, calls in _operations(menu, csv_path, ops).items():
+        timings = []
+        for call in calls[:-1]:
+            start = time.perf_counter()
+            call()
+            timings.append(time.perf_counter() - start)
+        tracemalloc.start()
+        calls[-1]()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[operation] = {
+            'calls': len(timings),
+            'median_s': statistics.median(timings),
+            'min_s': min(timings),
+            'peak_bytes': peak,
+        }
+    return results
+
+
+def compare(old_report, new_report, threshold=REGRESSION_THRESHOLD):
+    """Return lines describing operations whose median got slower than threshold"""
+    regressions = []
+    for size, operations in new_report['results'].items():
+        for operation, result in operations.items():
+            old = old_report['results'].get(size, {}).get(operation)
+            if old and old['median_s'] > 0 and result['median_s'] / old['median_s'] > threshold:
+                ratio = result['median_s'] / old['median_s']
+                regressions.append(f"{operation} at {size} items: {ratio:.2f}x slower")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--ops', type=int, default=20, help='calls per operation')
+    parser.add_argument('--output', help='write the JSON report to this path')
+    parser.add_argument('--compare', help='JSON report from a previous run to compare against')
+    args = parser.parse_args(argv)
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'ops': args.ops,
+        'results': {},
+    }
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for size in args.sizes:
+            results = run_size(size, args.ops, temp_dir)
+            report['results'][str(size)] = results
+            print(f"\n{size} items")
+            for operation, result in results.items():
+                print(f"  {operation:<22}{result['median_s'] * 1000:>12.3f} ms"
+                      f"{result['peak_bytes'] / 2**20:>10.1f} MiB peak")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(json.load(file), report)
+        for line in regressions:
+            print(f"REGRESSION: {line}")
+        if regressions:
+            sys.exit(1)
+
+
+# pytest-benchmark entry points: python -m pytest benchmarks/bench_menu.py
+
+@pytest.fixture(scope='module', params=DEFAULT_SIZES)
+def catalog(request, tmp_path_factory):
+    pytest.importorskip('pytest_benchmark')
+    csv_path = write_csv(str(tmp_path_factory.mktemp('menu') / 'items.csv'), request.param)
+    return csv_path, Menu(csv_path=csv_path)
+
+
+def test_load(benchmark, catalog):
+    csv_path, _ = catalog
+    benchmark(Menu, csv_path=csv_path)
+
+
+def test_read_item(benchmark, catalog):
+    _, menu = catalog
+    name = menu.read_items()[-1]['name']
+    benchmark(menu.read_item, name)
+
+
+def test_create_and_delete_item(benchmark, catalog):
+    _, menu = catalog
+
+    def create_and_delete():
+        menu.create_item(**_new_item(0))
+        menu.delete_item('Benchmark Item 0')
+    benchmark(create_and_delete)
+
+
+def test_update_item(benchmark, catalog):
+    _, menu = catalog
+    name = menu.read_items()[0]['name']
+    benchmark(menu.update_item, name, price=4.99)
+
+
+def test_get_menu_models(benchmark, catalog):
+    _, menu = catalog
+    benchmark(lambda: Menu.get_menu_models(_without_model_cache(menu)))
+
+
+def test_save_items(benchmark, catalog):
+    _, menu = catalog
+    benchmark(menu._save_items)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+'''
+Load generator for the order ingestion pipeline.
+
+Producer threads submit random orders against a synthetic catalog as fast as
+the pipeline accepts them, for each sink and executor. Reports sustained
+throughput and submit-to-persisted latency. Run from the repository root:
+
+    python -m benchmarks.bench_orders --orders 20000 --producers 4
+    python -m benchmarks.bench_orders --sinks sqlite --executors thread process --batch-size 500
+'''
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from app.src.business_logic.crud import Menu
+from app.src.business_logic.orders import CsvOrderSink, JsonlOrderSink, OrderPipeline, SqliteOrderSink
+from benchmarks.catalog import write_csv
+
+SINKS = {'jsonl': (JsonlOrderSink, '.jsonl'), 'csv': (CsvOrderSink, '.csv'), 'sqlite': (SqliteOrderSink, '.db')}
+
+
+def _requests(names, count, seed):
+    rng = random.Random(seed)
+    for i in range(count):
+        lines = rng.sample(names, rng.randint(1, 4))
+        yield {'order_id': f"{seed}-{i}",
+               'items': [{'name': name, 'quantity': rng.randint(1, 3)} for name in lines]}
+
+
+def run(menu, sink, args):
+    """Push args.orders orders through a pipeline and return its stats"""
+    names = [item['name'] for item in menu.read_items()]
+    per_producer = args.orders // args.producers
+    pipeline = OrderPipeline(menu, sink, workers=args.workers, queue_size=args.queue_size,
+                             batch_size=args.batch_size, executor=args.executor,
+                             persist_workers=args.persist_workers)
+
+    def produce(seed):
+        for request in _requests(names, per_producer, seed):
+            pipeline.submit(request)
+
+    producers = [threading.Thread(target=produce, args=(seed,)) for seed in range(args.producers)]
+    start = time.perf_counter()
+    for thread in producers:
+        thread.start()
+    for thread in producers:
+        thread.join()
+    pipeline.close()
+    elapsed = time.perf_counter() - start
+    stats = pipeline.stats()
+    stats['throughput_per_s'] = stats['persisted'] / elapsed
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=1000, help='menu size')
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--producers', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=4, help='pricing threads')
+    parser.add_argument('--queue-size', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--persist-workers', type=int, default=1)
+    parser.add_argument('--sinks', nargs='+', choices=list(SINKS), default=list(SINKS))
+    parser.add_argument('--executors', nargs='+', choices=['thread', 'process'], default=['thread'])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        menu = Menu(csv_path=write_csv(os.path.join(temp_dir, 'items.csv'), args.items))
+        print(f"{args.orders} orders, {args.producers} producers, batch size {args.batch_size}")
+        print(f"{'sink':<8}{'executor':<10}{'orders/s':>12}{'p50 ms':>10}{'p99 ms':>10}")
+        for sink_name in args.sinks:
+            for executor in args.executors:
+                args.executor = executor
+                sink_class, suffix = SINKS[sink_name]
+                sink = sink_class(os.path.join(temp_dir, f"orders-{executor}{suffix}"))
+                stats = run(menu, sink, args)
+                print(f"{sink_name:<8}{executor:<10}{stats['throughput_per_s']:>12,.0f}"
+                      f"{stats['latency_p50_s'] * 1000:>10.1f}{stats['latency_p99_s'] * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+'''
+Parallel CSV I/O: reading, importing and exporting a large catalog with
+parallel_io versus the serial code paths.
+
+Times, on a synthetic catalog:
+  read    Menu._load_items() on a lazily opened menu versus parallel_io.read_rows()
+  import  Menu.create_items(load_item_file(path)) versus parallel_io.import_items()
+  export  the CLI's export_items() versus parallel_io.write_rows()
+for each worker count given. One worker runs in this process, so it measures the
+overhead of range splitting alone; the speedup with more workers is bounded by
+the CPUs reported at the top. Run from the repository root:
+
+    python -m benchmarks.bench_parallel_io --items 1000000 --workers 1 2 4
+'''
+
+import argparse
+import os
+import tempfile
+import time
+
+from app.src.business_logic import parallel_io
+from app.src.business_logic.crud import Menu, load_item_file
+from app.src.ui.cli import export_items
+from benchmarks.catalog import write_csv
+
+
+def timed(run, runs):
+    """Best wall time of runs calls to run(), in seconds, and its last result"""
+    best, result = None, None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def empty_menu(path):
+    """A new menu with no items and no snapshot, so every run starts from the same state"""
+    if os.path.exists(path):
+        os.remove(path)
+    return Menu(csv_path=path, snapshot=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=200000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source = write_csv(os.path.join(temp_dir, 'catalog.csv'), args.items)
+        target = os.path.join(temp_dir, 'items.csv')
+        exported = os.path.join(temp_dir, 'export.csv')
+        menu = Menu(csv_path=source, lazy=True, snapshot=False)
+        rows = list(menu.iter_items())
+
+        serial = {
+            'read': timed(lambda: Menu(csv_path=source, lazy=True, snapshot=False)._load_items(), args.runs)[0],
+            'import': timed(lambda: empty_menu(target).create_items(load_item_file(source)), args.runs)[0],
+            'export': timed(lambda: export_items(menu, exported), args.runs)[0],
+        }
+        parallel = {}
+        for workers in args.workers:
+            parallel[workers] = {
+                'read': timed(lambda: parallel_io.read_rows(source, workers), args.runs)[0],
+                'import': timed(lambda: parallel_io.import_items(empty_menu(target), source, workers),
+                                args.runs)[0],
+                'export': timed(lambda: parallel_io.write_rows(rows, exported, workers, sync=False),
+                                args.runs)[0],
+            }
+
+    print(f"{args.items} rows, {os.cpu_count()} CPUs")
+    print(f"{'':16}" + ''.join(f"{step:>18}" for step in serial))
+    print(f"{'serial':16}" + ''.join(f"{elapsed:>17.3f}s" for elapsed in serial.values()))
+    for workers, times in parallel.items():
+        print(f"{f'{workers} workers':16}" + ''.join(
+            f"{elapsed:>9.3f}s ({serial[step] / elapsed:4.2f}x)" for step, elapsed in times.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+'''
+Latency of Menu.search on a synthetic catalog.
+
+Builds the full-text index once, then times single keywords, prefixes, typos
+and multi-word queries. Run from the repository root:
+
+    python -m benchmarks.bench_search --items 100000
+'''
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from app.src.business_logic.crud import Menu
+from benchmarks.catalog import write_csv
+
+QUERIES = ['burger', 'choc', 'buger', 'spicy burger', 'cheese sha', 'vanilla 123', 'classic double lemon', 'zzzz']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        menu = Menu(csv_path=write_csv(os.path.join(temp_dir, 'items.csv'), args.items))
+        start = time.perf_counter()
+        menu.search('warm up')
+        print(f"{args.items} items, index built in {time.perf_counter() - start:.2f}s")
+        print(f"{'query':<24}{'median ms':>12}{'results':>10}")
+        for query in QUERIES:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                results = menu.search(query, args.limit)
+                timings.append(time.perf_counter() - start)
+            print(f"{query:<24}{statistics.median(timings) * 1000:>12.3f}{len(results):>10}")
+
+
+if __name__ == '__main__':
+    main()
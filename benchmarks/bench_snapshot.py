@@ -0,0 +1,64 @@
+'''
+Cold-start benchmark: opening a Menu from items.csv versus its binary snapshot.
+
+Times Menu() on a synthetic catalog: parsing the CSV file with the snapshot
+turned off, the first open (which parses the CSV file and writes the
+snapshot), and opens from the snapshot, each into row dicts and into a
+columnar MenuTable; then a save, which rewrites the snapshot with the CSV
+file, and the first open after it. Run from the repository root:
+
+    python -m benchmarks.bench_snapshot --items 1000000
+'''
+
+import argparse
+import os
+import tempfile
+import time
+
+from app.src.business_logic.binary_snapshot import snapshot_path
+from app.src.business_logic.crud import Menu
+from benchmarks.catalog import write_csv
+
+
+def timed(build, runs):
+    """Best wall time of runs calls to build(), in seconds"""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        build()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        csv_path = write_csv(os.path.join(temp_dir, 'items.csv'), args.items)
+        parse = timed(lambda: Menu(csv_path=csv_path, snapshot=False), args.runs)
+        parse_columnar = timed(lambda: Menu(csv_path=csv_path, snapshot=False, columnar=True), args.runs)
+        first = timed(lambda: Menu(csv_path=csv_path), 1)
+        rows = timed(lambda: Menu(csv_path=csv_path), args.runs)
+        columnar = timed(lambda: Menu(csv_path=csv_path, columnar=True), args.runs)
+        menu = Menu(csv_path=csv_path)
+        save = timed(menu._save_items, 1)  # rewrites the CSV file and its snapshot
+        after_write = timed(lambda: Menu(csv_path=csv_path), 1)
+        csv_bytes = os.path.getsize(csv_path)
+        snapshot_bytes = os.path.getsize(snapshot_path(csv_path))
+
+    print(f"{args.items} items, CSV {csv_bytes / 2**20:.1f} MiB, snapshot {snapshot_bytes / 2**20:.1f} MiB")
+    print(f"Parse CSV, row dicts:         {parse:8.2f} s")
+    print(f"Parse CSV, columnar:          {parse_columnar:8.2f} s")
+    print(f"First open, writes snapshot:  {first:8.2f} s")
+    print(f"From snapshot, row dicts:     {rows:8.2f} s ({parse / rows:.1f}x faster)")
+    print(f"From snapshot, columnar:      {columnar:8.2f} s ({parse_columnar / columnar:.1f}x faster)")
+    print(f"Save, CSV and snapshot:       {save:8.2f} s")
+    print(f"First open after a save:      {after_write:8.2f} s ({parse / after_write:.1f}x faster)")
+
+
+if __name__ == '__main__':
+    main()
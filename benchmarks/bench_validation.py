@@ -0,0 +1,103 @@
+'''
+Validation throughput: item rows checked one at a time versus a column at a time.
+
+Validates a synthetic catalog, with a share of invalid rows mixed in, through
+the per-row validators (raising and catching ValueError per bad row,
+as create_item does) and through schema.validate_rows() in batch mode, as
+create_items and get_menu_models do. Also times building the model objects
+with their validating constructors versus from batch-validated columns.
+Reports rows per second. Run from the repository root:
+
+    python -m benchmarks.bench_validation --items 1000000 --invalid 0.01
+'''
+
+import argparse
+import random
+import time
+
+from app.src.business_logic import models, schema
+from app.src.business_logic.crud import Menu
+from benchmarks.catalog import generate_rows
+
+MODEL_TYPES = Menu.MODEL_TYPES
+
+
+def timed(run, runs):
+    """Best wall time of runs calls to run(), in seconds, and its last result"""
+    best, result = None, None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def per_row(rows):
+    """Validate each row with its schema's validate(), collecting errors"""
+    errors = []
+    for position, row in enumerate(rows):
+        fields = dict(row)
+        try:
+            schema.schema_for(fields.pop('type')).validate(**fields)
+        except (TypeError, ValueError) as e:
+            errors.append((position, str(e)))
+    return errors
+
+
+def models_per_row(rows):
+    """Build models with their validating constructors, as get_menu_models used to"""
+    built = {}
+    for row in rows:
+        try:
+            if row['type'] == 'Drink':
+                menu_item = models.Drink(row['name'], row['price'], row['description'], row['size'],
+                                         row['calories'], row['image_path'])
+            else:
+                menu_item = MODEL_TYPES[row['type']](row['name'], row['price'], row['description'],
+                                                     row['calories'], row['image_path'])
+        except ValueError:
+            continue
+        built[menu_item.name] = menu_item
+    return built
+
+
+def models_batch(rows):
+    """Build models from batch-validated columns, as get_menu_models does"""
+    built = {}
+    batches, _ = schema.validate_rows(rows)
+    for item_schema, _, columns in batches:
+        for menu_item in map(MODEL_TYPES[item_schema.name].from_valid, *columns.values()):
+            built[menu_item.name] = menu_item
+    return built
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--invalid', type=float, default=0.01, help='share of rows made invalid')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    rows = list(generate_rows(args.items))
+    for row in rng.sample(rows, int(len(rows) * args.invalid)):
+        row[rng.choice(['price', 'calories'])] = rng.choice(['', '-1', 'n/a'])
+
+    row_time, row_errors = timed(lambda: per_row(rows), args.runs)
+    batch_time, (_, batch_errors) = timed(lambda: schema.validate_rows(rows), args.runs)
+    assert row_errors == batch_errors, "per-row and batch validation disagree"
+    models_row_time, _ = timed(lambda: models_per_row(rows), args.runs)
+    models_batch_time, _ = timed(lambda: models_batch(rows), args.runs)
+
+    print(f"{args.items} rows, {len(batch_errors)} invalid")
+    print(f"{'':28}{'seconds':>10}{'rows/s':>14}")
+    for label, elapsed in [('validate, per row', row_time), ('validate, batch', batch_time),
+                           ('models, per row', models_row_time), ('models, batch', models_batch_time)]:
+        print(f"{label:28}{elapsed:>10.3f}{args.items / elapsed:>14,.0f}")
+    print(f"Batch speedup over per row: validation {row_time / batch_time:.2f}x, "
+          f"model building {models_row_time / models_batch_time:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
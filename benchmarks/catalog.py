@@ -0,0 +1,39 @@
+'''
+Synthetic menu catalogs shared by the benchmarks.
+
+Rows look like the ones Menu writes, so they pass create_item validation.
+'''
+
+import csv
+import random
+
+FIELDNAMES = ['type', 'name', 'price', 'description', 'calories', 'image_path', 'size']
+TYPES = ['Entree', 'Drink', 'Dessert', 'Appetizer']
+WORDS = ['spicy', 'grilled', 'chocolate', 'burger', 'salad', 'shake', 'cheese', 'crispy',
+         'garden', 'smoked', 'vanilla', 'chicken', 'lemon', 'fresh', 'classic', 'double']
+
+
+def generate_rows(count, seed=0):
+    """Yield count menu rows with unique names"""
+    rng = random.Random(seed)
+    for i in range(count):
+        item_type = TYPES[i % len(TYPES)]
+        words = rng.sample(WORDS, 3)
+        yield {
+            'type': item_type,
+            'name': f"{words[0].title()} {words[1].title()} {i}",
+            'price': str(round(rng.uniform(0.99, 29.99), 2)),
+            'description': f"A {' '.join(words)} favourite",
+            'calories': str(rng.randint(1, 1500)),
+            'image_path': f"images/{item_type.lower()}.jpg",
+            'size': str(rng.choice([8, 12, 16, 20, 32])) if item_type == 'Drink' else None
+        }
+
+
+def write_csv(path, count, seed=0):
+    """Write a synthetic catalog of count rows to path"""
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(generate_rows(count, seed))
+    return path
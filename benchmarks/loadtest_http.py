@@ -0,0 +1,124 @@
+'''
+Load test for the HTTP API.
+
+Opens --connections keep-alive connections to a running instance and sends a
+mix of item reads, filtered queries and order submissions for --duration
+seconds, then reports requests per second and latency percentiles. Start a
+server first, e.g. on a synthetic catalog:
+
+    python -c "from benchmarks.catalog import write_csv; write_csv('/tmp/menu.csv', 10000)"
+    python -m app.src.ui.http_api --csv /tmp/menu.csv --orders /tmp/orders.jsonl --port 8080
+
+then, from the repository root:
+
+    python -m benchmarks.loadtest_http --port 8080 --connections 50 --duration 10
+    python -m benchmarks.loadtest_http --mix read=1 --duration 5
+'''
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import quote
+
+DEFAULT_MIX = ['read=65', 'query=20', 'menu=5', 'order=10']
+
+
+async def request(reader, writer, method, path, payload=None):
+    """Send one request on an open connection and return (status, body)"""
+    body = b'' if payload is None else json.dumps(payload).encode()
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+                  f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        key, _, value = line.decode('latin-1').partition(':')
+        if key.lower() == 'content-length':
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+def _next_request(rng, kinds, weights, names, types):
+    kind = rng.choices(kinds, weights)[0]
+    if kind == 'read':
+        return kind, 'GET', f"/items/{quote(rng.choice(names))}", None
+    if kind == 'menu':
+        return kind, 'GET', f"/items?type={rng.choice(types)}", None
+    if kind == 'query':
+        low = rng.randint(1, 20)
+        return kind, 'GET', f"/items?type={rng.choice(types)}&price_min={low}&price_max={low + 5}&limit=20", None
+    order = {'items': [{'name': name, 'quantity': rng.randint(1, 3)}
+                       for name in rng.sample(names, rng.randint(1, 3))]}
+    return kind, 'POST', '/orders', order
+
+
+async def client(host, port, deadline, seed, kinds, weights, names, types, latencies, statuses):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            kind, method, path, payload = _next_request(rng, kinds, weights, names, types)
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, method, path, payload)
+            latencies.setdefault(kind, []).append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run(args):
+    weights = dict(part.split('=') for part in args.mix)
+    kinds = list(weights)
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    status, body = await request(reader, writer, 'GET', '/items')
+    writer.close()
+    items = json.loads(body)
+    if status != 200 or not items:
+        raise SystemExit("The server has no menu items to load test against")
+    names = [item['name'] for item in items]
+    types = sorted({item['type'] for item in items})
+
+    latencies, statuses = {}, {}
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(
+        client(args.host, args.port, deadline, seed, kinds, [float(weights[k]) for k in kinds],
+               names, types, latencies, statuses)
+        for seed in range(args.connections)
+    ))
+    return time.perf_counter() - start, latencies, statuses
+
+
+def _percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--connections', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds')
+    parser.add_argument('--mix', nargs='+', default=DEFAULT_MIX,
+                        help='kind=weight for read, query, menu (cached per-type listing) and order')
+    args = parser.parse_args()
+
+    elapsed, latencies, statuses = asyncio.run(run(args))
+    total = sum(len(values) for values in latencies.values())
+    print(f"{total} requests over {args.connections} connections in {elapsed:.1f}s: "
+          f"{total / elapsed:,.0f} req/s")
+    print(f"status codes: {dict(sorted(statuses.items()))}")
+    print(f"{'kind':<8}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for kind, values in sorted(latencies.items()) + [('all', sum(latencies.values(), []))]:
+        values.sort()
+        print(f"{kind:<8}{len(values):>8}{_percentile(values, 0.5) * 1000:>10.2f}"
+              f"{_percentile(values, 0.99) * 1000:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
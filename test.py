@@ -1,10 +1,33 @@
 '''The test'''
 
 import pytest
-from app.src.business_logic.models import MenuItem, Drink, Dessert, Entree, Order
-from app.src.business_logic.crud import Menu
+from app.src.business_logic.models import MenuItem, Drink, Dessert, Entree, Appetizer, Order
+from app.src.business_logic.crud import Menu, BatchError, ChangeEvent, load_item_file
+from app.src.business_logic.storage import SqliteBackend, migrate_csv_to_sqlite
+from app.src.business_logic.binary_snapshot import MenuSnapshot, snapshot_path
+from app.src.business_logic.pricing import OrderBook
+from app.src.business_logic.layers import MenuRegistry, OverrideLayer
+from app.src.business_logic.schema import SCHEMAS, validate_rows
+from app.src.business_logic import parallel_io
+from app.src.business_logic.orders import OrderPipeline, JsonlOrderSink, CsvOrderSink, SqliteOrderSink
+from app.src.ui.http_api import MenuHttpApi
+from app.src.ui.http_cache import SnapshotCache
+from app.src.ui.cli import run_batch
+from app.src.ui.components.menu_rows import MenuRows
+import csv
+import io
+import gzip
+from decimal import Decimal
+import asyncio
+import json
+import multiprocessing
 import os
+import queue
+import sqlite3
+import subprocess
+import sys
 import tempfile
+import threading
 
 def test_menu_item_creation():
     item = MenuItem("Test Item", 9.99, "Test description", "test.jpg", 500)
@@ -203,6 +226,8 @@ def test_crud_operations():
     finally:
         # Clean up
         os.unlink(temp_path)
+        if os.path.exists(snapshot_path(temp_path)):
+            os.unlink(snapshot_path(temp_path))
 
 def test_crud_model_conversion():
     with tempfile.NamedTemporaryFile(delete=False) as temp_file:
@@ -240,4 +265,1022 @@ def test_crud_model_conversion():
         assert float(models['Burger'].price) == pytest.approx(9.99)
         
     finally:
-        os.unlink(temp_path) 
\ No newline at end of file
+        os.unlink(temp_path)
+        if os.path.exists(snapshot_path(temp_path)):
+            os.unlink(snapshot_path(temp_path))
+def test_journaled_crud_recovery():
+    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
+        temp_path = temp_file.name
+    journal_path = temp_path + '.journal'
+
+    try:
+        crud = Menu(csv_path=temp_path, journaled=True)
+        crud.create_item('Entree', 'Burger', 9.99, 'Beef burger', 500, 'burger.jpg')
+        crud.create_item('Drink', 'Coke', 2.99, 'Cola', 150, 'coke.jpg', size=16)
+        crud.update_item('Burger', price=10.99)
+        crud.delete_item('Coke')
+
+        # Mutations go to the journal, the CSV snapshot is untouched
+        assert os.path.getsize(temp_path) == 0
+        assert len(crud.journal) == 4
+
+        # Simulate a crash: a new Menu replays the journal and compacts it
+        recovered = Menu(csv_path=temp_path, journaled=True)
+        assert [item['name'] for item in recovered.read_items()] == ['Burger']
+        assert float(recovered.read_item('Burger')['price']) == pytest.approx(10.99)
+        assert not os.path.exists(journal_path)
+        assert Menu(csv_path=temp_path).read_item('Burger') is not None
+
+    finally:
+        os.unlink(temp_path)
+        if os.path.exists(snapshot_path(temp_path)):
+            os.unlink(snapshot_path(temp_path))
+        if os.path.exists(journal_path):
+            os.unlink(journal_path)
+
+def test_journal_compacts_on_threshold():
+    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
+        temp_path = temp_file.name
+    journal_path = temp_path + '.journal'
+
+    try:
+        crud = Menu(csv_path=temp_path, journaled=True, compact_threshold=3)
+        for i in range(3):
+            crud.create_item('Dessert', f'Cake {i}', 5.99, 'Cake', 400, 'cake.jpg')
+        assert len(crud.journal) == 0
+        assert len(Menu(csv_path=temp_path).read_items()) == 3
+
+    finally:
+        os.unlink(temp_path)
+        if os.path.exists(snapshot_path(temp_path)):
+            os.unlink(snapshot_path(temp_path))
+        if os.path.exists(journal_path):
+            os.unlink(journal_path)
+
+def test_menu_name_index():
+    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
+        temp_path = temp_file.name
+
+    try:
+        crud = Menu(csv_path=temp_path)
+        for i in range(100):
+            crud.create_item('Entree', f'Item {i}', 9.99, 'desc', 500, 'img.jpg')
+
+        # Deletes keep the remaining rows in insertion order
+        for i in range(0, 100, 2):
+            crud.delete_item(f'Item {i}')
+        assert [item['name'] for item in crud.read_items()] == [f'Item {i}' for i in range(1, 100, 2)]
+        assert crud.read_item('Item 0') is None
+        assert crud.read_item('Item 51')['name'] == 'Item 51'
+
+        crud.update_item('Item 1', price=1.99)
+        assert crud.read_item('Item 1')['price'] == '1.99'
+
+        # Names freed by a delete can be reused
+        crud.create_item('Entree', 'Item 0', 9.99, 'desc', 500, 'img.jpg')
+        assert crud.read_items()[-1]['name'] == 'Item 0'
+        assert len(Menu(csv_path=temp_path).read_items()) == 51
+
+    finally:
+        os.unlink(temp_path)
+        if os.path.exists(snapshot_path(temp_path)):
+            os.unlink(snapshot_path(temp_path))
+
+def test_menu_query():
+    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
+        temp_path = temp_file.name
+
+    try:
+        crud = Menu(csv_path=temp_path)
+        crud.create_item('Drink', 'Coke', 2.99, 'Cola', 150, 'coke.jpg', size=16)
+        crud.create_item('Drink', 'Shake', 4.99, 'Milkshake', 700, 'shake.jpg', size=20)
+        crud.create_item('Drink', 'Water', 0.99, 'Water', 1, 'water.jpg', size=12)
+        crud.create_item('Entree', 'Burger', 9.99, 'Beef burger', 800, 'burger.jpg')
+        crud.create_item('Entree', 'Salad', 7.99, 'Green salad', 350, 'salad.jpg')
+
+        drinks_under_3 = crud.query(type='Drink', price_max=3)
+        assert [item['name'] for item in drinks_under_3] == ['Coke', 'Water']
+
+        light_entrees = crud.query(type='Entree', calories_max=600)
+        assert [item['name'] for item in light_entrees] == ['Salad']
+
+        cheapest = crud.query(sort_by='price', limit=2)
+        assert [item['name'] for item in cheapest] == ['Water', 'Coke']
+
+        priciest = crud.query(price_min=3, sort_by='price', descending=True)
+        assert [item['name'] for item in priciest] == ['Burger', 'Salad', 'Shake']
+
+        # Indexes follow updates and deletes, and a type keeps insertion order like read_items()
+        crud.update_item('Coke', price=1.5)
+        assert [item['name'] for item in crud.query(type='Drink')] == ['Coke', 'Shake', 'Water']
+        crud.update_item('Coke', item_type='Entree')
+        assert [item['name'] for item in crud.query(type='Entree')] == ['Coke', 'Burger', 'Salad']
+        assert [item['name'] for item in crud.query(type='Entree', limit=1)] == ['Coke']
+        crud.update_item('Coke', item_type='Drink', size=16)
+        crud.update_item('Burger', price=5.49)
+        crud.delete_item('Water')
+        assert [item['name'] for item in crud.query(price_max=6, sort_by='name')] == ['Burger', 'Coke', 'Shake']
+        assert crud.query(type='Dessert') == []
+
+        with pytest.raises(ValueError):
+            crud.query(sort_by='description')
+
+    finally:
+        os.unlink(temp_path)
+        if os.path.exists(snapshot_path(temp_path)):
+            os.unlink(snapshot_path(temp_path))
+
+def test_crud_batch_operations():
+    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
+        temp_path = temp_file.name
+
+    try:
+        crud = Menu(csv_path=temp_path)
+        rows = [
+            {'item_type': 'Entree', 'name': 'Burger', 'price': 9.99, 'description': 'Beef',
+             'calories': 500, 'image_path': 'burger.jpg'},
+            {'type': 'Drink', 'name': 'Coke', 'price': '2.99', 'description': 'Cola',
+             'calories': '150', 'image_path': 'coke.jpg', 'size': '16'},
+            {'item_type': 'Drink', 'name': 'Bad Drink', 'price': 2.99, 'description': 'Too small',
+             'calories': 100, 'image_path': 'x.jpg', 'size': 4},
+            {'item_type': 'Entree', 'name': 'Burger', 'price': 8.99, 'description': 'Duplicate',
+             'calories': 500, 'image_path': 'burger.jpg'},
+        ]
+
+        # Any invalid row rejects the whole batch
+        with pytest.raises(BatchError) as excinfo:
+            crud.create_items(rows)
+        assert [position for position, _ in excinfo.value.errors] == [2, 3]
+        assert crud.read_items() == []
+
+        created, errors = crud.create_items(rows, skip_invalid=True)
+        assert [item['name'] for item in created] == ['Burger', 'Coke']
+        assert len(errors) == 2
+
+        updated, errors = crud.update_items([{'name': 'Burger', 'price': 10.99}, {'name': 'Coke', 'size': 20}])
+        assert errors == []
+        assert crud.read_item('Burger')['price'] == '10.99'
+        assert crud.read_item('Coke')['size'] == '20'
+        with pytest.raises(BatchError):
+            crud.update_items([{'name': 'Burger', 'price': 1.99}, {'name': 'Missing', 'price': 1.99}])
+        assert crud.read_item('Burger')['price'] == '10.99'
+
+        deleted, errors = crud.delete_items(['Coke', 'Missing'], skip_invalid=True)
+        assert deleted == ['Coke']
+        assert [item['name'] for item in Menu(csv_path=temp_path).read_items()] == ['Burger']
+
+    finally:
+        os.unlink(temp_path)
+        if os.path.exists(snapshot_path(temp_path)):
+            os.unlink(snapshot_path(temp_path))
+
+def test_load_item_file():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        jsonl_path = os.path.join(temp_dir, 'items.jsonl')
+        with open(jsonl_path, 'w') as file:
+            file.write('{"type": "Dessert", "name": "Cake", "price": 5.99, "description": "Cake", '
+                       '"calories": 400, "image_path": "cake.jpg"}\n')
+        csv_path = os.path.join(temp_dir, 'items.csv')
+        crud = Menu(csv_path=csv_path)
+        created, _ = crud.create_items(load_item_file(jsonl_path))
+        assert created[0]['name'] == 'Cake'
+
+        # A saved menu CSV can be imported into another menu
+        other = Menu(csv_path=os.path.join(temp_dir, 'other.csv'))
+        created, _ = other.create_items(load_item_file(csv_path))
+        assert other.read_item('Cake')['calories'] == '400'
+
+        # A JSON line that is not an object is reported like any invalid row
+        with open(jsonl_path, 'a') as file:
+            file.write('[1, 2]\n')
+        created, errors = other.create_items(load_item_file(jsonl_path), skip_invalid=True)
+        assert created == [] and [position for position, _ in errors] == [0, 1]
+        assert 'mapping' in errors[1][1]
+        out = io.StringIO()
+        assert run_batch(['--csv', csv_path, 'import', jsonl_path], out) == 0
+        assert [skipped['row'] for skipped in json.loads(out.getvalue())['skipped']] == [1, 2]
+
+def test_lazy_menu_loading():
+    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
+        temp_path = temp_file.name
+
+    try:
+        crud = Menu(csv_path=temp_path)
+        crud.create_item('Entree', 'Burger', 9.99, 'Beef burger, "the best"\nin town', 500, 'burger.jpg')
+        crud.create_item('Drink', 'Coke', 2.99, 'Cola', 150, 'coke.jpg', size=16)
+
+        lazy = Menu(csv_path=temp_path, lazy=True)
+        assert lazy.read_item('Burger')['description'] == 'Beef burger, "the best"\nin town'
+        assert lazy.read_item('Coke')['size'] == '16'
+        assert lazy.read_item('Missing') is None
+        assert [item['name'] for item in lazy.iter_items()] == ['Burger', 'Coke']
+
+        # Writes load the full menu first
+        lazy.delete_item('Burger')
+        assert [item['name'] for item in lazy.read_items()] == ['Coke']
+        assert [item['name'] for item in Menu(csv_path=temp_path, lazy=True).iter_items()] == ['Coke']
+
+    finally:
+        os.unlink(temp_path)
+        if os.path.exists(snapshot_path(temp_path)):
+            os.unlink(snapshot_path(temp_path))
+
+def test_columnar_menu_store():
+    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
+        temp_path = temp_file.name
+
+    try:
+        crud = Menu(csv_path=temp_path, columnar=True)
+        crud.create_item('Drink', 'Coke', 2.99, 'Cola', 150, 'coke.jpg', size=16)
+        crud.create_item('Entree', 'Burger', 9.99, 'Beef burger', 500, 'burger.jpg')
+        crud.update_item('Coke', size=20)
+        assert crud.read_item('Coke')['size'] == '20'
+        assert crud.read_item('Burger')['size'] is None
+        assert [item['name'] for item in crud.query(price_max=5)] == ['Coke']
+        crud.delete_item('Coke')
+        assert [item['name'] for item in crud.read_items()] == ['Burger']
+
+        # The columnar store reads the same file as the dict store
+        assert Menu(csv_path=temp_path, columnar=True).read_items() == [crud.read_item('Burger')]
+        assert Menu(csv_path=temp_path).read_item('Burger')['price'] == '9.99'
+
+    finally:
+        os.unlink(temp_path)
+        if os.path.exists(snapshot_path(temp_path)):
+            os.unlink(snapshot_path(temp_path))
+
+def test_menu_item_slots():
+    drink = Drink("Coke", 2.99, "Cola", 16, 150, "coke.jpg")
+    assert not hasattr(drink, '__dict__')
+    with pytest.raises(AttributeError):
+        drink.color = 'brown'
+
+def test_cached_menu_models():
+    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
+        temp_path = temp_file.name
+
+    try:
+        crud = Menu(csv_path=temp_path)
+        crud.create_item('Entree', 'Burger', 9.99, 'Beef burger', 500, 'burger.jpg')
+        crud.create_item('Appetizer', 'Wings', 6.99, 'Hot wings', 700, 'wings.jpg')
+
+        models = crud.get_menu_models()
+        assert isinstance(models['Wings'], Appetizer)
+        burger = models['Burger']
+        assert crud.get_menu_models() is models
+
+        # Edits patch only the affected entry of the cached dictionary
+        crud.update_item('Wings', price=7.49)
+        crud.create_item('Drink', 'Coke', 2.99, 'Cola', 150, 'coke.jpg', size=16)
+        crud.delete_item('Burger')
+        models = crud.get_menu_models()
+        assert models['Wings'].price == pytest.approx(7.49)
+        assert models['Coke'].size == 16
+        assert 'Burger' not in models
+        assert list(models) == list(Menu(csv_path=temp_path).get_menu_models())
+        assert burger.name == 'Burger'
+
+    finally:
+        os.unlink(temp_path)
+        if os.path.exists(snapshot_path(temp_path)):
+            os.unlink(snapshot_path(temp_path))
+
+def test_sqlite_backend():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, 'items.db')
+        crud = Menu(csv_path=db_path)
+        assert isinstance(crud.backend, SqliteBackend)
+        crud.create_item('Drink', 'Coke', 2.99, 'Cola', 150, 'coke.jpg', size=16)
+        crud.create_items([
+            {'item_type': 'Entree', 'name': 'Burger', 'price': 9.99, 'description': 'Beef',
+             'calories': 500, 'image_path': 'burger.jpg'},
+            {'item_type': 'Dessert', 'name': 'Cake', 'price': 5.99, 'description': 'Chocolate',
+             'calories': 400, 'image_path': 'cake.jpg'},
+        ])
+        crud.update_item('Coke', price=3.49)
+        crud.delete_item('Cake')
+        crud.close()
+
+        reopened = Menu(backend=SqliteBackend(db_path))
+        assert reopened.read_items() == [
+            {'type': 'Drink', 'name': 'Coke', 'price': '3.49', 'description': 'Cola',
+             'calories': '150', 'image_path': 'coke.jpg', 'size': '16'},
+            {'type': 'Entree', 'name': 'Burger', 'price': '9.99', 'description': 'Beef',
+             'calories': '500', 'image_path': 'burger.jpg', 'size': None},
+        ]
+        assert Menu(csv_path=db_path, lazy=True).read_item('Burger')['calories'] == '500'
+        reopened.close()
+
+def test_migrate_csv_to_sqlite():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        csv_path = os.path.join(temp_dir, 'items.csv')
+        crud = Menu(csv_path=csv_path)
+        crud.create_item('Entree', 'Burger', 9.99, 'Beef, "smash" style', 500, 'burger.jpg')
+        crud.create_item('Drink', 'Coke', 2.99, 'Cola', 150, 'coke.jpg', size=16)
+
+        db_path = os.path.join(temp_dir, 'items.db')
+        assert migrate_csv_to_sqlite(csv_path, db_path) == 2
+        migrated = Menu(csv_path=db_path)
+        assert [item['name'] for item in migrated.read_items()] == ['Burger', 'Coke']
+        assert migrated.read_item('Burger')['description'] == 'Beef, "smash" style'
+        migrated.close()
+
+def _concurrent_menu_worker(path, worker, journaled):
+    crud = Menu(csv_path=path, journaled=journaled, compact_threshold=7, concurrent=True)
+    for i in range(20):
+        name = f'Worker {worker} Item {i}'
+        crud.create_item('Entree', name, 1.99, 'desc', 100, 'img.jpg')
+        if i % 3 == 0:
+            crud.update_item(name, price=i + 0.5)
+        if i % 5 == 4:
+            crud.delete_item(f'Worker {worker} Item {i - 1}')
+    crud.close()
+
+@pytest.mark.parametrize('journaled', [False, True])
+def test_concurrent_processes_lose_no_writes(journaled):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'items.csv')
+        processes = [multiprocessing.Process(target=_concurrent_menu_worker, args=(path, worker, journaled))
+                     for worker in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        assert all(process.exitcode == 0 for process in processes)
+
+        expected = {}
+        for worker in range(4):
+            for i in range(20):
+                if i % 5 != 3:
+                    expected[f'Worker {worker} Item {i}'] = str(i + 0.5) if i % 3 == 0 else '1.99'
+        menu = Menu(csv_path=path, journaled=journaled)
+        assert {item['name']: item['price'] for item in menu.read_items()} == expected
+
+def test_atomic_save_keeps_old_file_on_failure(monkeypatch):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'items.csv')
+        crud = Menu(csv_path=path)
+        crud.create_item('Entree', 'Burger', 9.99, 'Beef burger', 500, 'burger.jpg')
+        with open(path) as file:
+            saved = file.read()
+
+        def crash(fd):
+            raise OSError('disk full')
+        monkeypatch.setattr(os, 'fsync', crash)
+        with pytest.raises(OSError):
+            crud.create_item('Entree', 'Salad', 7.99, 'Green salad', 300, 'salad.jpg')
+
+        with open(path) as file:
+            assert file.read() == saved
+        assert sorted(os.listdir(temp_dir)) == ['items.csv', 'items.csv.snap']  # no temporary files left
+
+@pytest.mark.parametrize('policy', ['always', 'batched', 'never'])
+def test_fsync_policies(policy):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'items.csv')
+        for journaled in (False, True):
+            crud = Menu(csv_path=path, journaled=journaled, fsync=policy)
+            crud.create_item('Entree', f'Burger {journaled}', 9.99, 'Beef burger', 500, 'burger.jpg')
+            crud.close()
+        assert len(Menu(csv_path=path).read_items()) == 2
+
+    with pytest.raises(ValueError):
+        Menu(csv_path=path, fsync='sometimes')
+
+def test_menu_instrumentation():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'items.csv')
+        metrics_path = os.path.join(temp_dir, 'menu.prom')
+        assert Menu(csv_path=path).stats() is None
+
+        crud = Menu(csv_path=path, instrument=True, metrics_path=metrics_path)
+        crud.create_item('Entree', 'Burger', 9.99, 'Beef burger', 500, 'burger.jpg')
+        crud.read_item('Burger')
+        crud.read_item('Burger')
+        with pytest.raises(ValueError):
+            crud.delete_item('Missing')
+
+        stats = crud.stats()
+        assert stats['operations']['read_item']['calls'] == 2
+        assert stats['operations']['delete_item']['errors'] == 1
+        assert stats['operations']['_load_items']['calls'] == 1
+        assert stats['operations']['_commit']['calls'] == 1
+        assert stats['operations']['read_item']['buckets'][float('inf')] == 2
+        written = os.path.getsize(path) + os.path.getsize(snapshot_path(path))
+        assert stats['bytes_written'] == written
+        # Bytes are also kept per operation, so loads and saves can be told apart
+        assert stats['operations']['_commit']['bytes_written'] == written
+        assert stats['operations']['create_item']['bytes_written'] == written
+        assert stats['operations']['read_item']['bytes_written'] == 0
+        reopened = Menu(csv_path=path, instrument=True)
+        reopened.read_items()
+        assert reopened.stats()['operations']['_reload']['bytes_read'] == reopened.stats()['bytes_read'] > 0
+
+        crud.close()
+        with open(metrics_path) as file:
+            text = file.read()
+        assert f'menu_operation_bytes_written_total{{operation="_commit"}} {written}' in text
+        assert 'menu_operation_seconds_count{operation="read_item"} 2' in text
+        assert 'menu_operation_errors_total{operation="delete_item"} 1' in text
+        assert f"menu_bytes_written_total {written}" in text
+
+def test_order_quantities_and_exact_totals():
+    order = Order()
+    soda = Drink("Soda", 0.1, "Fizzy", 12, 100, "soda.jpg")
+    fries = Entree("Fries", 0.2, "Salty", 300, "fries.jpg")
+
+    order.add_item(soda, quantity=20)
+    assert len(order.lines) == 1
+    assert order.lines['Soda'].quantity == 20
+    assert order.total_decimal == Decimal('2.00')
+
+    # Thousands of add/remove cycles do not drift
+    for _ in range(5000):
+        order.add_item(fries)
+        order.remove_item(fries)
+    assert order.total_decimal == Decimal('2.00')
+
+    order.set_quantity('Soda', 3)
+    assert order.total_cents == 30
+    order.remove_item(soda, quantity=3)
+    assert order.lines == {}
+    assert order.total == 0
+    with pytest.raises(ValueError):
+        order.add_item(soda, quantity=0)
+
+def test_order_book_reprices_open_orders():
+    book = OrderBook()
+    burger = Entree("Burger", 9.99, "Beef burger", 500, "burger.jpg")
+    soda = Drink("Soda", 1.99, "Fizzy", 12, 100, "soda.jpg")
+
+    first = Order()
+    first.add_item(burger, quantity=2)
+    first_id = book.open(first)
+    second_id = book.open()
+    second = book.orders[second_id]
+    second.add_item(soda)
+    second.add_item(burger)
+
+    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
+        temp_path = temp_file.name
+    try:
+        crud = Menu(csv_path=temp_path)
+        crud.create_item('Entree', 'Burger', 9.99, 'Beef burger', 500, 'burger.jpg')
+        crud.update_item('Burger', price=10.49)
+        changed = book.reprice_from_menu(crud, ['Burger'])
+    finally:
+        os.unlink(temp_path)
+        if os.path.exists(snapshot_path(temp_path)):
+            os.unlink(snapshot_path(temp_path))
+
+    assert set(changed) == {first, second}
+    assert first.total_decimal == Decimal('20.98')
+    assert second.total_decimal == Decimal('12.48')
+
+    # Closed orders keep their prices
+    book.close(first_id)
+    second.remove_item(burger)
+    assert book.orders_with('Burger') == []
+    assert book.reprice({'Burger': 11.99}) == []
+    assert first.total_decimal == Decimal('20.98')
+
+@pytest.mark.parametrize('sink_class,suffix', [
+    (JsonlOrderSink, '.jsonl'), (CsvOrderSink, '.csv'), (SqliteOrderSink, '.db')])
+def test_order_pipeline_prices_and_persists(sink_class, suffix):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        crud = Menu(csv_path=os.path.join(temp_dir, 'items.csv'))
+        crud.create_item('Entree', 'Burger', 9.99, 'Beef burger', 500, 'burger.jpg')
+        crud.create_item('Drink', 'Soda', 1.99, 'Fizzy', 100, 'soda.jpg', 12)
+        path = os.path.join(temp_dir, 'orders' + suffix)
+
+        with OrderPipeline(crud, sink_class(path), workers=2, batch_size=4) as pipeline:
+            futures = [pipeline.submit({'order_id': str(i), 'items': [
+                {'name': 'Burger', 'quantity': 2}, {'name': 'Soda'}]}) for i in range(10)]
+            bad = pipeline.submit({'items': [{'name': 'Missing'}]})
+            malformed = [pipeline.submit(['Burger']) for _ in range(2)]  # must not stop a worker
+            records = [future.result(timeout=10) for future in futures]
+            for future in [bad] + malformed:
+                with pytest.raises(ValueError):
+                    future.result(timeout=10)
+
+        assert records[0]['total'] == '21.97'
+        stats = pipeline.stats()
+        assert stats['persisted'] == 10
+        assert stats['rejected'] == 3
+        assert stats['batches'] >= 3
+        assert stats['latency_p99_s'] >= stats['latency_p50_s'] > 0
+
+        if suffix == '.jsonl':
+            with open(path) as file:
+                assert sorted(json.loads(line)['order_id'] for line in file) == sorted(map(str, range(10)))
+        elif suffix == '.csv':
+            with open(path) as file:
+                assert len(file.readlines()) == 1 + 20
+        else:
+            conn = sqlite3.connect(path)
+            assert conn.execute('SELECT COUNT(*), SUM(total_cents) FROM orders').fetchone() == (10, 21970)
+            conn.close()
+
+def test_order_pipeline_backpressure():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        crud = Menu(csv_path=os.path.join(temp_dir, 'items.csv'))
+        crud.create_item('Entree', 'Burger', 9.99, 'Beef burger', 500, 'burger.jpg')
+        sink = JsonlOrderSink(os.path.join(temp_dir, 'orders.jsonl'))
+        pipeline = OrderPipeline(crud, sink, workers=0, queue_size=2)
+        pipeline.submit({'items': [{'name': 'Burger'}]})
+        pipeline.submit({'items': [{'name': 'Burger'}]})
+        with pytest.raises(queue.Full):
+            pipeline.submit({'items': [{'name': 'Burger'}]}, block=False)
+        pipeline.close()
+
+def test_menu_deferred_writes_flush_once():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'items.csv')
+        crud = Menu(csv_path=path, instrument=True)
+        with crud.deferred():
+            crud.create_item('Entree', 'Burger', 9.99, 'Beef burger', 500, 'burger.jpg')
+            crud.update_item('Burger', price=10.99)
+            crud.create_item('Dessert', 'Cake', 4.99, 'Chocolate cake', 400, 'cake.jpg')
+            assert Menu(csv_path=path).read_items() == []
+            assert crud.read_item('Burger')['price'] == '10.99'
+        assert crud.stats()['operations']['flush']['calls'] == 1
+        assert [item['name'] for item in Menu(csv_path=path).read_items()] == ['Burger', 'Cake']
+
+def test_http_api():
+    async def call(port, method, path, payload=None):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        body = b'' if payload is None else json.dumps(payload).encode()
+        writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n"
+                     f"Connection: close\r\n\r\n".encode() + body)
+        response = await reader.read()
+        writer.close()
+        head, _, body = response.partition(b'\r\n\r\n')
+        return int(head.split()[1]), json.loads(body) if body else None
+
+    async def scenario(api):
+        with api.menu.deferred():
+            server = await asyncio.start_server(api.handle_connection, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                burger = {'type': 'Entree', 'name': 'Burger', 'price': 9.99, 'description': 'Beef',
+                          'calories': 500, 'image_path': 'burger.jpg'}
+                assert (await call(port, 'POST', '/items', burger))[0] == 201
+                assert (await call(port, 'POST', '/items', burger))[0] == 400
+                assert (await call(port, 'GET', '/items/Burger'))[1]['price'] == '9.99'
+                assert (await call(port, 'PATCH', '/items/Burger', {'price': 8.5}))[0] == 200
+                status, items = await call(port, 'GET', '/items?type=Entree&price_max=9')
+                assert status == 200 and [item['name'] for item in items] == ['Burger']
+                assert (await call(port, 'GET', '/items?colour=red'))[0] == 400
+                status, order = await call(port, 'POST', '/orders', {'items': [{'name': 'Burger', 'quantity': 2}]})
+                assert status == 201 and order['total'] == '17.00'
+                assert (await call(port, 'POST', '/orders', {'items': [{'name': 'Pizza'}]}))[0] == 400
+                assert (await call(port, 'DELETE', '/items/Burger'))[0] == 204
+                assert (await call(port, 'GET', '/items/Burger'))[0] == 404
+                assert (await call(port, 'PATCH', '/items/Burger', {'price': 1}))[0] == 404
+                assert (await call(port, 'PUT', '/orders'))[0] == 405
+                status, feed = await call(port, 'GET', '/changes?since=2')
+                assert status == 200 and feed['seq'] == 4
+                assert (await call(port, 'GET', '/changes?since=99'))[0] == 410
+                assert [(change['kind'], change['after']) for change in feed['changes']] == [
+                    ('updated', dict(feed['changes'][0]['before'], price='8.5')), ('deleted', None)]
+                # Rows map onto create_item as CLI imports do, a blank size included
+                assert (await call(port, 'POST', '/items', dict(burger, name='Fries', size='')))[0] == 201
+
+                # A failed flush answers 500 and leaves the change pending for the next one
+                def disk_full(*args):
+                    raise OSError("disk full")
+                backend_write, api.menu.backend.write = api.menu.backend.write, disk_full
+                assert (await call(port, 'POST', '/items', dict(burger, name='Pie')))[0] == 500
+                api.menu.backend.write = backend_write
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'items.csv')
+        crud = Menu(csv_path=path)
+        pipeline = OrderPipeline(crud, JsonlOrderSink(os.path.join(temp_dir, 'orders.jsonl')), workers=1)
+        api = MenuHttpApi(crud, pipeline)
+        asyncio.run(scenario(api))
+        api.close()
+        assert [item['name'] for item in Menu(csv_path=path).read_items()] == ['Fries', 'Pie']
+
+def test_snapshot_cache_and_etags():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        crud = Menu(csv_path=os.path.join(temp_dir, 'items.csv'))
+        crud.create_item('Entree', 'Burger', 9.99, 'Beef burger', 500, 'burger.jpg')
+        crud.create_item('Drink', 'Soda', 1.99, 'Fizzy', 100, 'soda.jpg', 12)
+        cache = SnapshotCache(crud)
+
+        full = cache.get()
+        assert json.loads(full.body) == crud.read_items()
+        assert gzip.decompress(full.gzip_body) == full.body
+        assert cache.get() is full and cache.hits == 1
+        drinks = cache.get('Drink')
+        assert [item['name'] for item in json.loads(drinks.body)] == ['Soda']
+
+        revision = crud.revision
+        crud.update_item('Soda', price=2.49)
+        assert crud.revision > revision
+        assert cache.get().etag != full.etag
+        assert json.loads(cache.get('Drink').body)[0]['price'] == '2.49'
+
+        api = MenuHttpApi(crud)
+        etag = cache.get().etag
+        status, response = asyncio.run(api.dispatch('GET', '/items', b'', {'if-none-match': etag}))
+        assert status == 304 and response.body == b''
+        status, response = asyncio.run(api.dispatch('GET', '/items?type=Drink', b'', {'accept-encoding': 'gzip'}))
+        assert status == 200 and 'Content-Encoding: gzip' in response.headers
+        assert json.loads(gzip.decompress(response.body))[0]['name'] == 'Soda'
+        api.close()
+
+def test_menu_search():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        crud = Menu(csv_path=os.path.join(temp_dir, 'items.csv'))
+        crud.create_item('Entree', 'Classic Burger', 9.99, 'Beef patty with cheese', 700, 'burger.jpg')
+        crud.create_item('Dessert', 'Chocolate Cake', 5.99, 'Rich chocolate layers', 450, 'cake.jpg')
+        crud.create_item('Drink', 'Milkshake', 4.99, 'Chocolate or vanilla, goes with any burger', 600, 'shake.jpg', 16)
+
+        def names(text, limit=10):
+            return [item['name'] for item in crud.search(text, limit)]
+
+        assert names('burger') == ['Classic Burger', 'Milkshake']  # name matches rank first
+        assert names('choc') == ['Chocolate Cake', 'Milkshake']
+        assert names('chocolate burger') == ['Milkshake']
+        assert names('buger') == ['Classic Burger', 'Milkshake']  # typo falls back to fuzzy
+        assert names('burger', limit=1) == ['Classic Burger']
+        assert names('pizza') == [] and names('') == []
+
+        # The index follows creates, updates and deletes
+        crud.update_item('Milkshake', description='Vanilla only')
+        assert names('chocolate burger') == []
+        crud.delete_item('Chocolate Cake')
+        assert names('choc') == []
+        crud.create_item('Appetizer', 'Cheese Sticks', 6.49, 'Fried mozzarella', 500, 'sticks.jpg')
+        assert names('chee') == ['Cheese Sticks', 'Classic Burger']
+        assert Menu(csv_path=crud.csv_path, lazy=True).search('stick')[0]['name'] == 'Cheese Sticks'
+
+def test_headless_imports_do_not_load_kivy():
+    # Block Kivy outright, so the check holds on machines where it is installed
+    script = '''
+import sys
+
+class BlockKivy:
+    def find_spec(self, name, path=None, target=None):
+        if name.split('.')[0] == 'kivy':
+            raise ImportError('kivy is blocked')
+
+sys.meta_path.insert(0, BlockKivy())
+import app.main
+import app.src.business_logic.crud
+from app.src.ui import components
+assert 'ItemForm' in dir(components)
+loaded = [name for name in sys.modules if name.startswith(('kivy', 'app.src.ui.gui', 'app.src.ui.components.'))]
+assert not loaded, loaded
+assert 'sqlite3' not in sys.modules
+assert 'argparse' not in sys.modules and 'multiprocessing' not in sys.modules
+try:
+    components.ItemForm
+except ImportError:
+    pass
+else:
+    raise AssertionError('widgets should need Kivy')
+'''
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+def test_batch_cli():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'items.csv')
+        script = os.path.join(temp_dir, 'ops.txt')
+        with open(script, 'w') as file:
+            file.write("# nightly price changes\nupdate Burger --price 10.49\nget Burger Soda\n")
+        out = io.StringIO()
+        status = run_batch(['--csv', path, '--script', script,
+                            'create', '--type', 'Entree', '--name', 'Burger', '--price', '9.99',
+                            '--description', 'Beef burger', '--calories', '500', '--image-path', 'b.jpg', '+',
+                            'create', '--type', 'Drink', '--name', 'Soda', '--price', '1.99',
+                            '--description', 'Fizzy', '--calories', '100', '--image-path', 's.jpg', '--size', '12',
+                            '+', 'query', '--sort-by', 'price', '--limit', '1'], out)
+        assert status == 0
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert [record['op'] for record in records] == ['create', 'create', 'query', 'update', 'get', 'get']
+        assert records[2]['item']['name'] == 'Soda'
+        assert records[4]['item']['price'] == '10.49'
+        assert Menu(csv_path=path).read_item('Burger')['price'] == '10.49'
+
+        # A failure stops the batch, but what ran before it is saved
+        out = io.StringIO()
+        status = run_batch(['--csv', path, 'delete', 'Soda', '+', 'delete', 'Pizza', '+', 'delete', 'Burger'], out)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert status == 1 and [record['ok'] for record in records] == [True, False]
+        assert [item['name'] for item in Menu(csv_path=path).read_items()] == ['Burger']
+
+        export_path = os.path.join(temp_dir, 'export.jsonl')
+        assert run_batch(['--csv', path, 'export', export_path], io.StringIO()) == 0
+        assert load_item_file(export_path)[0]['name'] == 'Burger'
+        with pytest.raises(SystemExit):
+            run_batch(['--csv', path, 'get', 'Burger', '+', 'explode'], io.StringIO())
+
+        # An unexpected error still closes the menu, compacting the journal
+        class BrokenPipe(io.StringIO):
+            def write(self, text):
+                raise RuntimeError("closed pipe")
+        journaled = os.path.join(temp_dir, 'journaled.csv')
+        with pytest.raises(RuntimeError):
+            run_batch(['--csv', journaled, '--journaled', 'create', '--type', 'Entree', '--name', 'Fries',
+                       '--price', '3', '--description', 'Hot', '--calories', '300', '--image-path', 'f.jpg'],
+                      BrokenPipe())
+        assert not os.path.exists(journaled + '.journal')
+        assert Menu(csv_path=journaled).read_item('Fries')['price'] == '3.0'
+
+def test_menu_rows_diffs():
+    items = [{'name': f"Item {n}", 'price': f"{n}.99"} for n in range(6)]
+    rows = MenuRows()
+    rows.reset(items)
+    assert len(rows) == 6 and rows.data[0] == {'name': 'Item 0', 'text': 'Item 0 - $0.99'}
+
+    rows.apply([('update', 'Item 2', {'name': 'Item 2', 'price': '7.50'}),
+                ('delete', 'Item 1', None), ('delete', 'Item 4', None), ('delete', 'Missing', None),
+                ('create', 'Item 9', {'name': 'Item 9', 'price': '9.99'})])
+    assert [row['name'] for row in rows.data] == ['Item 0', 'Item 2', 'Item 3', 'Item 5', 'Item 9']
+    assert rows.data[1]['text'] == 'Item 2 - $7.50'
+
+    # Positions stay in step, so later diffs land on the right rows
+    rows.apply([('delete', 'Item 0', None), ('create', 'Item 1', {'name': 'Item 1', 'price': '1.00'})])
+    rows.apply([('update', 'Item 9', {'name': 'Item 9', 'price': '0.50'}), ('delete', 'Item 3', None)])
+    assert [row['text'] for row in rows.data] == ['Item 2 - $7.50', 'Item 5 - $5.99', 'Item 9 - $0.50', 'Item 1 - $1.00']
+    assert rows._positions == {row['name']: position for position, row in enumerate(rows.data)}
+
+def test_binary_snapshot():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'items.csv')
+        crud = Menu(csv_path=path)
+        crud.create_item('Entree', 'Burger', 9.99, 'Beef burger', 500, 'burger.jpg')
+        crud.create_item('Drink', 'Soda', 1.99, 'Fizzy, "cold"', 100, 'soda.jpg', 12)
+        crud.create_item('Dessert', 'Pie', 4.5, 'Apple pie', 400, 'pie.jpg')
+        stamp = os.stat(path)
+        stamp = (stamp.st_ino, stamp.st_size, stamp.st_mtime_ns)
+        assert MenuSnapshot.read(snapshot_path(path), stamp) is not None  # written with the CSV file
+
+        # Streaming reads parse the CSV file and leave the snapshot alone
+        os.remove(snapshot_path(path))
+        assert [item['name'] for item in Menu(csv_path=path, lazy=True).iter_items()] == ['Burger', 'Soda', 'Pie']
+        assert not os.path.exists(snapshot_path(path))
+        Menu(csv_path=path)  # a full load rebuilds it
+        assert os.path.exists(snapshot_path(path))
+        for columnar in (False, True):
+            crud = Menu(csv_path=path, columnar=columnar)
+            parsed = Menu(csv_path=path, columnar=columnar, snapshot=False)
+            assert crud.read_items() == parsed.read_items()
+            assert crud.query(price_max=5, sort_by='price') == parsed.query(price_max=5, sort_by='price')
+            assert [row['name'] for row in crud.query(type='Drink')] == ['Soda']
+            assert crud.get_menu_models()['Soda'].size == 12
+        assert Menu(csv_path=path).read_item('Pie')['size'] == ''
+
+        # A hand edit makes the snapshot stale; rows it cannot type exactly keep their text
+        with open(path, 'a', newline='') as file:
+            file.write('Entree,Fries,3,Salty,300,fries.jpg,\n')
+        crud = Menu(csv_path=path)
+        assert crud.read_item('Fries')['price'] == '3'
+        assert [row['name'] for row in crud.query(price_min=2.5, price_max=4, sort_by='price')] == ['Fries']
+        stamp = os.stat(path)
+        stamp = (stamp.st_ino, stamp.st_size, stamp.st_mtime_ns)
+        assert len(MenuSnapshot.read(snapshot_path(path), stamp)) == 4
+
+        # A damaged snapshot fails its checksum and is rebuilt
+        with open(snapshot_path(path), 'r+b') as file:
+            file.seek(-3, os.SEEK_END)
+            file.write(b'\xff')
+        assert MenuSnapshot.read(snapshot_path(path), stamp) is None
+        assert Menu(csv_path=path).read_items() == Menu(csv_path=path, snapshot=False).read_items()
+        assert MenuSnapshot.read(snapshot_path(path), stamp) is not None
+
+        # Journaled changes are replayed on top of the snapshot's rows
+        crud = Menu(csv_path=path, journaled=True)
+        crud.delete_item('Burger')
+        assert crud.backend.snapshot() is None
+        assert Menu(csv_path=path, journaled=True).read_item('Burger') is None
+
+def test_layered_menus():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        base = Menu(csv_path=os.path.join(temp_dir, 'items.csv'))
+        base.create_item('Entree', 'Burger', 9.99, 'Beef burger', 500, 'burger.jpg')
+        base.create_item('Drink', 'Soda', 1.99, 'Fizzy', 100, 'soda.jpg', 12)
+        base.create_item('Dessert', 'Pie', 4.5, 'Apple pie', 400, 'pie.jpg')
+        registry = MenuRegistry(base, os.path.join(temp_dir, 'locations'), capacity=2)
+
+        downtown = registry.get('downtown')
+        assert downtown.update_item('Burger', price='3.25')['price'] == '3.25'
+        assert downtown.update_item('Soda', size=20)['size'] == '20'
+        assert downtown.update_item('Pie', available=False) is None
+        for value in ('true', 1, 0):
+            with pytest.raises(ValueError):
+                downtown.update_item('Pie', available=value)
+        assert [row['name'] for row in downtown.read_items()] == ['Burger', 'Soda']
+        assert [row['name'] for row in downtown.query(price_max=5, sort_by='price')] == ['Soda', 'Burger']
+        assert [row['name'] for row in downtown.query(type='Dessert')] == []
+        assert downtown.get_menu_models()['Burger'].price == 3.25
+        assert base.get_menu_models()['Burger'].price == 9.99
+        for changes in ({'price': -1}, {'size': 50}, {'description': 'New'}):
+            with pytest.raises(ValueError):
+                downtown.update_item('Soda', **changes)
+        with pytest.raises(ValueError):
+            downtown.update_item('Burger', size=12)
+        with pytest.raises(BatchError):
+            downtown.update_items([{'name': 'Soda', 'price': 2.5}, {'name': 'Missing', 'price': 1}])
+        assert downtown.read_item('Soda')['price'] == '1.99'
+
+        # Chain-wide changes go to the base menu and show through where not overridden
+        base.update_item('Soda', price=2.49)
+        base.update_item('Burger', price=10.49)
+        uptown = registry.get('uptown')
+        assert uptown.read_item('Soda')['price'] == downtown.read_item('Soda')['price'] == '2.49'
+        assert downtown.read_item('Burger')['price'] == '3.25'
+        assert len(uptown.read_items()) == 3
+
+        # The least recently used location is evicted and reloaded from its file
+        registry.get('airport')
+        assert len(registry) == 2 and registry.misses == 3
+        downtown = registry.get('downtown')
+        assert registry.misses == 4
+        assert downtown.read_item('Burger')['price'] == '3.25' and downtown.read_item('Pie') is None
+        downtown.reset_item('Burger')
+        assert downtown.read_item('Burger')['price'] == '10.49'
+        assert registry.locations() == ['downtown']
+        with pytest.raises(ValueError):
+            registry.get('../etc')
+
+        # Removing every override leaves a file with the layer's own header
+        airport = registry.get('airport')
+        airport.update_item('Soda', price=1.5)
+        airport.reset_item('Soda')
+        with open(os.path.join(temp_dir, 'locations', 'airport.csv')) as file:
+            assert file.read().strip() == ','.join(OverrideLayer.FIELDNAMES)
+        registry.close()
+
+def test_change_events():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'items.csv')
+        crud = Menu(csv_path=path)
+        start = crud.seq
+        events = []
+        crud.subscribe(events.append)
+        crud.create_item('Entree', 'Burger', 9.99, 'Beef burger', 500, 'burger.jpg')
+        crud.update_item('Burger', price=10.49)
+        crud.create_items([{'item_type': 'Drink', 'name': f"Soda {n}", 'price': 1.99, 'description': 'Fizzy',
+                            'calories': 100, 'image_path': 'soda.jpg', 'size': 12} for n in range(70)])
+        crud.delete_items(['Soda 0', 'Soda 1'])
+        assert [event.seq for event in events] == list(range(start + 1, crud.seq + 1))
+        assert isinstance(events[0], ChangeEvent)
+        assert [event.kind for event in events[:2]] == ['created', 'updated']
+        assert events[1].before['price'] == '9.99' and events[1].after['price'] == '10.49'
+        assert (events[-1].kind, events[-1].name, events[-1].after) == ('deleted', 'Soda 1', None)
+        assert crud.changes_since(start + 70) == events[70:]
+        assert crud.changes_since(crud.seq) == []
+        assert crud.changes_since(crud.seq + 1) is None  # a cursor from before a restart
+
+        # Subscribers run once the change is on disk, and a failing one does not stop the write
+        def failing(event):
+            raise RuntimeError("consumer bug")
+        crud.subscribe(failing)
+        crud.unsubscribe(events.append)
+        crud.create_item('Dessert', 'Pie', 4.5, 'Apple pie', 400, 'pie.jpg')
+        assert Menu(csv_path=path).read_item('Pie') is not None
+        assert len(events) == 74
+
+        # Consumers that fall further behind than the change log must re-read everything
+        class ShortLogMenu(Menu):
+            CHANGE_LOG_SIZE = 2
+        crud = ShortLogMenu(csv_path=path)
+        crud.delete_item('Pie')
+        crud.delete_item('Burger')
+        assert crud.changes_since(crud.seq - 3) is None
+        assert [event.name for event in crud.changes_since(crud.seq - 2)] == ['Pie', 'Burger']
+
+        # Another process's write reaches subscribers as one reloaded event
+        concurrent = Menu(csv_path=path, concurrent=True)
+        seen = []
+        concurrent.subscribe(seen.append)
+        Menu(csv_path=path).delete_item('Soda 2')
+        concurrent.refresh()
+        assert [event.kind for event in seen] == ['reloaded']
+
+        book = OrderBook()
+        order = Order()
+        order.add_item(Drink('Soda 3', 1.99, 'Fizzy', 12, 100, 'soda.jpg'), 2)
+        book.open(order)
+        book.follow(crud)
+        crud.update_item('Soda 3', price=2.5)
+        assert order.total_cents == 500
+
+def test_item_schemas():
+    drink = {'type': 'Drink', 'name': 'Soda', 'price': '1.99', 'description': 'Fizzy', 'calories': '100',
+             'image_path': 'soda.jpg', 'size': '12'}
+    pie = {'type': 'Dessert', 'name': 'Pie', 'price': '4.5', 'description': 'Apple pie', 'calories': '400',
+           'image_path': 'pie.jpg', 'size': ''}
+    rows = [drink, pie, dict(pie, name='Cake', price='free'), dict(drink, size='64'), {'type': 'Soup'},
+            dict(pie, name='Tart', colour='red'), dict(drink, name='Tea', price=float('nan'))]
+    batches, errors = validate_rows(rows)
+    assert [position for position, _ in errors] == [2, 3, 4, 5, 6]
+    assert errors[0][1] == SCHEMAS['Dessert'].fields['price'].message
+    valid = {position: (item_schema.name, columns) for item_schema, positions, columns in batches
+             for position in positions}
+    assert sorted(valid) == [0, 1]
+    assert valid[0][1]['price'] == [1.99] and valid[0][1]['size'] == [12]
+
+    # One item raises the message of its first failing field, the same one batches report
+    with pytest.raises(ValueError) as caught:
+        SCHEMAS['Drink'].validate(name='Soda', price='1.99', description='', calories=0, image_path='', size=64)
+    assert str(caught.value) == SCHEMAS['Drink'].fields['calories'].message
+    assert SCHEMAS['Drink'].row(**{key: drink[key] for key in SCHEMAS['Drink'].fields}) == \
+        dict(drink, price='1.99', calories='100', size='12')
+    # Models share the rules of the menu: prices and calories above 0 and names not empty,
+    # while descriptions and image paths are taken as given
+    soup = dict(name='Soup', price=5, description='Hot', calories=100, image_path='soup.jpg')
+    for change in ({'price': 0}, {'calories': 0}, {'name': ''}, {'price': 'free'}):
+        with pytest.raises(ValueError):
+            Entree(**dict(soup, **change))
+    assert Entree(**dict(soup, price='5.5', description=3)).price == 5.5
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'items.csv')
+        crud = Menu(csv_path=path)
+        created, errors = crud.create_items([drink, pie, dict(pie, calories='-5'), dict(drink)], skip_invalid=True)
+        assert [row['name'] for row in created] == ['Soda', 'Pie']
+        assert [position for position, _ in errors] == [2, 3]
+        assert created[1]['size'] is None
+        with pytest.raises(ValueError):
+            crud.update_item('Soda', size=50)
+        with pytest.raises(ValueError):
+            crud.update_item('Pie', price='-1')
+        assert crud.update_item('Soda', size='20')['size'] == '20'
+        # A new type is checked with the rest of the item
+        with pytest.raises(ValueError):
+            crud.update_item('Pie', type='Bogus')
+        with pytest.raises(ValueError):
+            crud.update_item('Pie', item_type='Drink')  # a drink needs a size
+        assert crud.update_item('Pie', type='Drink', size=16)['size'] == '16'
+        assert crud.update_item('Pie', type='Dessert', size=None)['size'] is None
+        crud.update_item('Pie', type='Drink', size=16)
+        assert crud.update_item('Pie', item_type='Dessert')['size'] is None  # the drink size is dropped
+        with pytest.raises(ValueError):
+            crud.update_item('Pie', size=16)
+
+        # Hand-edited rows that break the rules are left out of the models
+        with open(path, 'a', newline='') as file:
+            file.write('Entree,Stew,-3,Beef stew,300,stew.jpg,\n')
+        models = Menu(csv_path=path, snapshot=False).get_menu_models()
+        assert sorted(models) == ['Pie', 'Soda']
+        assert isinstance(models['Soda'], Drink) and models['Soda'].size == 20 and models['Soda'].price == 1.99
+
+
+def test_parallel_io(monkeypatch):
+    monkeypatch.setattr(parallel_io, 'MIN_PARALLEL_BYTES', 0)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source = os.path.join(temp_dir, 'import.csv')
+        with open(source, 'w', newline='') as file:
+            file.write('type,name,price,description,calories,image_path,size\r\n')
+            for i in range(40):
+                file.write(f'Dessert,Pie {i},4.5,"Apple pie\nwith ""cream"", {i}",400,pie.jpg,\r\n')
+            file.write('Drink,Soda,1.99,Fizzy,100,soda.jpg,12\r\n')
+            file.write('Entree,Pie 3,9.99,Repeated name,500,b.jpg,\r\n')
+            file.write('Entree,Stew,-3,Beef stew,300,stew.jpg,\r\n')
+
+        # Ranges end on record boundaries even inside quoted newlines
+        header, ranges = parallel_io.split_records(source, 7)
+        assert header[1] == 'name' and len(ranges) > 1
+        with open(source, newline='') as file:
+            expected = list(csv.DictReader(file))
+        assert parallel_io.read_rows(source, workers=3) == expected
+        # Boundaries found a few bytes at a time match, so nothing depends on holding the file
+        monkeypatch.setattr(parallel_io, 'SCAN_BYTES', 5)
+        assert parallel_io.split_records(source, 7) == (header, ranges)
+
+        path = os.path.join(temp_dir, 'items.csv')
+        crud = Menu(csv_path=path)
+        crud.create_item('Entree', 'Pie 0', 9.99, 'Taken', 500, 'b.jpg')
+        with pytest.raises(BatchError):
+            parallel_io.import_items(crud, source, workers=2)
+        assert len(crud.read_items()) == 1
+        created, errors = parallel_io.import_items(crud, source, workers=2, skip_invalid=True)
+        assert [position for position, _ in errors] == [0, 41, 42]
+        assert len(created) == 40 and crud.read_item('Pie 7')['description'] == 'Apple pie\nwith "cream", 7'
+
+        exported = os.path.join(temp_dir, 'export.csv')
+        assert parallel_io.write_rows(crud.iter_items(), exported, workers=2) == 41
+        assert Menu(csv_path=exported, snapshot=False).read_items() == Menu(csv_path=path, snapshot=False).read_items()
+
+        # With another thread running the workers are not forked from this process
+        stop = threading.Event()
+        busy = threading.Thread(target=stop.wait)
+        busy.start()
+        try:
+            assert parallel_io.read_rows(source, workers=2) == expected
+            assert parallel_io.write_rows(crud.iter_items(), exported, workers=2) == 41
+        finally:
+            stop.set()
+            busy.join()
+        assert Menu(csv_path=exported, snapshot=False).read_items() == Menu(csv_path=path, snapshot=False).read_items()
+
+        out = io.StringIO()
+        other = os.path.join(temp_dir, 'other.csv')
+        assert run_batch(['--csv', other, 'import', source, '--workers', '2'], out) == 0
+        assert json.loads(out.getvalue())['created'] == 41